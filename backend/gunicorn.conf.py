@@ -0,0 +1,49 @@
+"""
+Gunicorn settings (read automatically when gunicorn starts in this directory).
+
+The number of workers comes from WEB_CONCURRENCY. With PROMETHEUS_MULTIPROC_DIR
+set, every worker writes its metrics to files in that directory and /metrics
+adds them up; the hooks below keep the directory in step with the workers.
+
+SERVER_MODE picks the app: wsgi (default) runs the WSGI app on sync workers,
+asgi runs the ASGI app on uvicorn workers. Every request on a sync worker
+holds it until the response is complete, so the live stock stream
+(/api/stock/live/) only works in asgi mode, where an idle stream is just a
+coroutine. An app given on the command line overrides this. Stock changes
+reach the streams of other workers only through Redis, so asgi mode with
+more than one worker refuses to start without LIVE_STOCK_REDIS_URL.
+"""
+import os
+import shutil
+
+if os.environ.get('SERVER_MODE', 'wsgi').lower() == 'asgi':
+    wsgi_app = 'inventory_system.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'inventory_system.wsgi:application'
+
+
+def on_starting(server):
+    if (
+        os.environ.get('SERVER_MODE', 'wsgi').lower() == 'asgi'
+        and server.cfg.workers > 1
+        and not os.environ.get('LIVE_STOCK_REDIS_URL')
+    ):
+        # Each stream would only see the changes made by its own worker
+        raise RuntimeError(
+            f'SERVER_MODE=asgi with {server.cfg.workers} workers needs LIVE_STOCK_REDIS_URL '
+            '(or WEB_CONCURRENCY=1) for the live stock stream'
+        )
+
+    # Start from an empty directory so counters from a previous run are not added in
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drop the gauges of a worker that has exited (counters and histograms are kept)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
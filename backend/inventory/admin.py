@@ -1,26 +1,144 @@
 from django.contrib import admin
-from .models import Branch, Product, Stock, Sale
+from django.db import transaction
+from . import changes, counters, ledger, purge, services, versions
+from .models import (
+    Branch, ChangeTombstone, Product, Stock, Sale, SaleArchive, SaleArchiveRun, SaleDailyRollup, StockMovement,
+    StockSnapshot,
+)
+
+
+# Base class for models served with ETags: edits made here bump the same
+# dashboard counters and version stamps as the API write views, so the summary
+# stays right and clients do not keep stale copies. Subclasses pass the counter
+# deltas of a change to save_model/delete_model/delete_queryset.
+class VersionedAdmin(admin.ModelAdmin):
+    changed_tables = ()  # Tables whose version stamp an edit changes
+
+    def changed(self, deltas=None):
+        # Counters first, then the stamps: the order the views lock them in
+        counters.bump(deltas or {})
+        versions.touch(*self.changed_tables)
+
+    def save_model(self, request, obj, form, change, deltas=None):
+        super().save_model(request, obj, form, change)
+        self.changed(deltas)
+
+    def delete_model(self, request, obj, deltas=None):
+        super().delete_model(request, obj)
+        self.changed(deltas)
+
+    def delete_queryset(self, request, queryset, deltas=None):
+        super().delete_queryset(request, queryset)
+        self.changed(deltas)
+
+
+# Base class for branches and products: deleting one here is the same soft delete
+# as the API does (hidden at once, its rows purged in the background; see purge.py)
+class SoftDeleteAdmin(VersionedAdmin):
+    counter = None  # Dashboard counter of the active ones
+    list_filter = ('is_active',)  # Deleted ones stay listed until their purge finishes
+    readonly_fields = ('is_active', 'version', 'updated_at')  # Set by deleting and by the change feed
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change, None if change else {self.counter: 1})
+        changes.stamp(type(obj).objects.filter(pk=obj.pk))
+
+    # deactivate() bumps the counters and stamps itself
+    def delete_model(self, request, obj):
+        purge.deactivate(type(obj), obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for pk in queryset.values_list('pk', flat=True):
+            purge.deactivate(queryset.model, pk)
+
+    def get_deleted_objects(self, objs, request):
+        # The default confirmation page lists every dependent row, which loads them all
+        objs = list(objs)
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, set(), []
+
+
+# Base class for tables written only by the app (ledger, rollups, snapshots,
+# archive bookkeeping): an edit made here would no longer match what they record
+class ReadOnlyAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 # Register Branch model: Allows managing store locations in Django admin
 @admin.register(Branch)
-class BranchAdmin(admin.ModelAdmin):
-    list_display = ('name', 'location')  # Shows name and location in the list view
+class BranchAdmin(SoftDeleteAdmin):
+    changed_tables = (versions.BRANCH,)
+    counter = counters.BRANCHES
+    list_display = ('name', 'location', 'is_active')  # Shows name, location and whether it is deleted
     search_fields = ('name', 'location')  # Allows searching by name or location
 
 
 # Register Product model: Allows managing products in Django admin
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price')  # Shows name and price in the list view
+class ProductAdmin(SoftDeleteAdmin):
+    changed_tables = (versions.PRODUCT,)
+    counter = counters.PRODUCTS
+    list_display = ('name', 'price', 'is_active')  # Shows name, price and whether it is deleted
     search_fields = ('name',)  # Allows searching by product name
 
 
 # Register Stock model: Allows managing inventory levels in Django admin
 @admin.register(Stock)
-class StockAdmin(admin.ModelAdmin):
+class StockAdmin(VersionedAdmin):
+    changed_tables = (versions.STOCK,)
     list_display = ('branch', 'product', 'quantity')  # Shows branch, product, and quantity
     list_filter = ('branch', 'product')  # Adds filters for branch and product
     search_fields = ('branch__name', 'product__name')  # Allows searching by branch or product name
+    readonly_fields = ('version', 'updated_at')  # Set by the change feed
+
+    # Quantity edits and deletions made here go into the stock movement ledger too
+    def save_model(self, request, obj, form, change):
+        old = None
+        if change:
+            old = Stock.objects.select_for_update().filter(pk=obj.pk).values_list(
+                'branch_id', 'product_id', 'quantity'
+            ).first()
+        if old:
+            deltas = {counters.UNITS_ON_HAND: obj.quantity - old[2]}
+        else:
+            deltas = {counters.STOCK_ITEMS: 1, counters.UNITS_ON_HAND: obj.quantity}
+        super().save_model(request, obj, form, change, deltas)
+        changes.stamp(Stock.objects.filter(pk=obj.pk))
+        movements = [(obj.branch_id, obj.product_id, obj.quantity, StockMovement.ADJUSTMENT)]
+        if old:
+            movements.insert(0, (old[0], old[1], -old[2], StockMovement.ADJUSTMENT))
+        ledger.record_many(movements)
+
+    def delete_model(self, request, obj):
+        stock_id = obj.pk
+        # Locked, so the quantity taken off the totals is the one deleted
+        quantity = Stock.objects.select_for_update().filter(pk=stock_id).values_list('quantity', flat=True).first()
+        if quantity is None:
+            return  # Deleted meanwhile
+        ledger.record(obj.branch_id, obj.product_id, -quantity, StockMovement.REMOVED)
+        super().delete_model(request, obj, {counters.STOCK_ITEMS: -1, counters.UNITS_ON_HAND: -quantity})
+        changes.deleted(Stock, [stock_id])
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        removed = list(
+            queryset.select_for_update().order_by('id').values_list('id', 'branch_id', 'product_id', 'quantity')
+        )
+        ledger.record_many(
+            (branch_id, product_id, -quantity, StockMovement.REMOVED)
+            for _, branch_id, product_id, quantity in removed
+        )
+        super().delete_queryset(request, queryset, {
+            counters.STOCK_ITEMS: -len(removed),
+            counters.UNITS_ON_HAND: -sum(quantity for _, _, _, quantity in removed),
+        })
+        changes.deleted(Stock, [stock_id for stock_id, _, _, _ in removed])
 
 
 # Register Sale model: Allows viewing sales history in Django admin
@@ -29,5 +147,75 @@ class SaleAdmin(admin.ModelAdmin):
     list_display = ('branch', 'product', 'quantity', 'date')  # Shows all sale details
     list_filter = ('branch', 'product', 'date')  # Adds filters for branch, product, and date
     search_fields = ('branch__name', 'product__name')  # Allows searching by branch or product name
-    readonly_fields = ('date',)  # Prevents manual editing of the date (it's auto-set)
 
+    # Sales are recorded through the API, which takes their units out of stock;
+    # adding or editing one here would leave the stock, counters and ledger behind
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    # Deleting here restores the stock like the API does (see services.delete_sale)
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            try:
+                services.delete_sale(obj.pk)
+            except Sale.DoesNotExist:
+                pass  # Deleted meanwhile, or waiting to be purged with its branch or product
+
+    def delete_queryset(self, request, queryset):
+        for pk in sorted(queryset.values_list('pk', flat=True)):
+            self.delete_model(request, Sale(pk=pk))
+
+
+# Register SaleArchive model: Read-only view of the archived sales
+@admin.register(SaleArchive)
+class SaleArchiveAdmin(ReadOnlyAdmin):
+    list_display = ('id', 'branch', 'product', 'quantity', 'date')  # Shows all sale details
+    list_filter = ('branch',)  # Adds a filter for branch
+    list_select_related = ('branch', 'product')  # Fetches names in the same query
+    readonly_fields = ('id', 'branch', 'product', 'quantity', 'date')  # Written by the archive_sales command
+
+
+# Register SaleArchiveRun model: Lists the runs of the archive_sales command
+@admin.register(SaleArchiveRun)
+class SaleArchiveRunAdmin(ReadOnlyAdmin):
+    list_display = ('before', 'started_at', 'finished_at', 'rows')  # Shows each run and how far it got
+    # Not deletable either: the latest run tells the sales views to read the archive
+    readonly_fields = ('before', 'started_at', 'finished_at', 'rows')  # Written by the archive_sales command
+
+
+# Register ChangeTombstone model: Read-only view of the deletions sent through the change feed
+@admin.register(ChangeTombstone)
+class ChangeTombstoneAdmin(ReadOnlyAdmin):
+    list_display = ('table', 'object_id', 'deleted_at')  # Shows what was deleted and when
+    list_filter = ('table',)  # Adds a filter for table
+    # Not deletable either: clients that have not synced since would keep the deleted row
+    readonly_fields = ('table', 'object_id', 'version', 'deleted_at')  # Written when rows are deleted
+
+
+# Register SaleDailyRollup model: Read-only view of the per-day sales totals
+@admin.register(SaleDailyRollup)
+class SaleDailyRollupAdmin(ReadOnlyAdmin):
+    list_display = ('day', 'branch', 'product', 'units', 'revenue')  # Shows the daily totals
+    list_filter = ('branch', 'day')  # Adds filters for branch and day
+    list_select_related = ('branch', 'product')  # Fetches names in the same query
+    readonly_fields = ('day', 'branch', 'product', 'units', 'revenue')  # Maintained automatically
+
+
+# Register StockMovement model: Read-only view of the stock ledger
+@admin.register(StockMovement)
+class StockMovementAdmin(ReadOnlyAdmin):
+    list_display = ('created_at', 'branch', 'product', 'delta', 'reason', 'sale_id')  # Shows each change
+    list_filter = ('reason', 'branch')  # Adds filters for reason and branch
+    list_select_related = ('branch', 'product')  # Fetches names in the same query
+    readonly_fields = ('created_at', 'branch', 'product', 'delta', 'reason', 'sale_id')  # The ledger is append-only
+
+
+# Register StockSnapshot model: Lists the point-in-time snapshots taken per branch
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(ReadOnlyAdmin):
+    list_display = ('branch', 'taken_at', 'last_movement_id')  # Shows when each snapshot was taken
+    list_filter = ('branch',)  # Adds a filter for branch
+    readonly_fields = ('branch', 'taken_at', 'last_movement_id')  # Taken by the snapshot_stock command
@@ -0,0 +1,170 @@
+"""
+Sales time series: units and revenue per day, week or month, optionally per
+branch or product.
+
+Buckets are computed in the database with the Trunc* functions, normally over
+the SaleDailyRollup table (a few rows per day) rather than the raw sales.
+Buckets that ended before the current one can no longer change through normal
+sales, so they are cached; the key includes a generation number that is
+bumped whenever a past day's rollup changes (late uploads, deleted sales,
+rebuilds), which makes any stale entry unreachable.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DateField, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils.dateparse import parse_date
+
+from . import archive, counters, pagination, purge
+from .counters import day_bounds, local_day
+from .models import Sale, SaleArchive, SaleDailyRollup
+
+PERIODS = ('day', 'week', 'month')
+GROUPS = ('none', 'branch', 'product')
+SOURCES = ('rollup', 'sales')
+DEFAULT_RANGE_DAYS = {'day': 30, 'week': 7 * 26, 'month': 365}
+CACHE_TIMEOUT = 24 * 60 * 60
+CENTS = Decimal('0.01')
+
+
+def bucket_start(day, period):
+    """First day of the bucket that contains day (weeks start on Monday, like TruncWeek)."""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _parse_day(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+    return day
+
+
+def parse_query(params):
+    """Validates the query string and returns the normalised query as a dict."""
+    period = params.get('period', 'day')
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of: {', '.join(PERIODS)}")
+    group_by = params.get('group_by', 'none')
+    if group_by not in GROUPS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUPS)}")
+    source = params.get('source', 'rollup')
+    if source not in SOURCES:
+        raise ValueError(f"source must be one of: {', '.join(SOURCES)}")
+
+    date_to = _parse_day(params, 'date_to') or local_day()
+    date_from = _parse_day(params, 'date_from') or date_to - timedelta(days=DEFAULT_RANGE_DAYS[period] - 1)
+    if date_from > date_to:
+        raise ValueError('date_from must not be after date_to')
+    return {
+        'period': period,
+        'group_by': group_by,
+        'source': source,
+        'branch': pagination.parse_id(params, 'branch'),
+        'product': pagination.parse_id(params, 'product'),
+        'date_from': date_from,
+        'date_to': date_to,
+    }
+
+
+def _buckets(query, first_day, end_day):
+    """Runs the aggregate for the days in [first_day, end_day)."""
+    period = query['period']
+    if query['source'] == 'rollup':
+        sources = [SaleDailyRollup.objects.filter(day__gte=first_day, day__lt=end_day)]
+        truncate = {'day': F('day'), 'week': TruncWeek('day'), 'month': TruncMonth('day')}[period]
+        units, revenue = Sum('units'), Sum('revenue')
+    else:
+        start, _ = day_bounds(first_day)
+        end, _ = day_bounds(end_day)
+        # Archived sales too when the range reaches back into them; totals from both are added up
+        models = [Sale, SaleArchive] if archive.reaches_archive(start) else [Sale]
+        sources = [model.objects.filter(date__gte=start, date__lt=end) for model in models]
+        truncate = {
+            'day': TruncDate('date'),
+            'week': TruncWeek('date', output_field=DateField()),
+            'month': TruncMonth('date', output_field=DateField()),
+        }[period]
+        units = Sum('quantity')
+        revenue = Sum(ExpressionWrapper(
+            F('quantity') * F('product__price'),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ))
+
+    fields = ['bucket']
+    if query['group_by'] == 'branch':
+        fields += ['branch_id', 'branch__name']
+    elif query['group_by'] == 'product':
+        fields += ['product_id', 'product__name']
+
+    totals = {}  # (bucket[, branch or product id]) -> row
+    for rows in sources:
+        rows = purge.visible(rows)
+        if query['branch']:
+            rows = rows.filter(branch_id=query['branch'])
+        if query['product']:
+            rows = rows.filter(product_id=query['product'])
+        for row in rows.annotate(bucket=truncate).values(*fields).annotate(
+            total_units=units, total_revenue=revenue,
+        ).order_by(*fields[:2]):
+            key = tuple(row[field] for field in fields[:2])
+            if key in totals:
+                totals[key]['total_units'] += row['total_units'] or 0
+                totals[key]['total_revenue'] += row['total_revenue'] or 0
+            else:
+                totals[key] = row
+
+    results = []
+    for key in sorted(totals):
+        row = totals[key]
+        item = {'period': row['bucket'].isoformat()}
+        if query['group_by'] == 'branch':
+            item['branch'] = row['branch_id']
+            item['branch_name'] = row['branch__name']
+        elif query['group_by'] == 'product':
+            item['product'] = row['product_id']
+            item['product_name'] = row['product__name']
+        item['units'] = row['total_units'] or 0
+        # Rendered like DRF renders decimals (a string with two places)
+        item['revenue'] = str(Decimal(row['total_revenue'] or 0).quantize(CENTS))
+        results.append(item)
+    return results
+
+
+def _generation():
+    return counters.read([counters.ROLLUP_GENERATION])[counters.ROLLUP_GENERATION]
+
+
+def sales_series(query):
+    """
+    Returns the bucketed results for a parsed query: whole buckets from the
+    one containing date_from up to date_to. Buckets that closed
+    before the current one come from the cache when possible; the current
+    bucket is always computed live.
+    """
+    first_day = bucket_start(query['date_from'], query['period'])
+    end_day = query['date_to'] + timedelta(days=1)
+    current_start = bucket_start(local_day(), query['period'])
+    closed_end = min(end_day, current_start)
+
+    results = []
+    if first_day < closed_end:
+        key = 'analytics:{gen}:{source}:{period}:{group_by}:{branch}:{product}:{first}:{end}'.format(
+            gen=_generation(), first=first_day, end=closed_end, **query,
+        )
+        closed = cache.get(key)
+        if closed is None:
+            closed = _buckets(query, first_day, closed_end)
+            cache.set(key, closed, CACHE_TIMEOUT)
+        results.extend(closed)
+    if closed_end < end_day:
+        results.extend(_buckets(query, max(first_day, closed_end), end_day))
+    return results
@@ -5,3 +5,7 @@ class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
 
+
+    def ready(self):
+        # Connects the signals that keep the catalog cache up to date
+        from . import catalog_cache  # noqa: F401
@@ -0,0 +1,88 @@
+"""
+Archival of old sales.
+
+The archive_sales command moves the sales dated before a cutoff from Sale
+into SaleArchive (same columns, same ids), BATCH_SIZE rows per transaction:
+each batch is read in (date, id) order and locked, copied with one bulk
+INSERT and removed from Sale with one DELETE, so a sale is always in
+exactly one of the two tables. The daily rollups are left alone, so reports
+read from them are unchanged.
+
+Every run is recorded as a SaleArchiveRun before the first row moves. The
+latest cutoff is the boundary the read views check: a request whose date
+range starts at or after it reads Sale only, anything reaching back before
+it reads both tables (sale_sources()). Sale can still hold older rows, e.g.
+offline sales uploaded after a run, so it is always read; running the
+command again moves them too.
+"""
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import pagination, versions
+from .models import Sale, SaleArchive, SaleArchiveRun
+
+BATCH_SIZE = 5000
+
+_COLUMNS = ('id', 'branch_id', 'product_id', 'quantity', 'date')
+
+
+def boundary():
+    """Cutoff of the latest archive run (older sales may be archived), or None if nothing was ever archived."""
+    return SaleArchiveRun.objects.aggregate(before=Max('before'))['before']
+
+
+def reaches_archive(since):
+    """True if reading sales from `since` (None: from the beginning) needs the archive."""
+    before = boundary()
+    return before is not None and (since is None or since < before)
+
+
+def sale_sources(params):
+    """
+    The querysets to read for a sales request with the list_sales filters:
+    Sale, preceded by SaleArchive (the older sales) when ?date_from= is missing
+    or before the boundary. Raises ValueError for a bad date_from.
+    """
+    date_from = params.get('date_from')
+    since = pagination.parse_moment(date_from, 'date_from') if date_from else None
+    if reaches_archive(since):
+        return [SaleArchive.objects.all(), Sale.objects.all()]
+    return [Sale.objects.all()]
+
+
+def _move_batch(before, batch_size):
+    with transaction.atomic():
+        # Locked, so a sale being deleted at the same time is not copied
+        rows = list(
+            Sale.objects.select_for_update()
+            .filter(date__lt=before)
+            .order_by('date', 'id')
+            .values_list(*_COLUMNS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        SaleArchive.objects.bulk_create([SaleArchive(**dict(zip(_COLUMNS, row))) for row in rows])
+        Sale.objects.filter(id__in=[row[0] for row in rows])._raw_delete(connection.alias)
+        return len(rows)
+
+
+def archive_sales(before, batch_size=BATCH_SIZE, progress=None):
+    """
+    Moves every sale dated before `before` to SaleArchive and returns the
+    SaleArchiveRun. progress(run) is called after each batch.
+    """
+    # Recorded first, so reads include the archive as soon as anything is in it
+    run = SaleArchiveRun.objects.create(before=before)
+    while True:
+        moved = _move_batch(before, batch_size)
+        if not moved:
+            break
+        run.rows += moved
+        run.save(update_fields=['rows'])
+        if progress:
+            progress(run)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at'])
+    versions.touch(versions.SALE)
+    return run
@@ -0,0 +1,108 @@
+"""
+Helpers shared by the bench_* management commands.
+
+Benchmarks run against a throwaway test database, created and destroyed the
+same way Django's test runner does it, so they never touch real data. With
+USE_SQLITE=1 they need no database server at all.
+"""
+import contextlib
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextlib.contextmanager
+def throwaway_database():
+    """Creates a fresh, migrated test database for the duration of the block."""
+    tmpdir = None
+    database = settings.DATABASES['default']
+    if connection.vendor == 'sqlite':
+        # The default in-memory SQLite test database cannot be shared between
+        # threads, so the concurrent benchmarks use a temporary file instead
+        tmpdir = tempfile.mkdtemp(prefix='inventory-bench-')
+        database.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+
+    # Refused requests (400s) are expected in benchmarks, and the per-request
+    # timing lines would drown the report; don't log each one
+    quiet_loggers = [logging.getLogger(name) for name in ('django.request', 'inventory.perf')]
+    old_levels = [logger.level for logger in quiet_loggers]
+    for logger in quiet_loggers:
+        logger.setLevel(logging.ERROR)
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+        for logger, level in zip(quiet_loggers, old_levels):
+            logger.setLevel(level)
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (pct between 0 and 100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(samples):
+    """Summarises a list of latencies in seconds as milliseconds."""
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def run_concurrently(call, jobs, workers):
+    """
+    Runs call(job) for every job on a pool of threads, each with its own
+    database connection, and returns (results, latencies, elapsed_seconds)
+    with results and latencies in the same order as jobs.
+    """
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    latencies = [0.0] * len(jobs)
+    pending = iter(range(len(jobs)))
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    index = next(pending, None)
+                if index is None:
+                    return
+                start = time.perf_counter()
+                results[index] = call(jobs[index])
+                latencies[index] = time.perf_counter() - start
+        finally:
+            # Each thread opened its own connection; close it before the
+            # test database is dropped
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, latencies, time.perf_counter() - started
@@ -0,0 +1,134 @@
+"""
+Read-through cache for the product and branch catalog.
+
+Stores the serialized lists (what /api/products/ and /api/branches/ return)
+and one entry per product and branch id in the 'catalog' cache (see
+CATALOG_CACHE in settings for the backend and its size limit). The entries
+for a product or branch, and the list it appears in, are removed by the
+post_save / post_delete signals once the change commits. bulk_create and
+queryset.update() do not send signals, so code that writes the catalog that
+way calls invalidate() itself.
+
+Removing an entry only reaches the cache the process uses, so the keys also
+carry the table's version stamp (versions.py), the one the view's ETag was
+made from: once a change commits, every worker looks for new keys and
+reloads, whichever process made it, and the ETag it sends is for what it
+actually serves. The
+entries left behind under old stamps expire or are culled. Views that write
+still check products and branches in the database.
+
+Hits and misses are counted per worker process; stats() returns them.
+"""
+import threading
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import versions
+from .models import Branch, Product
+from .serializers import BranchSerializer, ProductSerializer
+
+cache = caches['catalog']
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+# Per model: (cache key prefix, serializer, fields read for the list, version stamp table)
+_MODELS = {
+    Product: ('catalog:product', ProductSerializer, ('id', 'name', 'price'), versions.PRODUCT),
+    Branch: ('catalog:branch', BranchSerializer, ('id', 'name', 'location'), versions.BRANCH),
+}
+
+
+def _count(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def _get_or_load(key, load):
+    value = cache.get(key)
+    if value is not None:
+        _count(True)
+        return value
+    _count(False)
+    value = load()
+    cache.set(key, value)
+    return value
+
+
+def _stamp(model):
+    changes, _ = versions.stamp(_MODELS[model][3])
+    return changes
+
+
+def _list(model):
+    prefix, serializer_class, fields, _ = _MODELS[model]
+    return _get_or_load(
+        f'{prefix}s@{_stamp(model)}',
+        lambda: list(serializer_class(model.objects.filter(is_active=True).only(*fields), many=True).data),
+    )
+
+
+def _entry(model, pk):
+    """The serialized object with this id, or None if there is none. Raises ValueError for a bad id."""
+    pk = int(pk)
+    prefix, serializer_class, _, _ = _MODELS[model]
+
+    def load():
+        obj = model.objects.filter(id=pk, is_active=True).first()
+        # False marks "does not exist" (or deleted) so misses for unknown ids are cached too
+        return dict(serializer_class(obj).data) if obj is not None else False
+
+    return _get_or_load(f'{prefix}:{pk}@{_stamp(model)}', load) or None
+
+
+def product_list():
+    return _list(Product)
+
+
+def branch_list():
+    return _list(Branch)
+
+
+def product(pk):
+    return _entry(Product, pk)
+
+
+def branch(pk):
+    return _entry(Branch, pk)
+
+
+def invalidate(model, pks=()):
+    """
+    Drops the list and the given ids of a model once the current transaction
+    commits, for writes that do not touch() its version stamp.
+    """
+    prefix = _MODELS[model][0]
+
+    def drop():
+        stamp = _stamp(model)
+        cache.delete_many([f'{prefix}s@{stamp}'] + [f'{prefix}:{pk}@{stamp}' for pk in pks])
+
+    transaction.on_commit(drop)
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+        'backend': cache.__class__.__name__,
+    }
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def _catalog_changed(sender, instance, **kwargs):
+    invalidate(sender, [instance.pk])
@@ -0,0 +1,168 @@
+"""
+Change feed for branches, products and stock (/api/changes/).
+
+Branch, Product and Stock rows carry a version: the time of their last
+change in microseconds (and at least one more than before). Writers call
+stamp() for the rows they changed as the last step of their transaction, so
+no lock is shared between writers: two sales at different branches stamp
+different rows. Deletions are written as ChangeTombstone rows with a version
+taken the same way (deleted()).
+
+Without a shared lock, a transaction may commit after another one that
+stamped its rows later. The feed therefore only reads up to a horizon
+CHANGE_FEED_SETTLE_SECONDS in the past: a transaction commits well within
+that after its last statement, so once a client has read a table up to the
+horizon, no row can later show up there at or below it. Changes reach the
+feed that much later; the live stream (live.py) is the way to see them at
+once.
+
+Clients keep the opaque cursor the feed returns and send it back as
+?since=. Each table is read in (version, id) order from where the cursor
+left off, a bounded page at a time, so a sync costs as much as what changed
+rather than as much as the catalog. Tombstones are small and are kept, so
+old cursors stay valid.
+"""
+import time
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import pagination, versions
+from .models import Branch, ChangeTombstone, Product, Stock
+
+# Tables in the order a page is filled (branches and products before the stock that refers to them)
+TABLES = {versions.BRANCH: Branch, versions.PRODUCT: Product, versions.STOCK: Stock}
+_TABLE_OF = {model: table for table, model in TABLES.items()}
+
+# Columns sent for each table (same keys as the list endpoints, without the joined names)
+_COLUMNS = {
+    versions.BRANCH: {'id': 'id', 'name': 'name', 'location': 'location'},
+    versions.PRODUCT: {'id': 'id', 'name': 'name', 'price': 'price'},
+    versions.STOCK: {'id': 'id', 'branch': 'branch_id', 'product': 'product_id', 'quantity': 'quantity'},
+}
+
+# Id part of a cursor position that has read everything up to its version
+_END = 2 ** 63 - 1
+
+
+def _now():
+    return int(time.time() * 1_000_000)
+
+
+def stamp(queryset):
+    """Puts the rows at the head of the change feed. Call last in the transaction that changed them."""
+    queryset.update(version=Greatest(F('version') + 1, _now()), updated_at=timezone.now())
+
+
+def stamp_stock(pairs):
+    """stamp() for the Stock rows of these (branch_id, product_id) pairs."""
+    products_by_branch = {}
+    for branch_id, product_id in pairs:
+        products_by_branch.setdefault(branch_id, set()).add(product_id)
+    wanted = Q()
+    for branch_id, product_ids in products_by_branch.items():
+        wanted |= Q(branch_id=branch_id, product_id__in=product_ids)
+    if wanted:
+        stamp(Stock.objects.filter(wanted))
+
+
+def deleted(model, ids):
+    """Writes tombstones for `model` rows deleted in this transaction. Call last, like stamp()."""
+    ids = list(ids)
+    if not ids:
+        return
+    table = _TABLE_OF[model]
+    version = _now()
+    ChangeTombstone.objects.bulk_create(
+        [ChangeTombstone(table=table, object_id=pk, version=version) for pk in ids], batch_size=1000,
+    )
+
+
+def parse_cursor(value):
+    """{table: [version, id]} read from a ?since= cursor (the beginning if there is none). Raises ValueError."""
+    if not value:
+        return {table: [0, 0] for table in TABLES}
+    positions = pagination.decode_cursor(value)
+    if len(positions) != len(TABLES) or not all(
+        isinstance(position, list) and len(position) == 2 and all(type(n) is int for n in position)
+        for position in positions
+    ):
+        raise ValueError('Invalid cursor')
+    return dict(zip(TABLES, positions))
+
+
+def encode_cursor(positions):
+    return pagination.encode_cursor([positions[table] for table in TABLES])
+
+
+def _after(version_field, id_field, position):
+    version, last_id = position
+    return Q(**{f'{version_field}__gt': version}) | Q(**{version_field: version, f'{id_field}__gt': last_id})
+
+
+def _data(columns, row):
+    data = {key: row[column] for key, column in columns.items()}
+    if 'price' in data:
+        data['price'] = str(data['price'])  # As the other endpoints render decimals
+    return data
+
+
+def _read(table, position, horizon, size):
+    """Up to size changes to one table after position and at or before horizon, oldest first."""
+    columns = _COLUMNS[table]
+    rows = TABLES[table].objects.filter(_after('version', 'id', position), version__lte=horizon)
+    if table != versions.STOCK:
+        rows = rows.filter(is_active=True)  # Deleted ones come as tombstones
+    found = [
+        {
+            'table': table,
+            'op': 'upsert',
+            'id': row['id'],
+            'version': row['version'],
+            'updated_at': row['updated_at'],
+            'data': _data(columns, row),
+        }
+        for row in rows.order_by('version', 'id').values('version', 'updated_at', *columns.values())[:size]
+    ]
+    tombstones = ChangeTombstone.objects.filter(table=table, version__lte=horizon).filter(
+        _after('version', 'object_id', position)
+    )
+    found.extend(
+        {'table': table, 'op': 'delete', 'id': object_id, 'version': version, 'deleted_at': deleted_at}
+        for object_id, version, deleted_at in tombstones.order_by('version', 'object_id').values_list(
+            'object_id', 'version', 'deleted_at'
+        )[:size]
+    )
+    found.sort(key=lambda change: (change['version'], change['id']))
+    return found[:size]
+
+
+def feed(positions, limit):
+    """
+    Returns (changes, positions, has_more) for one page of at most `limit`
+    changes after the given positions. has_more means another page can be
+    read at once with the returned positions.
+    """
+    horizon = _now() - int(settings.CHANGE_FEED_SETTLE_SECONDS * 1_000_000)
+    positions = dict(positions)
+    changes = []
+    for table in TABLES:
+        if positions[table] >= [horizon, _END]:
+            continue  # Read up to the horizon already
+        room = limit - len(changes)
+        if room == 0:
+            return changes, positions, True
+        # One row more than fits tells whether the table has more
+        found = _read(table, positions[table], horizon, room + 1)
+        if len(found) > room:
+            changes.extend(found[:room])
+            positions[table] = [changes[-1]['version'], changes[-1]['id']]
+            return changes, positions, True
+        changes.extend(found)
+        # Everything up to the horizon has committed and has now been seen
+        positions[table] = max(positions[table], [horizon, _END])
+        if found:
+            positions[table] = max(positions[table], [found[-1]['version'], found[-1]['id']])
+    return changes, positions, False
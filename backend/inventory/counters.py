@@ -0,0 +1,218 @@
+"""
+Incrementally maintained totals for the dashboard summary.
+
+The write views call bump() inside their own transaction, so the counters
+always describe the rows that were committed with them. rebuild() recomputes
+everything from the real tables (used by the rebuild_counters command after
+manual edits through the admin).
+
+Every write adds to the same few totals, so each counter is split over
+SHARDS rows ("sales", "sales#1" ... "sales#15") and a writer only updates
+the row of its own shard: concurrent transactions in different threads
+usually lock different rows instead of queueing on one. A thread keeps its
+shard, so all the bumps of one transaction use the same one, and bump()
+locks them in name order (like versions.touch()), so two transactions that
+do share a shard cannot deadlock. Reads add the shards up.
+
+Only today's "sales_on:<day>" bucket is read, so the first write to a new
+day's bucket (in each shard) deletes the earlier days' rows, and rebuild()
+starts the buckets over.
+"""
+import random
+import threading
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, F, Q, Sum, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Branch, DashboardCounter, Product, Sale, SaleArchive, Stock
+
+# Counter keys
+PRODUCTS = 'products'
+BRANCHES = 'branches'
+STOCK_ITEMS = 'stock_items'
+UNITS_ON_HAND = 'units_on_hand'
+SALES = 'sales'
+SALES_ON_PREFIX = 'sales_on:'
+# Bumped whenever a past day's sales rollup changes (invalidates cached analytics)
+ROLLUP_GENERATION = 'rollup_generation'
+
+SHARDS = 16  # Rows per counter
+_thread = threading.local()
+
+
+def local_day(value=None):
+    """Returns the local calendar day of a datetime (or of now if not given)."""
+    if value is None:
+        value = timezone.now()
+    if settings.USE_TZ and timezone.is_aware(value):
+        return timezone.localtime(value).date()
+    return value.date()
+
+
+def day_bounds(day):
+    """Returns the [start, end) datetimes covering a calendar day."""
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+        end = timezone.make_aware(end)
+    return start, end
+
+
+def sales_on_key(day):
+    """Counter key holding the number of sales recorded on a given day."""
+    return f'{SALES_ON_PREFIX}{day.isoformat()}'
+
+
+def _shard_name(name, shard):
+    return name if shard == 0 else f'{name}#{shard}'
+
+
+def _shard():
+    if not hasattr(_thread, 'shard'):
+        _thread.shard = random.randrange(SHARDS)
+    return _thread.shard
+
+
+def _write(values, initial):
+    """
+    Sets this thread's shard of each counter to values[name] (an expression
+    of F('value')) with one UPDATE, which locks the rows in name (index)
+    order, and creates the rows that do not exist yet with initial[name].
+    """
+    shard = _shard()
+    rows = {_shard_name(name, shard): name for name in values}
+    updated = DashboardCounter.objects.filter(name__in=rows).update(
+        value=Case(
+            *(When(name=row, then=values[name]) for row, name in rows.items()),
+            default=F('value'),
+            output_field=BigIntegerField(),
+        )
+    )
+    if updated == len(rows):
+        return
+    # First write to some of them (e.g., the first sale of the day)
+    existing = set(DashboardCounter.objects.filter(name__in=rows).values_list('name', flat=True))
+    for row in sorted(set(rows) - existing):
+        name = rows[row]
+        try:
+            with transaction.atomic():
+                DashboardCounter.objects.create(name=row, value=initial[name])
+        except IntegrityError:
+            # Another request created it first, so just update it
+            DashboardCounter.objects.filter(name=row).update(value=values[name])
+        if name.startswith(SALES_ON_PREFIX):
+            # A new day's bucket: the earlier days' ones are never read again
+            DashboardCounter.objects.filter(name__startswith=SALES_ON_PREFIX, name__lt=name).delete()
+
+
+def bump(deltas):
+    """
+    Adds {counter_name: delta} to this thread's shard of each counter with
+    one UPDATE. Must be called inside the transaction that made the
+    matching change.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        _write({name: F('value') + delta for name, delta in deltas.items()}, deltas)
+
+
+def advance(names, at_least):
+    """
+    Raises this thread's shard of each counter by one, and to at least
+    at_least, with one UPDATE (the version stamps in versions.py).
+    """
+    if names:
+        _write(dict.fromkeys(names, Greatest(F('value') + 1, at_least)), dict.fromkeys(names, at_least))
+
+
+def sale_deltas(sale, sign=1):
+    """Counter deltas for recording (sign=1) or deleting (sign=-1) a sale."""
+    deltas = {SALES: sign, UNITS_ON_HAND: -sign * sale.quantity}
+    # Only today's bucket is ever read, so older days are left alone
+    day = local_day(sale.date)
+    if day == local_day():
+        deltas[sales_on_key(day)] = sign
+    return deltas
+
+
+def sales_deltas(sales, sign=1):
+    """Combined counter deltas for a batch of sales."""
+    deltas = {}
+    for sale in sales:
+        for name, delta in sale_deltas(sale, sign).items():
+            deltas[name] = deltas.get(name, 0) + delta
+    return deltas
+
+
+def sales_removal_deltas(sales):
+    """
+    Counter deltas for deleting the rows of a Sale or SaleArchive queryset
+    (archived sales count as sales too), as the purge of a deleted branch or
+    product does a chunk at a time.
+    """
+    today = local_day()
+    start, end = day_bounds(today)
+    totals = sales.aggregate(rows=Count('id'), today=Count('id', filter=Q(date__gte=start, date__lt=end)))
+    return {SALES: -totals['rows'], sales_on_key(today): -totals['today']}
+
+
+def read_shards(names):
+    """Returns {counter_name: [value of each shard written so far]} with one query."""
+    shards = {_shard_name(name, shard): name for name in names for shard in range(SHARDS)}
+    values = {name: [] for name in names}
+    for shard_name, value in DashboardCounter.objects.filter(name__in=shards).values_list('name', 'value'):
+        values[shards[shard_name]].append(value)
+    return values
+
+
+def read(names):
+    """Returns {counter_name: value} (the sum of its shards, 0 if never written) with one query."""
+    return {name: sum(values) for name, values in read_shards(names).items()}
+
+
+def summary():
+    """Returns the dashboard totals with a single query on the counters table."""
+    today_key = sales_on_key(local_day())
+    values = read([PRODUCTS, BRANCHES, STOCK_ITEMS, UNITS_ON_HAND, SALES, today_key])
+    return {
+        'total_products': values.get(PRODUCTS, 0),
+        'total_branches': values.get(BRANCHES, 0),
+        'total_stock_items': values.get(STOCK_ITEMS, 0),
+        'total_units': values.get(UNITS_ON_HAND, 0),
+        'total_sales': values.get(SALES, 0),
+        'sales_today': values.get(today_key, 0),
+    }
+
+
+@transaction.atomic
+def rebuild():
+    """Recomputes every counter from the real tables."""
+    today = local_day()
+    start, end = day_bounds(today)
+    # Sales of deleted branches and products count until their purge deletes them (see purge.py)
+    sales = Sale.objects.all()
+    archived = SaleArchive.objects.all()
+    values = {
+        PRODUCTS: Product.objects.filter(is_active=True).count(),
+        BRANCHES: Branch.objects.filter(is_active=True).count(),
+        STOCK_ITEMS: Stock.objects.count(),
+        UNITS_ON_HAND: Stock.objects.aggregate(total=Sum('quantity'))['total'] or 0,
+        SALES: sales.count() + archived.count(),
+        sales_on_key(today): sales.filter(date__gte=start, date__lt=end).count(),
+    }
+    DashboardCounter.objects.filter(name__startswith=SALES_ON_PREFIX).delete()
+    for name, value in values.items():
+        # The whole total goes to the first shard; the others are kept at 0 so writers find their row
+        for shard in range(SHARDS):
+            DashboardCounter.objects.update_or_create(
+                name=_shard_name(name, shard), defaults={'value': value if shard == 0 else 0}
+            )
+    # The generation cannot be recounted and keeps its value, but gets all its shards too
+    for shard in range(SHARDS):
+        DashboardCounter.objects.get_or_create(name=_shard_name(ROLLUP_GENERATION, shard))
+    return values
@@ -0,0 +1,67 @@
+"""
+Streaming export of the sales history as CSV or NDJSON.
+
+Rows are read as plain tuples (values_list, no model instances) in batches
+of EXPORT_BATCH_SIZE, each batch continuing from the last id of the previous
+one. Batching by id instead of a single .iterator() keeps memory flat on
+MySQL too, where the driver buffers the whole result of a query client-side.
+Each batch is turned into text and sent before the next one is read.
+"""
+import csv
+import io
+import json
+
+from rest_framework import serializers
+
+EXPORT_BATCH_SIZE = 2000
+
+# Same columns, in the same order, as SaleSerializer
+SALE_COLUMNS = ('id', 'branch_name', 'product_name', 'quantity', 'date', 'branch', 'product')
+_SALE_VALUES = ('id', 'branch__name', 'product__name', 'quantity', 'date', 'branch_id', 'product_id')
+
+
+def iter_sale_batches(*querysets, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields lists of row tuples (in SALE_COLUMNS order) for every sale in the
+    querysets, one queryset after the other (e.g. the archived sales, then the current ones).
+    """
+    for queryset in querysets:
+        rows = queryset.order_by('id').values_list(*_SALE_VALUES)
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            yield batch
+            last_id = batch[-1][0]
+
+
+def _format_dates(batch):
+    # Dates are written exactly as the API renders them
+    render_date = serializers.DateTimeField().to_representation
+    date_index = SALE_COLUMNS.index('date')
+    for row in batch:
+        row = list(row)
+        row[date_index] = render_date(row[date_index])
+        yield row
+
+
+def csv_stream(*querysets):
+    """Yields the CSV export: the header line first, then one chunk of text per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SALE_COLUMNS)
+    yield buffer.getvalue()
+    for batch in iter_sale_batches(*querysets):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_format_dates(batch))
+        yield buffer.getvalue()
+
+
+def ndjson_stream(*querysets):
+    """Yields the NDJSON export: one JSON object per line, one chunk of text per batch."""
+    for batch in iter_sale_batches(*querysets):
+        yield ''.join(
+            json.dumps(dict(zip(SALE_COLUMNS, row)), ensure_ascii=False) + '\n' for row in _format_dates(batch)
+        )
@@ -0,0 +1,68 @@
+"""
+Sparse fieldsets (?fields=) and expansions (?expand=) for the read endpoints.
+
+Without either parameter an endpoint returns every column, as before:
+
+    /api/stock/                      id, branch_name, product_name, quantity, branch, product
+
+With one of them the response only has the columns asked for, and the branch
+and product names (which need a join) are only added when expanded:
+
+    /api/stock/?fields=id,quantity   id, quantity                   (no join)
+    /api/stock/?expand=product       id, product_name, quantity, branch, product
+    /api/sales/?fields=id,date&expand=branch   id, branch_name, date
+
+Columns keep the serializer's order. Invalid names raise ValueError.
+"""
+
+# Per resource: every column in serializer order, and the relation -> name column map
+RESOURCES = {
+    'product': (('id', 'name', 'price'), {}),
+    'branch': (('id', 'name', 'location'), {}),
+    'stock': (
+        ('id', 'branch_name', 'product_name', 'quantity', 'branch', 'product'),
+        {'branch': 'branch_name', 'product': 'product_name'},
+    ),
+    'sale': (
+        ('id', 'branch_name', 'product_name', 'quantity', 'date', 'branch', 'product'),
+        {'branch': 'branch_name', 'product': 'product_name'},
+    ),
+}
+
+
+def _names(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def columns(params, resource):
+    """Returns the tuple of columns to send for this request."""
+    all_columns, expansions = RESOURCES[resource]
+    fields = _names(params, 'fields')
+    expand = _names(params, 'expand')
+    if fields is None and expand is None:
+        return all_columns
+
+    unknown = [name for name in expand or () if name not in expansions]
+    if unknown:
+        allowed = ', '.join(expansions) or 'nothing'
+        raise ValueError(f"Cannot expand {', '.join(unknown)} (can expand: {allowed})")
+
+    joined = set(expansions.values())
+    plain = [column for column in all_columns if column not in joined]
+    if fields is None:
+        wanted = set(plain)
+    else:
+        unknown = [name for name in fields if name not in all_columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(all_columns)})")
+        wanted = set(fields)
+    wanted.update(expansions[name] for name in expand or ())
+    return tuple(column for column in all_columns if column in wanted)
+
+
+def project(rows, wanted):
+    """Keeps only the wanted columns of already serialized rows (e.g. from the catalog cache)."""
+    return [{column: row[column] for column in wanted} for row in rows]
@@ -0,0 +1,209 @@
+"""
+Bulk import of products and opening stock (used by /api/import/catalog/ and
+the import_catalog command).
+
+Each input row names a branch, a product and the opening quantity:
+
+    branch,location,product,price,quantity
+    Main Store,12 High St,Laptop,999.00,25
+
+Rows are read one at a time and handled in batches. For each batch the
+branch and product names are resolved against an in-memory name -> ID map
+(unknown names are looked up with one query per table, and the ones that
+still don't exist are created with bulk_create), then the Stock rows are
+upserted with a single bulk_create(update_conflicts=True). Existing products
+keep their price; existing stock is set to the imported quantity, and the
+difference is written to the stock movement ledger.
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+
+from . import catalog_cache, changes, counters, ledger, versions
+from .models import Branch, Product, Stock, StockMovement
+from .streams import iter_lines, iter_ndjson
+
+BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 100  # Only the first errors are returned, to keep the report small
+NAME_MAX_LENGTH = 100
+
+
+class RowError(ValueError):
+    """A single input row is invalid; the message is reported back with its row number."""
+
+
+def read_csv(stream):
+    """Yields (record, error) for every row of a CSV body with a header line."""
+    lines = (line + '\n' for line in iter_lines(stream))
+    for record in csv.DictReader(lines):
+        yield {key.strip().lower(): (value or '').strip() for key, value in record.items() if key}, None
+
+
+def read_records(stream, content_type):
+    """Picks the reader for the upload format ('text/csv' or NDJSON)."""
+    if content_type in ('text/csv', 'application/csv', 'csv'):
+        return read_csv(stream)
+    return iter_ndjson(stream)
+
+
+def _clean(record):
+    """Validates one input row and returns (branch, location, product, price, quantity)."""
+    branch = str(record.get('branch') or '').strip()
+    product = str(record.get('product') or '').strip()
+    if not branch or not product:
+        raise RowError('branch and product are required')
+    if len(branch) > NAME_MAX_LENGTH or len(product) > NAME_MAX_LENGTH:
+        raise RowError(f'Names must be at most {NAME_MAX_LENGTH} characters')
+
+    price = record.get('price')
+    if price in (None, ''):
+        price = None
+    else:
+        try:
+            price = Decimal(str(price)).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise RowError('Invalid price')
+        if price < 0 or price >= Decimal('100000000'):
+            raise RowError('Invalid price')
+
+    try:
+        quantity = int(record.get('quantity') or 0)
+    except (TypeError, ValueError):
+        raise RowError('Quantity must be a valid number')
+    if quantity < 0:
+        raise RowError('Quantity cannot be negative')
+
+    location = str(record.get('location') or '').strip()[:200]
+    return branch, location, product, price, quantity
+
+
+class CatalogImporter:
+    """Keeps the name -> ID maps between batches so each name is resolved once per import."""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.branch_ids = {}
+        self.product_ids = {}
+        self.report = {
+            'rows': 0,
+            'branches_created': 0,
+            'products_created': 0,
+            'stock_upserted': 0,
+            'errors': [],
+            'error_count': 0,
+        }
+
+    def run(self, records):
+        """Imports every (record, error) pair and returns the report."""
+        batch = []
+        for record, error in records:
+            self.report['rows'] += 1
+            row_number = self.report['rows']
+            if error is None:
+                try:
+                    batch.append(_clean(record))
+                except RowError as e:
+                    error = str(e)
+            if error is not None:
+                self._error(row_number, error)
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return self.report
+
+    def _error(self, row_number, message):
+        self.report['error_count'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'row': row_number, 'error': message})
+
+    def _resolve(self, model, cache, wanted, build):
+        """
+        Fills cache with name -> id for every name in wanted, creating the
+        missing ones with build(name). Returns the ids of the ones created.
+        """
+        missing = [name for name in wanted if name not in cache]
+        if not missing:
+            return []
+        # If a name is used more than once, the oldest record wins; deleted ones are never reused
+        for pk, name in model.objects.filter(name__in=missing, is_active=True).order_by('-id').values_list('id', 'name'):
+            cache[name] = pk
+        to_create = [name for name in missing if name not in cache]
+        if not to_create:
+            return []
+        model.objects.bulk_create([build(name) for name in to_create])
+        # MySQL does not return ids from a bulk INSERT, so read them back
+        for pk, name in model.objects.filter(name__in=to_create).order_by('-id').values_list('id', 'name'):
+            cache.setdefault(name, pk)
+        return [cache[name] for name in to_create]
+
+    @transaction.atomic
+    def _import_batch(self, rows):
+        locations = {}
+        prices = {}
+        for branch, location, product, price, quantity in rows:
+            locations.setdefault(branch, location)
+            if price is not None:
+                prices.setdefault(product, price)
+
+        new_branches = self._resolve(
+            Branch, self.branch_ids, locations,
+            lambda name: Branch(name=name, location=locations[name]),
+        )
+        new_products = self._resolve(
+            Product, self.product_ids, {product for _, _, product, _, _ in rows},
+            lambda name: Product(name=name, price=prices.get(name, Decimal('0.00'))),
+        )
+        branches_created, products_created = len(new_branches), len(new_products)
+        # bulk_create sends no post_save signals, so clear the cached lists here
+        if branches_created:
+            catalog_cache.invalidate(Branch)
+        if products_created:
+            catalog_cache.invalidate(Product)
+        self.report['branches_created'] += branches_created
+        self.report['products_created'] += products_created
+
+        # Later rows for the same branch and product win
+        quantities = {}
+        for branch, _, product, _, quantity in rows:
+            quantities[(self.branch_ids[branch], self.product_ids[product])] = quantity
+
+        # Current quantities, to keep the dashboard counters exact
+        branch_ids = {branch_id for branch_id, _ in quantities}
+        product_ids = {product_id for _, product_id in quantities}
+        existing = {
+            (branch_id, product_id): quantity
+            for branch_id, product_id, quantity in Stock.objects.select_for_update()
+            .filter(branch_id__in=branch_ids, product_id__in=product_ids)
+            .values_list('branch_id', 'product_id', 'quantity')
+            if (branch_id, product_id) in quantities
+        }
+
+        options = {'update_conflicts': True, 'update_fields': ['quantity']}
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['branch', 'product']
+        Stock.objects.bulk_create(
+            [
+                Stock(branch_id=branch_id, product_id=product_id, quantity=quantity)
+                for (branch_id, product_id), quantity in quantities.items()
+            ],
+            **options,
+        )
+        self.report['stock_upserted'] += len(quantities)
+
+        ledger.record_many(
+            (branch_id, product_id, quantity - existing.get((branch_id, product_id), 0), StockMovement.IMPORT)
+            for (branch_id, product_id), quantity in quantities.items()
+        )
+        counters.bump({
+            counters.BRANCHES: branches_created,
+            counters.PRODUCTS: products_created,
+            counters.STOCK_ITEMS: len(quantities) - len(existing),
+            counters.UNITS_ON_HAND: sum(quantities.values()) - sum(existing.values()),
+        })
+        versions.touch(versions.BRANCH, versions.PRODUCT, versions.STOCK)
+        changes.stamp(Branch.objects.filter(id__in=new_branches))
+        changes.stamp(Product.objects.filter(id__in=new_products))
+        changes.stamp_stock(quantities)
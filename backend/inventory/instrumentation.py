@@ -0,0 +1,138 @@
+"""
+Per-request timing for the API (settings: PERF_TIMING, PERF_TIMING_SAMPLE_RATE).
+
+For a sampled /api/ request, ServerTimingMiddleware records:
+
+    db         time spent in database queries, and how many ran
+               (observe_queries())
+    serialize  time spent turning rows into response data (measured with
+               measure('serialize') around serializer.data and the fast path)
+    render     time spent encoding the response body (measured in the renderers)
+    total      the whole request, as seen by the middleware
+
+It sends them in a Server-Timing header, which browser dev tools show under
+the request's Timing tab, and logs one JSON line per request on the
+'inventory.perf' logger. Requests that are not sampled pay for one random()
+call. Queries run by streaming responses after the view returns are not
+counted.
+
+The timing, the slow-query recorder (slow_queries.py) and the per-view
+metrics (metrics.py) all need every statement a request runs. Rather than
+each installing its own connection.execute_wrapper, which would time every
+statement three times over, they pass a listener to observe_queries(): the
+outermost call installs one wrapper that times each statement once and
+hands (sql, params, many, seconds, ok) to every listener of the request.
+"""
+import contextlib
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('inventory.perf')
+
+_current = ContextVar('inventory_request_timings', default=None)
+_listeners = ContextVar('inventory_query_listeners', default=None)
+
+
+def _observe(execute, sql, params, many, context):
+    started = time.perf_counter()
+    ok = False
+    try:
+        result = execute(sql, params, many, context)
+        ok = True
+        return result
+    finally:
+        seconds = time.perf_counter() - started
+        for listener in _listeners.get() or ():
+            listener(sql, params, many, seconds, ok)
+
+
+@contextlib.contextmanager
+def observe_queries(listener):
+    """
+    Calls listener(sql, params, many, seconds, ok) after every statement run
+    on this thread's connection inside the block (ok is False if it raised).
+    Nested calls share the wrapper installed by the outermost one.
+    """
+    listeners = _listeners.get()
+    if listeners is not None:
+        listeners.append(listener)
+        try:
+            yield
+        finally:
+            listeners.remove(listener)
+        return
+    token = _listeners.set([listener])
+    try:
+        with connection.execute_wrapper(_observe):
+            yield
+    finally:
+        _listeners.reset(token)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+        self.queries = 0
+
+    def record_query(self, sql, params, many, seconds, ok):
+        self.durations['db'] += seconds
+        self.queries += 1
+
+
+@contextlib.contextmanager
+def measure(name):
+    """Adds the time spent in the block to the current request's timing (no-op when not sampled)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] = timings.durations.get(name, 0.0) + time.perf_counter() - started
+
+
+class ServerTimingMiddleware:
+    """Records where /api/ requests spend their time; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_TIMING', False)
+        self.sample_rate = getattr(settings, 'PERF_TIMING_SAMPLE_RATE', 0.01)
+
+    def __call__(self, request):
+        if not (self.enabled and request.path.startswith('/api/') and random.random() < self.sample_rate):
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with observe_queries(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - timings.started
+        milliseconds = {name: round(seconds * 1000, 2) for name, seconds in timings.durations.items()}
+        milliseconds['total'] = round(total * 1000, 2)
+
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration}' + (f';desc="{timings.queries} queries"' if name == 'db' else '')
+            for name, duration in milliseconds.items()
+        )
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timings.queries,
+            **{f'{name}_ms': duration for name, duration in milliseconds.items()},
+        }))
+        return response
@@ -0,0 +1,145 @@
+"""
+Stock movement ledger and point-in-time stock.
+
+Every view that changes a Stock quantity also calls record() (or
+record_sales()) inside the same transaction, so the StockMovement rows of a
+branch and product always add up to its Stock.quantity. The movements are
+also pushed to the live stock streams once the transaction commits (live.py). Movements are only
+ever inserted: "what was on hand at time T" is the sum of the movements
+made up to T.
+
+Summing a branch's whole history would get slower as the ledger grows, so
+take_snapshot() (run periodically by the snapshot_stock command) stores the
+branch's quantities together with the id of the newest movement they
+include. stock_as_of() starts from the nearest snapshot taken at or before T
+and adds only the movements after it.
+
+A snapshot first locks the branch's Stock rows (SELECT ... FOR UPDATE), the
+same rows every quantity change updates before writing its movement, so all
+movements of in-flight changes have committed before the newest movement id
+is read. The ledger starts with an opening movement for the stock that
+existed when it was introduced; earlier times have no history.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import live, pagination
+from .models import Stock, StockMovement, StockSnapshot, StockSnapshotItem
+
+
+def record(branch_id, product_id, delta, reason, sale=None):
+    """Writes one movement (nothing if delta is 0). Call inside the transaction that changed the stock."""
+    if delta:
+        StockMovement.objects.create(
+            branch_id=branch_id, product_id=product_id, delta=delta, reason=reason, sale=sale
+        )
+        live.publish([(branch_id, product_id, delta, reason)])
+
+
+def record_many(movements):
+    """Writes [(branch_id, product_id, delta, reason)] with one bulk INSERT, skipping zero deltas."""
+    movements = [movement for movement in movements if movement[2]]
+    StockMovement.objects.bulk_create([
+        StockMovement(branch_id=branch_id, product_id=product_id, delta=delta, reason=reason)
+        for branch_id, product_id, delta, reason in movements
+    ])
+    live.publish(movements)
+
+
+def record_sales(sales, sign=-1):
+    """Writes one movement per sale: units out when recorded (sign=-1), back in when deleted (sign=1)."""
+    reason = StockMovement.SALE if sign < 0 else StockMovement.SALE_DELETED
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            branch_id=sale.branch_id,
+            product_id=sale.product_id,
+            delta=sign * sale.quantity,
+            reason=reason,
+            sale_id=sale.pk,
+        )
+        for sale in sales
+    ])
+    live.publish((sale.branch_id, sale.product_id, sign * sale.quantity, reason) for sale in sales)
+
+
+@transaction.atomic
+def take_snapshot(branch_id):
+    """Stores the branch's current quantities as a snapshot and returns it."""
+    quantities = list(
+        Stock.objects.select_for_update()
+        .filter(branch_id=branch_id)
+        .order_by('id')
+        .values_list('product_id', 'quantity')
+    )
+    last_movement_id = (
+        StockMovement.objects.filter(branch_id=branch_id).aggregate(last=Max('id'))['last'] or 0
+    )
+    snapshot = StockSnapshot.objects.create(
+        branch_id=branch_id, taken_at=timezone.now(), last_movement_id=last_movement_id
+    )
+    StockSnapshotItem.objects.bulk_create(
+        [
+            StockSnapshotItem(snapshot=snapshot, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities
+        ],
+        batch_size=1000,
+    )
+    return snapshot
+
+
+def stock_as_of(branch_id, when, product_id=None):
+    """
+    Returns (snapshot, movements_applied, {product_id: quantity}) for what was
+    on hand at a branch at time `when`, optionally for one product. snapshot
+    is the one the result started from (None if there was none before
+    `when`). Products can appear with 0 (sold out, or stock removed).
+    """
+    snapshots = StockSnapshot.objects.filter(branch_id=branch_id)
+    snapshot = snapshots.filter(taken_at__lte=when).order_by('-taken_at', '-id').first()
+    # Movements after the next snapshot were all made after it, so after `when`
+    following = snapshots.filter(taken_at__gt=when).order_by('taken_at', 'id').first()
+
+    quantities = {}
+    if snapshot is not None:
+        items = snapshot.items.all()
+        if product_id is not None:
+            items = items.filter(product_id=product_id)
+        quantities = dict(items.values_list('product_id', 'quantity'))
+
+    movements = StockMovement.objects.filter(branch_id=branch_id, created_at__lte=when)
+    if snapshot is not None:
+        movements = movements.filter(id__gt=snapshot.last_movement_id)
+    if following is not None:
+        movements = movements.filter(id__lte=following.last_movement_id)
+    if product_id is not None:
+        movements = movements.filter(product_id=product_id)
+
+    applied = 0
+    for moved_product_id, total, count in (
+        movements.values('product_id')
+        .annotate(total=Sum('delta'), count=Count('id'))
+        .order_by()
+        .values_list('product_id', 'total', 'count')
+    ):
+        quantities[moved_product_id] = quantities.get(moved_product_id, 0) + total
+        applied += count
+    return snapshot, applied, quantities
+
+
+
+def parse_query(params):
+    """Reads ?branch= (required), ?product= and ?at= (a datetime, or a date meaning the end of that day; default now)."""
+    branch_id = pagination.parse_id(params, 'branch')
+    if branch_id is None:
+        raise ValueError('branch is required')
+    when = timezone.now()
+    at = params.get('at')
+    if at:
+        when = pagination.parse_moment(at, 'at', end_of_day=True)
+        if parse_date(at) is not None:
+            when -= timedelta(microseconds=1)  # Movements are counted up to and including `when`
+    return {'branch': branch_id, 'product': pagination.parse_id(params, 'product'), 'at': when}
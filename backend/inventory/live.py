@@ -0,0 +1,200 @@
+"""
+Live stock updates over Server-Sent Events (/api/stock/live/).
+
+Every stock quantity change goes through the ledger (ledger.py), which hands
+its movements to publish(). publish() adds them up per branch, product and
+reason and sends them with transaction.on_commit(), so a stream never shows
+a change that was rolled back, and shows a committed one once.
+
+A stream is an async generator served by the ASGI app (asgi.py, started with
+SERVER_MODE=asgi; see gunicorn.conf.py). An idle stream is only a queue on
+the worker's event loop, so thousands of open connections cost memory, not
+threads. Under the WSGI app every open stream would hold a sync worker for
+as long as it stays open, so the view refuses to stream there.
+
+Events reach the streams of the same process directly. With more than one
+process (several workers, or the API on WSGI workers and the streams on an
+ASGI one), set LIVE_STOCK_REDIS_URL: writers then publish to a Redis channel
+and every ASGI process subscribes to it once, for all its streams.
+gunicorn.conf.py refuses to start several ASGI workers without it, and a
+process serving streams without it logs a warning when the first one opens.
+
+A stream that falls LIVE_STOCK_QUEUE_SIZE events behind, or misses events
+because the Redis subscription dropped, gets a "resync" event and is closed:
+the client reloads the stock (or catches up through /api/changes/) and
+reconnects. Django 4.2 does not tell a streaming response that its client
+went away, so streams also end after LIVE_STOCK_MAX_SECONDS; EventSource
+reconnects by itself.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger('inventory.live')
+
+CHANNEL = 'inventory:stock'
+
+# Streams open in this process: {branch_id or None (all branches): {Subscription, ...}}
+_subscriptions = {}
+_lock = threading.Lock()
+_listener = None
+_redis = None
+_warned = False
+
+
+class Subscription:
+    """One open stream: a queue on the event loop it is served from."""
+
+    def __init__(self, branch_id):
+        self.branch_id = branch_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.behind = False  # Events were dropped; the client must reload
+
+    def offer(self, events):
+        # Runs on self.loop
+        if self.queue.qsize() >= settings.LIVE_STOCK_QUEUE_SIZE:
+            self.behind = True
+        self.queue.put_nowait(events)
+
+
+def publish(movements):
+    """
+    Sends [(branch_id, product_id, delta, reason)] to the live streams once
+    the current transaction commits (at once outside a transaction).
+    """
+    totals = {}
+    for branch_id, product_id, delta, reason in movements:
+        key = (branch_id, product_id, reason)
+        totals[key] = totals.get(key, 0) + delta
+    events = [
+        {'branch': branch_id, 'product': product_id, 'delta': delta, 'reason': reason}
+        for (branch_id, product_id, reason), delta in totals.items()
+        if delta
+    ]
+    if events:
+        transaction.on_commit(lambda: _send(events))
+
+
+def _send(events):
+    # Runs after the commit: a failure here must not turn the saved request into an error
+    try:
+        if settings.LIVE_STOCK_REDIS_URL:
+            _client().publish(CHANNEL, json.dumps(events))
+        else:
+            dispatch(events)
+    except Exception:
+        logger.exception('Publishing %d live stock events failed', len(events))
+
+
+def _client():
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(settings.LIVE_STOCK_REDIS_URL)
+    return _redis
+
+
+def dispatch(events):
+    """Hands events to the streams open in this process. Safe to call from any thread."""
+    by_branch = {}
+    for event in events:
+        by_branch.setdefault(event['branch'], []).append(event)
+    with _lock:
+        targets = [(subscription, events) for subscription in _subscriptions.get(None, ())]
+        for branch_id, branch_events in by_branch.items():
+            targets.extend((subscription, branch_events) for subscription in _subscriptions.get(branch_id, ()))
+    for subscription, wanted in targets:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.offer, wanted)
+        except RuntimeError:
+            pass  # Its event loop has closed; the stream is gone
+
+
+def _resync_all():
+    with _lock:
+        subscriptions = [subscription for group in _subscriptions.values() for subscription in group]
+    for subscription in subscriptions:
+        subscription.behind = True
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, [])
+        except RuntimeError:
+            pass
+
+
+async def _listen():
+    import redis.asyncio
+    client = redis.asyncio.Redis.from_url(settings.LIVE_STOCK_REDIS_URL)
+    while True:
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        dispatch(json.loads(message['data']))
+        except Exception:
+            logger.exception('Live stock subscription failed; reconnecting')
+            _resync_all()  # Whatever was published in between is lost
+            await asyncio.sleep(1)
+
+
+def _subscribe(branch_id):
+    global _listener, _warned
+    subscription = Subscription(branch_id)
+    with _lock:
+        _subscriptions.setdefault(branch_id, set()).add(subscription)
+    if not settings.LIVE_STOCK_REDIS_URL and not _warned:
+        _warned = True
+        logger.warning(
+            'LIVE_STOCK_REDIS_URL is not set: live stock streams only receive the changes made by '
+            'this process (pid %d); changes made by other workers or servers are missed', os.getpid()
+        )
+    if settings.LIVE_STOCK_REDIS_URL and (_listener is None or _listener.get_loop() is not subscription.loop):
+        _listener = subscription.loop.create_task(_listen())
+    return subscription
+
+
+def _unsubscribe(subscription):
+    with _lock:
+        group = _subscriptions.get(subscription.branch_id, set())
+        group.discard(subscription)
+        if not group:
+            _subscriptions.pop(subscription.branch_id, None)
+
+
+def _event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+async def stream(branch_id=None):
+    """
+    The SSE body for one client: a "ready" event, then a "stock" event per
+    change ({"branch", "product", "delta", "reason"}) for one branch or all,
+    with a comment line every LIVE_STOCK_KEEPALIVE seconds so proxies keep
+    the connection open.
+    """
+    subscription = _subscribe(branch_id)
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + settings.LIVE_STOCK_MAX_SECONDS
+    try:
+        yield 'retry: 3000\n' + _event('ready', {'branch': branch_id})
+        while True:
+            timeout = min(settings.LIVE_STOCK_KEEPALIVE, ends_at - loop.time())
+            if timeout <= 0:
+                return
+            try:
+                events = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if subscription.behind:
+                yield _event('resync', {})
+                return
+            yield ''.join(_event('stock', event) for event in events)
+    finally:
+        _unsubscribe(subscription)
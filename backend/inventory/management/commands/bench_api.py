@@ -0,0 +1,263 @@
+import json
+import platform
+import random
+import time
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventory import counters, rollups, versions
+from inventory.benchmarks import latency_summary, run_concurrently, throwaway_database
+from inventory.counters import local_day
+from inventory.models import Branch, Product, Sale, Stock
+
+# Most queries one request to each endpoint may run. These do not depend on
+# the size of the data, so a view that starts running a query per row fails here
+QUERY_BUDGETS = {
+    'list_products': 2,
+    'list_branches': 2,
+    'list_stock': 2,
+    'list_stock_page': 2,
+    'list_sales_page': 3,  # includes reading the sales archive boundary
+    'list_sales_filtered': 3,  # includes reading the version stamps (not cached, see versions.py)
+    'stock_by_product': 2,
+    'stock_by_product_breakdown': 3,
+    'dashboard_summary': 1,
+    'sales_analytics': 4,
+    'add_sale': 14,  # includes creating the day's rollup row for the pair and the change feed stamp
+    'add_stock': 12,  # includes the change feed stamp
+    'delete_sale': 12,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway database and measures throughput and p50/p95/p99 latency of the '
+        'main API endpoints, checking each against a query-count budget. Run it with '
+        'USE_SQLITE=1 to need no database server; --output writes a JSON report and '
+        '--compare prints the change against an earlier one'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branches', type=int, default=20, help='Branches to create')
+        parser.add_argument('--products', type=int, default=500, help='Products to create (stocked at every branch)')
+        parser.add_argument('--sales', type=int, default=50_000, help='Historical sales to create')
+        parser.add_argument('--days', type=int, default=90, help='Days of sales history')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per endpoint')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent clients for add_sale')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (same seed, same data and requests)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Earlier JSON report to compare p95 latency and throughput with')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.requests = options['requests']
+        report = {
+            'dataset': {key: options[key] for key in ('branches', 'products', 'sales', 'days', 'seed')},
+            'requests_per_endpoint': self.requests,
+            'workers': options['workers'],
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'endpoints': {},
+        }
+
+        with throwaway_database():
+            report['environment']['database'] = connection.vendor
+            started = time.perf_counter()
+            self._seed(options)
+            report['seed_seconds'] = round(time.perf_counter() - started, 2)
+            self.client = Client(raise_request_exception=False)
+
+            for name, method, path, body in self._read_scenarios():
+                report['endpoints'][name] = self._run_sequential(name, method, path, body)
+            report['endpoints']['add_stock'] = self._run_sequential(*self._add_stock_scenario())
+            report['endpoints']['delete_sale'] = self._run_sequential(*self._delete_sale_scenario())
+            report['endpoints']['add_sale'] = self._run_add_sale(options['workers'])
+
+        violations = [
+            f"{name}: {result['queries']} queries (budget {result['query_budget']})"
+            for name, result in report['endpoints'].items()
+            if result['queries'] > result['query_budget']
+        ]
+        report['budget_violations'] = violations
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+        if options['compare']:
+            self._compare(options['compare'], report)
+        if violations:
+            raise CommandError('Query budget exceeded: ' + '; '.join(violations))
+        self.stdout.write(self.style.SUCCESS('All endpoints are within their query budgets'))
+
+    # ---------- data ----------
+
+    def _seed(self, options):
+        rng = self.rng
+        Branch.objects.bulk_create(
+            [Branch(name=f'Branch {n}', location=f'{n} Market Street') for n in range(options['branches'])]
+        )
+        Product.objects.bulk_create(
+            [
+                Product(name=f'Product {n}', price=f'{rng.randint(100, 50_000) / 100:.2f}')
+                for n in range(options['products'])
+            ],
+            batch_size=1000,
+        )
+        self.branch_ids = list(Branch.objects.order_by('id').values_list('id', flat=True))
+        self.product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        Stock.objects.bulk_create(
+            [
+                Stock(branch_id=branch_id, product_id=product_id, quantity=rng.randint(1_000, 5_000))
+                for branch_id in self.branch_ids
+                for product_id in self.product_ids
+            ],
+            batch_size=2000,
+        )
+
+        now = timezone.now()
+        seconds = options['days'] * 24 * 60 * 60
+        batch = []
+        for _ in range(options['sales']):
+            batch.append(Sale(
+                branch_id=rng.choice(self.branch_ids),
+                product_id=rng.choice(self.product_ids),
+                quantity=rng.randint(1, 5),
+                date=now - timedelta(seconds=rng.randint(60, seconds)),
+            ))
+            if len(batch) >= 5000:
+                Sale.objects.bulk_create(batch)
+                batch = []
+        Sale.objects.bulk_create(batch)
+
+        # The dashboard and analytics read these instead of the raw tables
+        counters.rebuild()
+        today = local_day()
+        rollups.rebuild(today - timedelta(days=options['days']), today)
+        # A live database has had writes, so the version stamps exist; without
+        # them the first write's probe would also count creating its stamps
+        versions.touch(versions.BRANCH, versions.PRODUCT, versions.STOCK, versions.SALE)
+
+    # ---------- scenarios ----------
+
+    def _read_scenarios(self):
+        branch_id = self.branch_ids[0]
+        return [
+            ('list_products', 'get', '/api/products/', None),
+            ('list_branches', 'get', '/api/branches/', None),
+            ('list_stock', 'get', '/api/stock/', None),
+            ('list_stock_page', 'get', '/api/stock/?limit=100', None),
+            ('list_sales_page', 'get', '/api/sales/?limit=100', None),
+            ('list_sales_filtered', 'get', f'/api/sales/?branch={branch_id}&limit=100', None),
+            ('stock_by_product', 'get', '/api/stock/by-product/?page=2&page_size=50', None),
+            ('stock_by_product_breakdown', 'get', '/api/stock/by-product/?page_size=50&breakdown=1', None),
+            ('dashboard_summary', 'get', '/api/dashboard/summary/', None),
+            ('sales_analytics', 'get', '/api/analytics/sales/?period=week&group_by=branch', None),
+        ]
+
+    def _add_stock_scenario(self):
+        # Upserts: every pair already has a stock row, so each request adds to it
+        bodies = [
+            {'branch': self.rng.choice(self.branch_ids), 'product': self.rng.choice(self.product_ids), 'quantity': 5}
+            for _ in range(self.requests + 1)
+        ]
+        return 'add_stock', 'post', '/api/add-stock/', bodies
+
+    def _delete_sale_scenario(self):
+        sale_ids = list(Sale.objects.order_by('id').values_list('id', flat=True)[:self.requests + 1])
+        return 'delete_sale', 'delete', [f'/api/sales/{sale_id}/delete/' for sale_id in sale_ids], None
+
+    def _request(self, method, path, body):
+        if body is None:
+            return getattr(self.client, method)(path)
+        return getattr(self.client, method)(path, json.dumps(body), content_type='application/json')
+
+    def _probe(self, send):
+        """Sends one request and returns (response, number of queries it ran)."""
+        with CaptureQueriesContext(connection) as captured:
+            response = send()
+        # Counted now: the captured list is a slice of the connection's query
+        # log, which the next request clears
+        return response, len(captured.captured_queries)
+
+    def _run_sequential(self, name, method, paths, bodies):
+        """Sends one probe request (counting its queries), then self.requests timed ones."""
+        count = self.requests + 1
+        paths = paths if isinstance(paths, list) else [paths] * count
+        bodies = bodies if isinstance(bodies, list) else [bodies] * count
+
+        response, queries = self._probe(lambda: self._request(method, paths[0], bodies[0]))
+        self._check_status(name, response)
+
+        latencies = []
+        started = time.perf_counter()
+        for path, body in zip(paths[1:], bodies[1:]):
+            request_started = time.perf_counter()
+            response = self._request(method, path, body)
+            latencies.append(time.perf_counter() - request_started)
+            self._check_status(name, response)
+        elapsed = time.perf_counter() - started
+        return self._result(name, queries, latencies, elapsed)
+
+    def _run_add_sale(self, workers):
+        def body():
+            return json.dumps({
+                'branch': self.rng.choice(self.branch_ids),
+                'product': self.rng.choice(self.product_ids),
+                'quantity': 1,
+            })
+
+        response, queries = self._probe(
+            lambda: self.client.post('/api/add-sale/', body(), content_type='application/json')
+        )
+        self._check_status('add_sale', response)
+
+        def sell(payload):
+            return Client(raise_request_exception=False).post(
+                '/api/add-sale/', payload, content_type='application/json'
+            ).status_code
+
+        statuses, latencies, elapsed = run_concurrently(sell, [body() for _ in range(self.requests)], workers)
+        failed = [code for code in statuses if code != 201]
+        if failed:
+            raise CommandError(f'add_sale: {len(failed)} requests failed (status {failed[0]})')
+        return self._result('add_sale', queries, latencies, elapsed)
+
+    def _check_status(self, name, response):
+        if response.status_code >= 300:
+            raise CommandError(f'{name}: unexpected status {response.status_code}: {response.content[:200]!r}')
+
+    def _result(self, name, queries, latencies, elapsed):
+        return {
+            'queries': queries,
+            'query_budget': QUERY_BUDGETS[name],
+            'throughput_per_s': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'latency': latency_summary(latencies),
+        }
+
+    # ---------- comparison ----------
+
+    def _compare(self, path, report):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(f'\nCompared with {path}:')
+        for name, result in report['endpoints'].items():
+            before = previous.get('endpoints', {}).get(name)
+            if not before:
+                self.stdout.write(f'  {name:28} (new)')
+                continue
+            old_p95, new_p95 = before['latency']['p95_ms'], result['latency']['p95_ms']
+            change = f'{(new_p95 - old_p95) / old_p95 * 100:+.0f}%' if old_p95 else 'n/a'
+            self.stdout.write(
+                f"  {name:28} p95 {old_p95:.2f} -> {new_p95:.2f} ms ({change}), "
+                f"queries {before['queries']} -> {result['queries']}"
+            )
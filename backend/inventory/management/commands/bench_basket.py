@@ -0,0 +1,77 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from inventory.benchmarks import latency_summary, throwaway_database
+from inventory.models import Branch, Product, Sale, Stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares checking out a basket of N items as N add_sale calls against one '
+        'add_sale_basket call (database round trips and latency) on a throwaway database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10, help='Lines per basket')
+        parser.add_argument('--baskets', type=int, default=200, help='Baskets checked out per mode')
+
+    def handle(self, *args, **options):
+        size = options['items']
+        rounds = options['baskets']
+
+        with throwaway_database():
+            branch = Branch.objects.create(name='Bench Branch', location='Bench')
+            products = Product.objects.bulk_create(
+                [Product(name=f'Product {n}', price='1.00') for n in range(size)]
+            )
+            Stock.objects.bulk_create(
+                [Stock(branch=branch, product=product, quantity=rounds * 4) for product in products]
+            )
+            client = Client(raise_request_exception=False)
+
+            def separate_calls():
+                for product in products:
+                    response = client.post(
+                        '/api/add-sale/',
+                        json.dumps({'branch': branch.id, 'product': product.id, 'quantity': 1}),
+                        content_type='application/json',
+                    )
+                    if response.status_code != 201:
+                        raise CommandError(f'add_sale failed: {response.content!r}')
+
+            def one_basket():
+                body = {
+                    'branch': branch.id,
+                    'items': [{'product': product.id, 'quantity': 1} for product in products],
+                }
+                response = client.post('/api/add-sale-basket/', json.dumps(body), content_type='application/json')
+                if response.status_code != 201:
+                    raise CommandError(f'add_sale_basket failed: {response.content!r}')
+
+            report = {'items_per_basket': size, 'baskets': rounds}
+            for name, checkout in (('separate_add_sale', separate_calls), ('basket', one_basket)):
+                latencies = []
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(rounds):
+                        start = time.perf_counter()
+                        checkout()
+                        latencies.append(time.perf_counter() - start)
+                report[name] = {
+                    'queries_per_basket': round(len(queries) / rounds, 1),
+                    'latency': latency_summary(latencies),
+                }
+
+            expected = rounds * 2
+            sold = Sale.objects.filter(branch=branch).count()
+            if sold != expected * size:
+                raise CommandError(f'expected {expected * size} Sale rows, found {sold}')
+            remaining = set(Stock.objects.filter(branch=branch).values_list('quantity', flat=True))
+            if remaining != {rounds * 4 - expected}:
+                raise CommandError(f'unexpected remaining stock: {sorted(remaining)}')
+
+        self.stdout.write(json.dumps(report, indent=2))
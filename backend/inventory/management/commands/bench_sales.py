@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from inventory.benchmarks import latency_summary, run_concurrently, throwaway_database
+from inventory.models import Branch, Product, Sale, Stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Fires many parallel add_sale requests at one hot product on a throwaway '
+        'database and checks throughput and that no stock is oversold'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sales', type=int, default=500, help='Number of sale requests to send')
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent clients')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per sale')
+        parser.add_argument(
+            '--stock', type=int, default=None,
+            help='Opening stock (defaults to half of what the sales ask for, so some must be refused)',
+        )
+
+    def handle(self, *args, **options):
+        sales = options['sales']
+        quantity = options['quantity']
+        opening = options['stock'] if options['stock'] is not None else sales * quantity // 2
+
+        with throwaway_database():
+            branch = Branch.objects.create(name='Bench Branch', location='Bench')
+            product = Product.objects.create(name='Hot Product', price='9.99')
+            Stock.objects.create(branch=branch, product=product, quantity=opening)
+            payload = json.dumps({'branch': branch.id, 'product': product.id, 'quantity': quantity})
+
+            def sell(_):
+                response = Client(raise_request_exception=False).post('/api/add-sale/', payload, content_type='application/json')
+                return response.status_code
+
+            statuses, latencies, elapsed = run_concurrently(sell, range(sales), options['workers'])
+
+            accepted = statuses.count(201)
+            refused = statuses.count(400)
+            final = Stock.objects.get(branch=branch, product=product).quantity
+            recorded = Sale.objects.filter(branch=branch, product=product).count()
+
+        report = {
+            'sales': sales,
+            'workers': options['workers'],
+            'accepted': accepted,
+            'refused': refused,
+            'errors': sales - accepted - refused,
+            'throughput_per_s': round(sales / elapsed, 1) if elapsed else None,
+            'latency': latency_summary(latencies),
+            'opening_stock': opening,
+            'final_stock': final,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+        expected_accepted = min(sales, opening // quantity)
+        problems = []
+        if accepted != expected_accepted:
+            problems.append(f'expected {expected_accepted} accepted sales, got {accepted}')
+        if recorded != accepted:
+            problems.append(f'{recorded} Sale rows written for {accepted} accepted sales')
+        if final != opening - accepted * quantity:
+            problems.append(f'final stock {final} != {opening} - {accepted} x {quantity}')
+        if final < 0:
+            problems.append('stock went negative')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Stock quantities are consistent'))
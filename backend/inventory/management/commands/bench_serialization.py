@@ -0,0 +1,120 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from inventory import fastpath
+from inventory.benchmarks import throwaway_database
+from inventory.models import Branch, Product, Sale, Stock
+from inventory.renderers import ColumnarJSONRenderer, FastJSONRenderer, MessagePackRenderer, msgpack
+from inventory.serializers import SaleSerializer, StockSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares building the /api/sales/ and /api/stock/ bodies with ModelSerializer + '
+        'JSONRenderer against the values() fast path + FastJSONRenderer on a throwaway '
+        'database, and checks that both give the same bytes. Also reports the size and '
+        'parse time of the JSON, columnar and MessagePack bodies'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Sales and stock rows to create')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path (the best one is reported)')
+
+    def _seed(self, count):
+        Branch.objects.bulk_create(
+            [Branch(name=f'Branch {n}', location=f'Street {n}') for n in range(max(1, count // 1000))]
+        )
+        branch_ids = list(Branch.objects.values_list('id', flat=True))
+        products_needed = -(-count // len(branch_ids))  # One stock row per branch and product
+        Product.objects.bulk_create(
+            [Product(name=f'Product {n} “ü”', price='2.50') for n in range(products_needed)]
+        )
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        Stock.objects.bulk_create(
+            [
+                Stock(
+                    branch_id=branch_ids[n % len(branch_ids)],
+                    product_id=product_ids[n // len(branch_ids)],
+                    quantity=n % 50,
+                )
+                for n in range(count)
+            ],
+            batch_size=5000,
+        )
+        start = datetime(2026, 1, 1, 9, 0)
+        Sale.objects.bulk_create(
+            [
+                Sale(
+                    branch_id=branch_ids[n % len(branch_ids)],
+                    product_id=product_ids[n % len(product_ids)],
+                    quantity=n % 5 + 1,
+                    date=start + timedelta(seconds=n * 7, microseconds=n % 1000),
+                )
+                for n in range(count)
+            ],
+            batch_size=5000,
+        )
+
+    def _time(self, build, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = build()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return body, best
+
+    def _formats(self, rows, json_body, repeat):
+        """Body size and client-side parse time of each response format."""
+        bodies = {
+            'json': (json_body, json.loads),
+            'columnar': (ColumnarJSONRenderer().render(rows), json.loads),
+        }
+        if msgpack is not None:
+            bodies['msgpack'] = (MessagePackRenderer().render(rows), msgpack.unpackb)
+        results = {}
+        for name, (body, parse) in bodies.items():
+            _, parse_time = self._time(lambda: parse(body), repeat)
+            results[name] = {'bytes': len(body), 'parse_seconds': round(parse_time, 3)}
+        return results
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        repeat = options['repeat']
+        report = {'rows': count}
+
+        with throwaway_database():
+            self._seed(count)
+            cases = {
+                'sales': (
+                    lambda: SaleSerializer(
+                        Sale.objects.select_related('branch', 'product').only(
+                            'id', 'branch', 'product', 'quantity', 'date', 'branch__name', 'product__name'
+                        ).order_by('id'),
+                        many=True,
+                    ).data,
+                    lambda: fastpath.rows(fastpath.sale_values(Sale.objects.order_by('id')), fastpath.SALE_COLUMNS),
+                ),
+                'stock': (
+                    lambda: StockSerializer(Stock.objects.select_related('branch', 'product').order_by('id'), many=True).data,
+                    lambda: fastpath.rows(fastpath.stock_values(Stock.objects.order_by('id')), fastpath.STOCK_COLUMNS),
+                ),
+            }
+            for name, (serializer_rows, fast_rows) in cases.items():
+                slow_body, slow_time = self._time(lambda: JSONRenderer().render(serializer_rows()), repeat)
+                fast_body, fast_time = self._time(lambda: FastJSONRenderer().render(fast_rows()), repeat)
+                if slow_body != fast_body:
+                    raise CommandError(f'{name}: fast path output differs from the serializer output')
+                report[name] = {
+                    'serializer_seconds': round(slow_time, 3),
+                    'fast_path_seconds': round(fast_time, 3),
+                    'speedup': round(slow_time / fast_time, 1) if fast_time else None,
+                    'bytes': len(fast_body),
+                }
+                report[name]['formats'] = self._formats(fast_rows(), fast_body, repeat)
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,45 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import importer, streams
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports products and opening stock from a CSV (branch,location,product,price,quantity) '
+        'or NDJSON file, creating unknown branches and products'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'], default=None,
+            help='Input format (defaults to the file extension, else csv)',
+        )
+        parser.add_argument('--batch-size', type=int, default=importer.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+
+        started = time.perf_counter()
+        try:
+            with open(path, 'rb') as stream:
+                report = importer.CatalogImporter(options['batch_size']).run(
+                    importer.read_records(stream, content_type)
+                )
+        except OSError as e:
+            raise CommandError(f'Could not open {path}: {e}')
+        except (streams.StreamFormatError, csv.Error) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+        report['seconds'] = round(time.perf_counter() - started, 2)
+
+        self.stdout.write(json.dumps(report, indent=2))
+        if report['error_count']:
+            self.stdout.write(self.style.WARNING(f"{report['error_count']} rows were skipped"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Import finished'))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventory import purge
+from inventory.models import Branch, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the rows of deleted branches and products a chunk at a time. The delete '
+        'requests start this in the background themselves; run it periodically (e.g. from '
+        'cron) to finish purges that were interrupted, or with PURGE_IN_BACKGROUND=0'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.PURGE_CHUNK_SIZE,
+            help='Rows deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        purged = rows = 0
+        for model in (Branch, Product):
+            for pk in model.objects.filter(is_active=False).order_by('id').values_list('id', flat=True):
+                deleted = purge.purge(model, pk, chunk_size=options['chunk_size'])
+                purged += 1
+                rows += deleted
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{model.__name__} {pk}: {deleted} rows')
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} branches and products ({rows} rows)'))
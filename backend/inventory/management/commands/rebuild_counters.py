@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from inventory import counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the dashboard counters from the Product, Branch, Stock and Sale tables'
+
+    def handle(self, *args, **options):
+        values = counters.rebuild()
+        for name, value in values.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS('Dashboard counters rebuilt'))
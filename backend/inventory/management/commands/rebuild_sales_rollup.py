@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_date
+
+from inventory import rollups
+from inventory.counters import local_day
+from inventory.models import Sale, SaleArchive
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily sales rollup from the raw sales, a few days per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='first_day', help='First day to rebuild (YYYY-MM-DD); defaults to the first sale')
+        parser.add_argument('--to', dest='last_day', help='Last day to rebuild (YYYY-MM-DD); defaults to the last sale')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        bounds = Sale.objects.aggregate(first=Min('date'), last=Max('date'))
+        archived = SaleArchive.objects.aggregate(first=Min('date'), last=Max('date'))
+        if archived['first'] is not None:
+            bounds['first'] = min(filter(None, (bounds['first'], archived['first'])))
+            bounds['last'] = max(filter(None, (bounds['last'], archived['last'])))
+        if bounds['first'] is None and not (options['first_day'] and options['last_day']):
+            self.stdout.write('No sales to roll up')
+            return
+
+        first_day = self._day(options['first_day'], '--from') or local_day(bounds['first'])
+        last_day = self._day(options['last_day'], '--to') or local_day(bounds['last'])
+        if first_day > last_day:
+            raise CommandError('--from must not be after --to')
+        step = max(1, options['chunk_days'])
+
+        written = 0
+        day = first_day
+        while day <= last_day:
+            chunk_end = min(day + timedelta(days=step - 1), last_day)
+            count = rollups.rebuild(day, chunk_end)
+            written += count
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{day} .. {chunk_end}: {count} rollup rows')
+            day = chunk_end + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} rollup rows from {first_day} to {last_day}'))
+
+    def _day(self, value, option):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{option} must be a date (YYYY-MM-DD)')
+        return day
@@ -0,0 +1,357 @@
+import contextlib
+import itertools
+import math
+import random
+import time
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventory import catalog_cache, counters, versions
+from inventory.counters import day_bounds, local_day
+from inventory.models import Branch, Product, Sale, SaleDailyRollup, Stock, StockMovement
+
+CITIES = [
+    'Amsterdam', 'Berlin', 'Chennai', 'Dubai', 'Edinburgh', 'Kochi', 'Lagos', 'Lisbon',
+    'Madrid', 'Mumbai', 'Nairobi', 'Osaka', 'Paris', 'Seoul', 'Toronto', 'Vienna',
+]
+CATEGORIES = [
+    'Cable', 'Charger', 'Headphones', 'Keyboard', 'Lamp', 'Laptop', 'Monitor', 'Mouse',
+    'Notebook', 'Printer', 'Router', 'Speaker', 'Tablet', 'Webcam',
+]
+# Units per sale: mostly single items, sometimes a few
+SALE_QUANTITIES = [1, 2, 3, 4, 5, 10]
+SALE_QUANTITY_WEIGHTS = [70, 15, 7, 4, 3, 1]
+# Share of the day's sales in each hour (shops open 08:00-22:00, busiest at lunch and after work)
+HOUR_WEIGHTS = [0] * 8 + [3, 5, 7, 9, 12, 11, 8, 7, 8, 10, 11, 9, 6, 4] + [0] * 2
+# Monday .. Sunday
+WEEKDAY_WEIGHTS = [0.85, 0.85, 0.9, 0.95, 1.1, 1.35, 1.2]
+PRODUCT_SKEW = 1.1  # Zipf exponent: a few products sell far more than the long tail
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills an empty database with a large, deterministic synthetic dataset: branches, '
+        'products, a stock row for every pair and millions of sales with skewed product '
+        'popularity and seasonal dates, plus the matching rollup, dashboard counters and '
+        'opening stock ledger. Memory use does not grow with --sales'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branches', type=int, default=200, help='Branches to create')
+        parser.add_argument('--products', type=int, default=5000, help='Products to create (stocked at every branch)')
+        parser.add_argument('--sales', type=int, default=10_000_000, help='Sales to create')
+        parser.add_argument('--days', type=int, default=365, help='Days of sales history, ending today')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (same seed, same data)')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per INSERT transaction')
+
+    def handle(self, *args, **options):
+        if options['branches'] < 1 or options['products'] < 1 or options['days'] < 1:
+            raise CommandError('--branches, --products and --days must be at least 1')
+        if options['sales'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--sales cannot be negative and --batch-size must be at least 1')
+        if Branch.objects.exists() or Product.objects.exists() or Sale.objects.exists():
+            raise CommandError('The database already has inventory data; seed an empty one (manage.py flush)')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.verbose = options['verbosity'] > 1
+        started = time.perf_counter()
+
+        with self._relaxed_checks(), self._deferred_indexes([Sale, SaleDailyRollup, Stock, StockMovement]):
+            branch_ids, branch_weights = self._create_branches(options['branches'])
+            products, product_weights = self._create_products(options['products'])
+            sold = self._create_sales(options['sales'], options['days'], branch_ids, branch_weights,
+                                      products, product_weights)
+            self._create_stock(branch_ids, [pk for pk, _ in products], sold, options['days'])
+        # The ids all came from the rows created above, but check rather than trust it
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in (Sale, Stock, SaleDailyRollup, StockMovement)]
+        )
+
+        # Nothing went through the write views, so recount the dashboard totals
+        # and tell the caches the tables changed
+        counters.rebuild()
+        with transaction.atomic():
+            counters.bump({counters.ROLLUP_GENERATION: 1})
+            versions.touch(versions.BRANCH, versions.PRODUCT, versions.STOCK, versions.SALE)
+            catalog_cache.invalidate(Branch)
+            catalog_cache.invalidate(Product)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['branches']} branches, {options['products']} products, "
+            f"{len(branch_ids) * len(products)} stock rows and {options['sales']} sales "
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _log(self, message):
+        if self.verbose:
+            self.stdout.write(message)
+
+    @contextlib.contextmanager
+    def _relaxed_checks(self):
+        """
+        Skips foreign key (and on MySQL unique) checks while inserting. Safe
+        here because every id written was just read back from the database and
+        every stock pair is generated once; check_constraints() verifies the
+        foreign keys afterwards. On SQLite, syncs to disk are also skipped: a
+        crash mid-seed means seeding again anyway.
+        """
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(connection.constraint_checks_disabled())
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute('PRAGMA synchronous')
+                    synchronous = cursor.fetchone()[0]
+                    cursor.execute('PRAGMA synchronous = OFF')
+                    stack.callback(connection.cursor().execute, f'PRAGMA synchronous = {synchronous}')
+                elif connection.vendor == 'mysql':
+                    cursor.execute('SET unique_checks = 0')
+                    stack.callback(connection.cursor().execute, 'SET unique_checks = 1')
+            yield
+
+    @contextlib.contextmanager
+    def _deferred_indexes(self, models):
+        """
+        On SQLite, drops the tables' indexes while they are filled and creates
+        them again afterwards from their saved definitions: building an index
+        once over all rows is several times faster than updating it on every
+        insert. Recreating a unique index fails loudly if duplicates got in.
+        """
+        if connection.vendor != 'sqlite':
+            yield
+            return
+        tables = [model._meta.db_table for model in models]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+                tables,
+            )
+            indexes = cursor.fetchall()
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        try:
+            yield
+        finally:
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                for _, sql in indexes:
+                    cursor.execute(sql)
+            self._log(f'{len(indexes)} indexes rebuilt in {time.perf_counter() - started:.1f}s')
+
+    def _insert(self, model, fields, rows):
+        """
+        Inserts an iterable of value tuples (in the order of fields) with one
+        executemany() per batch, each batch in its own transaction. Millions of
+        rows are too many to build model instances for: bulk_create() spends
+        most of its time in Model.__init__ and preparing every field value.
+        """
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+        written = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return written
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            written += len(batch)
+
+    # ---------- catalog ----------
+
+    def _create_branches(self, count):
+        rng = self.rng
+        Branch.objects.bulk_create(
+            [
+                Branch(name=f'{rng.choice(CITIES)} Store {n:04d}', location=f'{rng.randint(1, 400)} Market Street')
+                for n in range(1, count + 1)
+            ],
+            batch_size=self.batch_size,
+        )
+        # MySQL does not return ids from a bulk INSERT, so read them back
+        branch_ids = list(Branch.objects.order_by('id').values_list('id', flat=True))
+        # Branch size: most are similar, a few flagship stores sell much more
+        weights = [rng.lognormvariate(0, 0.5) for _ in branch_ids]
+        self._log(f'{len(branch_ids)} branches')
+        return branch_ids, weights
+
+    def _create_products(self, count):
+        """Returns [(id, price)] and each product's relative popularity."""
+        rng = self.rng
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f'{rng.choice(CATEGORIES)} {n:06d}',
+                    price=Decimal(f'{min(rng.lognormvariate(3.5, 1.0), 99_999):.2f}'),
+                )
+                for n in range(1, count + 1)
+            ],
+            batch_size=self.batch_size,
+        )
+        products = list(Product.objects.order_by('id').values_list('id', 'price'))
+        # Popularity rank is shuffled so the best sellers are spread over the id range
+        ranks = list(range(1, len(products) + 1))
+        rng.shuffle(ranks)
+        weights = [1 / rank ** PRODUCT_SKEW for rank in ranks]
+        self._log(f'{len(products)} products')
+        return products, weights
+
+    # ---------- sales ----------
+
+    def _hour_slots(self, total, days):
+        """
+        Splits total sales over every opening hour of the last `days` days up to
+        now, weighted by season (peak in late December), weekday, hour of day and
+        a steady growth trend. Yields (day, start of hour, seconds of the hour
+        that are not in the future, number of sales), in date order; the
+        counts add up to total.
+        """
+        now = timezone.now()
+        today = local_day()
+        slots = []
+        for offset in range(days):
+            day = today - timedelta(days=days - 1 - offset)
+            season = 1 + 0.25 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 355) / 365.25)
+            trend = 1 + 0.3 * offset / days
+            day_weight = season * trend * WEEKDAY_WEIGHTS[day.weekday()]
+            start, _ = day_bounds(day)
+            for hour, hour_weight in enumerate(HOUR_WEIGHTS):
+                hour_start = start + timedelta(hours=hour)
+                if hour_weight and hour_start < now:
+                    slots.append((day, hour_start, day_weight * hour_weight))
+        if not slots:
+            # Seeding one day before the shops open: use the hours so far
+            start, _ = day_bounds(today)
+            slots = [(today, start + timedelta(hours=hour), 1) for hour in range(now.hour + 1)]
+
+        # Largest remainder, so the counts are whole and add up to exactly total
+        scale = total / sum(weight for _, _, weight in slots)
+        shares = [weight * scale for _, _, weight in slots]
+        counts = [int(share) for share in shares]
+        leftover = total - sum(counts)
+        for index in sorted(range(len(slots)), key=lambda i: counts[i] - shares[i])[:leftover]:
+            counts[index] += 1
+        for (day, hour_start, _), count in zip(slots, counts):
+            if count:
+                seconds = min(3600, max(1, int((now - hour_start).total_seconds())))
+                yield day, hour_start, seconds, count
+
+    def _create_sales(self, total, days, branch_ids, branch_weights, products, product_weights):
+        """
+        Writes the sales in date order (so ids grow with dates, as they do in
+        production) and each day's SaleDailyRollup rows once the day is done.
+        Returns the units sold per branch and product, as a flat array indexed
+        by branch_index * len(products) + product_index.
+        """
+        rng = self.rng
+        branch_cum = list(itertools.accumulate(branch_weights))
+        product_cum = list(itertools.accumulate(product_weights))
+        quantity_cum = list(itertools.accumulate(SALE_QUANTITY_WEIGHTS))
+        branch_range = range(len(branch_ids))
+        product_range = range(len(products))
+        width = len(products)
+        sold = array('q', bytes(8 * len(branch_ids) * width))
+        ops = connection.ops
+        adapt_date = ops.adapt_datetimefield_value
+        revenue_field = SaleDailyRollup._meta.get_field('revenue')
+
+        def write_rollup(day, units):
+            self._insert(
+                SaleDailyRollup, ('day', 'branch', 'product', 'units', 'revenue'),
+                (
+                    (
+                        ops.adapt_datefield_value(day),
+                        branch_ids[key // width], products[key % width][0], count,
+                        ops.adapt_decimalfield_value(
+                            count * products[key % width][1],
+                            revenue_field.max_digits, revenue_field.decimal_places,
+                        ),
+                    )
+                    for key, count in sorted(units.items())
+                ),
+            )
+
+        def generate():
+            current_day, units = None, {}
+            for day, hour_start, length, count in self._hour_slots(total, days):
+                if day != current_day:
+                    if units:
+                        write_rollup(current_day, units)
+                    current_day, units = day, {}
+                seconds = sorted(rng.randrange(length) for _ in range(count))
+                picked = zip(
+                    seconds,
+                    rng.choices(branch_range, cum_weights=branch_cum, k=count),
+                    rng.choices(product_range, cum_weights=product_cum, k=count),
+                    rng.choices(SALE_QUANTITIES, cum_weights=quantity_cum, k=count),
+                )
+                for second, branch, product, quantity in picked:
+                    key = branch * width + product
+                    sold[key] += quantity
+                    units[key] = units.get(key, 0) + quantity
+                    yield (branch_ids[branch], products[product][0], quantity,
+                           adapt_date(hour_start + timedelta(seconds=second)))
+            if units:
+                write_rollup(current_day, units)
+
+        started = time.perf_counter()
+        written = 0
+        rows = generate()
+        while True:
+            chunk = self._insert(Sale, ('branch', 'product', 'quantity', 'date'),
+                                 itertools.islice(rows, self.batch_size * 10))
+            if not chunk:
+                break
+            written += chunk
+            self._log(f'{written}/{total} sales ({written / (time.perf_counter() - started):,.0f} rows/s)')
+        # Drain the generator so the last day's rollup rows are written
+        for _ in rows:
+            pass
+        return sold
+
+    # ---------- stock ----------
+
+    def _create_stock(self, branch_ids, product_ids, sold, days):
+        """
+        One stock row per branch and product. What is left on hand follows
+        what sold there: roughly one to four weeks of that pair's demand, so
+        best sellers carry the most stock, with a few sold out.
+        """
+        rng = self.rng
+        width = len(product_ids)
+        # Change feed columns (see changes.py): version 0 puts the rows in a client's first full sync
+        updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        def generate():
+            for branch_index, branch_id in enumerate(branch_ids):
+                for product_index, product_id in enumerate(product_ids):
+                    daily = sold[branch_index * width + product_index] / days
+                    if rng.random() < 0.03:
+                        quantity = 0
+                    else:
+                        quantity = int(daily * rng.uniform(7, 28)) + rng.randint(0, 10)
+                    yield branch_id, product_id, quantity, 0, updated_at
+
+        written = self._insert(Stock, ('branch', 'product', 'quantity', 'version', 'updated_at'), generate())
+        self._log(f'{written} stock rows')
+
+        # The stock ledger starts now with each row's quantity as its opening balance
+        # (the generated sales are history from before the ledger, like the migration's)
+        quote = connection.ops.quote_name
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(StockMovement._meta.db_table)} '
+                f'({quote("branch_id")}, {quote("product_id")}, {quote("delta")}, {quote("reason")}, {quote("created_at")}) '
+                f'SELECT {quote("branch_id")}, {quote("product_id")}, {quote("quantity")}, %s, %s '
+                f'FROM {quote(Stock._meta.db_table)} WHERE {quote("quantity")} <> 0 ORDER BY {quote("id")}',
+                [StockMovement.OPENING, connection.ops.adapt_datetimefield_value(timezone.now())],
+            )
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from inventory import ledger
+from inventory.models import Branch, StockMovement, StockSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Stores the current stock quantities of each branch as a snapshot, so point-in-time '
+        'stock queries (/api/stock/as-of/) only replay the movements made since. Run it '
+        'periodically, e.g. nightly from cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, action='append', help='Only this branch (repeatable)')
+        parser.add_argument(
+            '--min-movements', type=int, default=1,
+            help='Skip branches with fewer stock movements since their last snapshot',
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=None,
+            help='Also delete snapshots older than this many days (older queries replay more movements)',
+        )
+
+    def handle(self, *args, **options):
+        branches = Branch.objects.filter(is_active=True).order_by('id')
+        if options['branch']:
+            branches = branches.filter(id__in=options['branch'])
+        last_snapshots = dict(
+            StockSnapshot.objects.values('branch_id')
+            .annotate(last=Max('last_movement_id'))
+            .order_by()
+            .values_list('branch_id', 'last')
+        )
+
+        taken = skipped = 0
+        for branch_id in branches.values_list('id', flat=True):
+            since = StockMovement.objects.filter(branch_id=branch_id, id__gt=last_snapshots.get(branch_id, 0))
+            # Counts at most min_movements rows
+            if since.values('id')[:options['min_movements']].count() < options['min_movements']:
+                skipped += 1
+                continue
+            snapshot = ledger.take_snapshot(branch_id)
+            taken += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Branch {branch_id}: snapshot {snapshot.id} up to movement {snapshot.last_movement_id}')
+
+        if options['keep_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['keep_days'])
+            deleted, _ = StockSnapshot.objects.filter(taken_at__lt=cutoff).delete()
+            self.stdout.write(f'Deleted {deleted} old snapshot rows')
+        self.stdout.write(self.style.SUCCESS(f'Took {taken} snapshots ({skipped} branches unchanged)'))
@@ -0,0 +1,110 @@
+"""
+Prometheus metrics, served at /metrics.
+
+MetricsMiddleware records, per URL name (add_sale, list_stock, ...):
+
+    inventory_http_requests_total                 requests by method and status code
+    inventory_http_request_duration_seconds       latency histogram
+    inventory_db_queries_per_request              histogram of queries per request
+    inventory_db_duration_per_request_seconds     histogram of database time per request
+
+and the sale views add the business counters inventory_sales_recorded_total
+and inventory_units_sold_total once their transaction commits.
+
+Under gunicorn every worker is a separate process with its own counters. When
+PROMETHEUS_MULTIPROC_DIR is set (the Dockerfile sets it, and gunicorn.conf.py
+empties it at start-up and tidies up after dead workers), each worker writes
+its values to files in that directory and /metrics adds up all the workers.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+from .instrumentation import observe_queries
+
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    # Management commands run outside gunicorn, before it has created the directory
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+REQUESTS = Counter(
+    'inventory_http_requests_total', 'HTTP requests handled', ['view', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'inventory_http_request_duration_seconds', 'Time to handle a request', ['view', 'method'],
+)
+QUERIES = Histogram(
+    'inventory_db_queries_per_request', 'Database queries run by one request', ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000),
+)
+DB_TIME = Histogram(
+    'inventory_db_duration_per_request_seconds', 'Time one request spent in the database', ['view'],
+)
+SALES_RECORDED = Counter('inventory_sales_recorded_total', 'Sale rows recorded')
+UNITS_SOLD = Counter('inventory_units_sold_total', 'Units sold')
+
+
+def sales_recorded(sales):
+    """Counts new sales once the current transaction commits (nothing if it rolls back)."""
+    count = len(sales)
+    units = sum(sale.quantity for sale in sales)
+    if not count:
+        return
+
+    def record():
+        SALES_RECORDED.inc(count)
+        UNITS_SOLD.inc(units)
+    transaction.on_commit(record)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, sql, params, many, seconds, ok):
+        self.seconds += seconds
+        self.queries += 1
+
+
+class MetricsMiddleware:
+    """Records the per-view request metrics listed in the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == '/metrics':
+            return self.get_response(request)
+        started = time.perf_counter()
+        counter = _QueryCounter()
+        with observe_queries(counter):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        # Named routes only, so the label set stays small (the SPA catch-all is "other")
+        view = match.url_name if match and match.url_name else 'other'
+        REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+        LATENCY.labels(view, request.method).observe(elapsed)
+        QUERIES.labels(view).observe(counter.queries)
+        DB_TIME.labels(view).observe(counter.seconds)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition. With METRICS_TOKEN set, requires "Authorization: Bearer <token>"."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:31
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def seed_counters(apps, schema_editor):
+    # Start the counters from the data that already exists
+    # (day logic copied from inventory.counters, so later changes there cannot alter this migration)
+    Branch = apps.get_model('inventory', 'Branch')
+    Product = apps.get_model('inventory', 'Product')
+    Stock = apps.get_model('inventory', 'Stock')
+    Sale = apps.get_model('inventory', 'Sale')
+    DashboardCounter = apps.get_model('inventory', 'DashboardCounter')
+    today = timezone.localdate() if settings.USE_TZ else timezone.now().date()
+    start = datetime.combine(today, time.min)
+    end = start + timedelta(days=1)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+        end = timezone.make_aware(end)
+    values = {
+        'products': Product.objects.count(),
+        'branches': Branch.objects.count(),
+        'stock_items': Stock.objects.count(),
+        'units_on_hand': Stock.objects.aggregate(total=Sum('quantity'))['total'] or 0,
+        'sales': Sale.objects.count(),
+        f'sales_on:{today.isoformat()}': Sale.objects.filter(date__gte=start, date__lt=end).count(),
+    }
+    DashboardCounter.objects.bulk_create(
+        [DashboardCounter(name=name, value=value) for name, value in values.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_sale_date_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.branch')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'day'], name='rollup_branch_day_idx'), models.Index(fields=['product', 'day'], name='rollup_product_day_idx')],
+                'unique_together': {('day', 'branch', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def opening_balances(apps, schema_editor):
+    # Start the ledger with the quantities on hand now, so movements add up to Stock.quantity
+    Stock = apps.get_model('inventory', 'Stock')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    now = django.utils.timezone.now()
+    batch = []
+    for branch_id, product_id, quantity in Stock.objects.exclude(quantity=0).values_list(
+        'branch_id', 'product_id', 'quantity'
+    ).iterator(chunk_size=2000):
+        batch.append(StockMovement(
+            branch_id=branch_id, product_id=product_id, delta=quantity, reason='opening', created_at=now
+        ))
+        if len(batch) >= 2000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_saledailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.branch')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('sale', 'Sale'), ('sale_deleted', 'Sale deleted'), ('restock', 'Restock'), ('adjustment', 'Adjustment'), ('removed', 'Stock removed'), ('import', 'Import'), ('opening', 'Opening balance')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.branch')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('sale', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventory.sale')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockSnapshotItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='inventory.stocksnapshot')),
+            ],
+            options={
+                'unique_together': {('snapshot', 'product')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['branch', 'taken_at'], name='snapshot_branch_taken_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['branch', 'id'], name='movement_branch_id_idx'),
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,24 @@
 from django.db import models
+from django.utils import timezone
 
 # Branch model: Represents a physical store location
 # This is where products are stored and sold
 class Branch(models.Model):
     name = models.CharField(max_length=100)  # Store name (e.g., "Main Store", "Branch A")
     location = models.CharField(max_length=200)  # Store address or location
+    is_active = models.BooleanField(default=True)  # False once deleted; its rows are then purged in the background (see purge.py)
+    version = models.BigIntegerField(default=0)  # Change feed position of the last change (see changes.py)
+    updated_at = models.DateTimeField(auto_now=True)  # When it last changed
     
     def __str__(self):
         return self.name
     
     class Meta:
         verbose_name_plural = "Branches"
+        indexes = [
+            # The change feed reads rows in (version, id) order
+            models.Index(fields=['version', 'id'], name='branch_version_id_idx'),
+        ]
 
 
 # Product model: Represents items that can be sold
@@ -18,9 +26,18 @@ class Branch(models.Model):
 class Product(models.Model):
     name = models.CharField(max_length=100)  # Product name (e.g., "Laptop", "Mouse")
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Product price in currency
+    is_active = models.BooleanField(default=True)  # False once deleted; its rows are then purged in the background (see purge.py)
+    version = models.BigIntegerField(default=0)  # Change feed position of the last change (see changes.py)
+    updated_at = models.DateTimeField(auto_now=True)  # When it last changed
     
     def __str__(self):
         return self.name
+    
+    class Meta:
+        indexes = [
+            # The change feed reads rows in (version, id) order
+            models.Index(fields=['version', 'id'], name='product_version_id_idx'),
+        ]
 
 
 # Stock model: Tracks how many products are available at each branch
@@ -29,6 +46,8 @@ class Stock(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)  # Which branch has this stock
     product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Which product is in stock
     quantity = models.IntegerField(default=0)  # How many units are available
+    version = models.BigIntegerField(default=0)  # Change feed position of the last change (see changes.py)
+    updated_at = models.DateTimeField(auto_now=True)  # When it last changed
     
     def __str__(self):
         return f"{self.product.name} at {self.branch.name}: {self.quantity} units"
@@ -36,6 +55,13 @@ class Stock(models.Model):
     class Meta:
         # Prevent duplicate stock entries for same branch+product combination
         unique_together = ('branch', 'product')
+        indexes = [
+            # Keyset pagination by id within a branch or product filter
+            models.Index(fields=['branch', 'id'], name='stock_branch_id_idx'),
+            models.Index(fields=['product', 'id'], name='stock_product_id_idx'),
+            # The change feed reads rows in (version, id) order
+            models.Index(fields=['version', 'id'], name='stock_version_id_idx'),
+        ]
 
 
 # Sale model: Records when a product is sold at a branch
@@ -44,8 +70,166 @@ class Sale(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)  # Which branch made the sale
     product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Which product was sold
     quantity = models.IntegerField()  # How many units were sold
-    date = models.DateTimeField(auto_now_add=True)  # When the sale happened (automatically set)
+    date = models.DateTimeField(default=timezone.now, editable=False)  # When the sale happened (set automatically, or by bulk uploads of offline sales)
     
     def __str__(self):
         return f"Sale: {self.quantity} x {self.product.name} at {self.branch.name} on {self.date}"
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination on (date, id), alone or within a branch/product filter
+            models.Index(fields=['date', 'id'], name='sale_date_id_idx'),
+            models.Index(fields=['branch', 'date', 'id'], name='sale_branch_date_id_idx'),
+            models.Index(fields=['product', 'date', 'id'], name='sale_product_date_id_idx'),
+        ]
+
+
+
+# SaleArchive model: Old sales moved out of the Sale table by the archive_sales command
+# Same columns and ids as Sale; the list views, exports and reports only read it when
+# the requested dates reach back into the archived period (see archive.py)
+class SaleArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # The id the sale had in the Sale table
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)  # Which branch made the sale
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Which product was sold
+    quantity = models.IntegerField()  # How many units were sold
+    date = models.DateTimeField()  # When the sale happened
+    
+    def __str__(self):
+        return f"Archived sale: {self.quantity} x {self.product_id} at {self.branch_id} on {self.date}"
+    
+    class Meta:
+        indexes = [
+            # The same keyset orderings as Sale
+            models.Index(fields=['date', 'id'], name='archive_date_id_idx'),
+            models.Index(fields=['branch', 'date', 'id'], name='archive_branch_date_id_idx'),
+            models.Index(fields=['product', 'date', 'id'], name='archive_product_date_id_idx'),
+        ]
+
+
+# SaleArchiveRun model: One run of the archive_sales command
+# The latest `before` tells the read views whether a date range reaches into the archive
+class SaleArchiveRun(models.Model):
+    before = models.DateTimeField(db_index=True)  # Sales dated before this are moved to SaleArchive
+    started_at = models.DateTimeField(default=timezone.now)  # When the run started
+    finished_at = models.DateTimeField(null=True, blank=True)  # When it finished (empty while running or if interrupted)
+    rows = models.BigIntegerField(default=0)  # Sales moved so far
+    
+    def __str__(self):
+        return f"Sales before {self.before} ({self.rows} moved)"
+
+
+# ChangeTombstone model: Records that a branch, product or stock record was deleted
+# so clients syncing through /api/changes/ remove their copy too
+class ChangeTombstone(models.Model):
+    table = models.CharField(max_length=10)  # "branch", "product" or "stock"
+    object_id = models.BigIntegerField()  # Id of the deleted row
+    version = models.BigIntegerField()  # Change feed position of the deletion
+    deleted_at = models.DateTimeField(default=timezone.now)  # When it was deleted
+    
+    def __str__(self):
+        return f"{self.table} {self.object_id} deleted at {self.deleted_at}"
+    
+    class Meta:
+        indexes = [
+            # The change feed reads each table's deletions in (version, id) order
+            models.Index(fields=['table', 'version', 'object_id'], name='tombstone_table_version_idx'),
+        ]
+
 
+# DashboardCounter model: Running totals shown on the dashboard
+# The write views keep these in step with the real tables so the dashboard never scans them
+class DashboardCounter(models.Model):
+    name = models.CharField(max_length=50, unique=True)  # Counter key (e.g., "sales", "sales_on:2026-01-01")
+    value = models.BigIntegerField(default=0)  # Current total
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+# SaleDailyRollup model: Units sold and revenue per day, branch and product
+# Kept up to date by the sale views so reports can read a few rollup rows instead of every Sale
+class SaleDailyRollup(models.Model):
+    day = models.DateField()  # Calendar day of the sales (local time)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)  # Branch that made the sales
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Product that was sold
+    units = models.BigIntegerField(default=0)  # Total units sold that day
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Units x product price
+    
+    def __str__(self):
+        return f"{self.day}: {self.units} x {self.product_id} at {self.branch_id}"
+    
+    class Meta:
+        # One rollup row per day, branch and product
+        unique_together = ('day', 'branch', 'product')
+        indexes = [
+            # Reports over a date range, optionally for one branch or product
+            models.Index(fields=['branch', 'day'], name='rollup_branch_day_idx'),
+            models.Index(fields=['product', 'day'], name='rollup_product_day_idx'),
+        ]
+
+
+# StockMovement model: Append-only ledger of every change to a stock quantity
+# Stock.quantity is the current total; these rows say when and why it changed
+class StockMovement(models.Model):
+    SALE = 'sale'
+    SALE_DELETED = 'sale_deleted'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    REMOVED = 'removed'
+    IMPORT = 'import'
+    OPENING = 'opening'
+    REASONS = [
+        (SALE, 'Sale'),  # Units sold
+        (SALE_DELETED, 'Sale deleted'),  # A deleted sale's units put back
+        (RESTOCK, 'Restock'),  # Units added (add stock, new product with stock)
+        (ADJUSTMENT, 'Adjustment'),  # Quantity set by hand (update stock, admin)
+        (REMOVED, 'Stock removed'),  # Stock record deleted
+        (IMPORT, 'Import'),  # Quantity set by a catalog import
+        (OPENING, 'Opening balance'),  # Quantity on hand when the ledger started
+    ]
+    
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)  # Branch whose stock changed
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Product whose stock changed
+    delta = models.IntegerField()  # Units added (positive) or taken out (negative)
+    reason = models.CharField(max_length=20, choices=REASONS)  # Why the quantity changed
+    sale = models.ForeignKey(
+        Sale, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )  # Sale behind the change, if any (kept after the sale is deleted, so no constraint)
+    created_at = models.DateTimeField(default=timezone.now)  # When the change was made
+    
+    def __str__(self):
+        return f"{self.delta:+d} x {self.product_id} at {self.branch_id} ({self.reason})"
+    
+    class Meta:
+        indexes = [
+            # Movements of one branch after a snapshot, in id order
+            models.Index(fields=['branch', 'id'], name='movement_branch_id_idx'),
+        ]
+
+
+# StockSnapshot model: The quantities on hand at one branch at a point in time
+# Point-in-time queries start from the nearest snapshot and replay only the movements after it
+class StockSnapshot(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)  # Branch the snapshot is of
+    taken_at = models.DateTimeField()  # When the quantities were read
+    last_movement_id = models.BigIntegerField(default=0)  # Newest StockMovement of the branch included
+    
+    def __str__(self):
+        return f"{self.branch_id} at {self.taken_at}"
+    
+    class Meta:
+        indexes = [
+            # Nearest snapshot of a branch before or after a given time
+            models.Index(fields=['branch', 'taken_at'], name='snapshot_branch_taken_idx'),
+        ]
+
+
+# StockSnapshotItem model: One product's quantity in a snapshot
+class StockSnapshotItem(models.Model):
+    snapshot = models.ForeignKey(StockSnapshot, on_delete=models.CASCADE, related_name='items')  # Snapshot it belongs to
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Product counted
+    quantity = models.IntegerField()  # Units on hand when the snapshot was taken
+    
+    class Meta:
+        unique_together = ('snapshot', 'product')
@@ -0,0 +1,183 @@
+"""
+Keyset (cursor) pagination and query-string filters for the list views.
+
+Pages are read with WHERE (date, id) < (last_date, last_id) ORDER BY date, id
+instead of OFFSET, so every page is an index range scan and the first page
+costs the same whatever the size of the table. The cursor handed to the
+client is an opaque base64 string holding the ordering values of the last
+row on the page.
+
+Invalid input raises ValueError with a message that can be sent back as-is.
+"""
+import base64
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values):
+    """Packs the ordering values of a row into an opaque cursor string."""
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Reverses encode_cursor(); raises ValueError for anything malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_id(params, name):
+    """Reads an optional ?<name>= id (None if missing). Raises ValueError if it is not a number."""
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {name} ID')
+
+
+def parse_moment(value, name, end_of_day=False):
+    """Accepts a date (2026-01-31) or a datetime (2026-01-31T10:00:00)."""
+    # Dates first: parse_datetime() also accepts a plain date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f'{name} must be a date (YYYY-MM-DD) or datetime')
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    elif not settings.USE_TZ and timezone.is_aware(moment):
+        moment = timezone.make_naive(moment)
+    return moment
+
+
+def apply_filters(queryset, params, date_field=None):
+    """
+    Narrows a Stock/Sale queryset with ?branch=, ?product= and, when the model
+    has a date, ?date_from= and ?date_to= (a plain date_to includes that whole day).
+    """
+    branch_id = parse_id(params, 'branch')
+    if branch_id is not None:
+        queryset = queryset.filter(branch_id=branch_id)
+    product_id = parse_id(params, 'product')
+    if product_id is not None:
+        queryset = queryset.filter(product_id=product_id)
+
+    if date_field:
+        date_from = params.get('date_from')
+        if date_from:
+            queryset = queryset.filter(**{f'{date_field}__gte': parse_moment(date_from, 'date_from')})
+        date_to = params.get('date_to')
+        if date_to:
+            if parse_date(date_to) is None:
+                queryset = queryset.filter(**{f'{date_field}__lte': parse_moment(date_to, 'date_to')})
+            else:
+                queryset = queryset.filter(
+                    **{f'{date_field}__lt': parse_moment(date_to, 'date_to', end_of_day=True)}
+                )
+    return queryset
+
+
+def wants_page(params):
+    """Pagination is opt-in so existing clients still get the plain list."""
+    return 'cursor' in params or 'limit' in params
+
+
+def page_size(params):
+    value = params.get('limit')
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be a number')
+    if size <= 0:
+        raise ValueError('limit must be greater than 0')
+    return min(size, MAX_PAGE_SIZE)
+
+
+def _after(ordering, values):
+    """
+    Builds the keyset condition "row comes after values" for an ordering such
+    as ('-date', '-id'): date < d OR (date = d AND id < i).
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        clause = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values[:position]):
+            clause &= Q(**{previous.lstrip('-'): value})
+        condition |= clause
+    return condition
+
+
+def paginate(queryset, params, ordering):
+    """
+    Returns (rows, next_cursor) for one page of the queryset in the given
+    ordering. The ordering must end with a unique field (the id) so that every
+    row has a distinct position.
+    """
+    return paginate_merged([queryset], params, ordering)
+
+
+def paginate_merged(querysets, params, ordering):
+    """
+    Like paginate() for several querysets with the same columns, such as the
+    current and the archived sales: one page is read from each (each still an
+    index range scan) and the pages are merged in Python.
+    """
+    size = page_size(params)
+    querysets = [queryset.order_by(*ordering) for queryset in querysets]
+
+    cursor = params.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(ordering):
+            raise ValueError('Invalid cursor')
+        model = querysets[0].model
+        try:
+            values = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except ValidationError:
+            raise ValueError('Invalid cursor')
+        querysets = [queryset.filter(_after(ordering, values)) for queryset in querysets]
+
+    # Fetch one extra row to find out whether there is another page
+    rows = []
+    for queryset in querysets:
+        rows.extend(queryset[:size + 1])
+    # Rows are model instances, or dicts for a values() queryset
+    if rows and isinstance(rows[0], dict):
+        read = lambda row, name: row[name]
+    else:
+        read = getattr
+    if len(querysets) > 1:
+        # Stable sorts, last ordering field first
+        for field in reversed(ordering):
+            rows.sort(key=lambda row: read(row, field.lstrip('-')), reverse=field.startswith('-'))
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor([read(rows[-1], field.lstrip('-')) for field in ordering])
+    return rows, next_cursor
@@ -0,0 +1,157 @@
+"""
+Deleting branches and products without loading their history.
+
+Model.delete() lets Django's collector fetch every dependent row (all the
+Stock, Sale, rollup and ledger rows of a branch) into memory before it
+deletes anything, inside one transaction. For a busy branch that is
+millions of objects and a request that never finishes.
+
+Instead, deactivate() does a soft delete: it sets is_active=False, which
+hides the branch or product from every view at once, and deletes its Stock
+rows (at most one per branch or product on the other side) the way
+delete_stock does: REMOVED ledger movements (which also go to the live stock
+streams), change feed tombstones and the stock counters. Once the
+transaction commits it starts purge() on a background thread. Sales and
+rollup rows that are still waiting to be purged are left out of the read
+views by visible().
+
+purge() removes the dependents chunk by chunk: it reads up to
+PURGE_CHUNK_SIZE ids, deletes their own dependents the same way, then
+deletes the chunk with a single DELETE ... WHERE id IN (...) and no
+signals (raw delete). Each statement commits on its own, so memory and lock
+time stay bounded and an interrupted purge simply continues where it
+stopped when run again. A chunk of sales is taken out of the dashboard sales
+counters in the transaction that deletes it, so counting them costs the
+request nothing and a rerun never subtracts them twice; until then the
+totals still include them. The purge_deleted command does that for every
+deactivated branch and product; run it from cron in case a worker was
+restarted in the middle of a purge.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, models, transaction
+
+from . import changes, counters, ledger, versions
+from .models import Branch, Product, Sale, SaleArchive, Stock, StockMovement
+
+logger = logging.getLogger('inventory.purge')
+
+# Per model: (foreign key lookup on the dependent tables, dashboard counter, version stamps changed)
+_MODELS = {
+    Branch: ('branch_id', counters.BRANCHES, (versions.BRANCH, versions.STOCK)),
+    Product: ('product_id', counters.PRODUCTS, (versions.PRODUCT, versions.STOCK)),
+}
+
+
+def visible(queryset):
+    """Leaves out the rows of branches and products that are deleted but not purged yet."""
+    return queryset.exclude(
+        branch_id__in=Branch.objects.filter(is_active=False).values('id')
+    ).exclude(
+        product_id__in=Product.objects.filter(is_active=False).values('id')
+    )
+
+
+@transaction.atomic
+def deactivate(model, pk):
+    """
+    Soft-deletes the Branch or Product with this id and schedules its purge.
+    Returns False if there is no active one.
+    """
+    lookup, counter, tables = _MODELS[model]
+    obj = model.objects.select_for_update().filter(id=pk, is_active=True).first()
+    if obj is None:
+        return False
+
+    # Locked, so no sale or restock changes them between reading and deleting
+    removed = list(
+        Stock.objects.select_for_update().filter(**{lookup: obj.id}).order_by('id')
+        .values_list('id', 'branch_id', 'product_id', 'quantity')
+    )
+    stock_ids = [stock_id for stock_id, _, _, _ in removed]
+    Stock.objects.filter(id__in=stock_ids)._raw_delete(connection.alias)
+    ledger.record_many(
+        (branch_id, product_id, -quantity, StockMovement.REMOVED) for _, branch_id, product_id, quantity in removed
+    )
+    obj.is_active = False
+    obj.save(update_fields=['is_active'])  # post_save drops it from the catalog cache
+    counters.bump({
+        counter: -1,
+        counters.STOCK_ITEMS: -len(removed),
+        counters.UNITS_ON_HAND: -sum(quantity for _, _, _, quantity in removed),
+        counters.ROLLUP_GENERATION: 1,  # Cached analytics still include its sales
+    })
+    versions.touch(*tables)
+    # Synced clients drop it and its stock at once
+    changes.deleted(model, [obj.id])
+    changes.deleted(Stock, stock_ids)
+
+    if settings.PURGE_IN_BACKGROUND:
+        transaction.on_commit(lambda: _start(model, obj.id))
+    return True
+
+
+def _start(model, pk):
+    def run():
+        try:
+            purge(model, pk)
+        except Exception:
+            # Left for the purge_deleted command to finish
+            logger.exception('Purging %s %s failed', model.__name__, pk)
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, name=f'purge-{model.__name__}-{pk}', daemon=True).start()
+
+
+def _cascades(model):
+    """(dependent model, foreign key name) for every relation that deleting a `model` row cascades to."""
+    for relation in model._meta.related_objects:
+        if relation.on_delete is models.CASCADE:
+            yield relation.related_model, relation.field.name
+        elif relation.on_delete is not models.DO_NOTHING:
+            raise ImproperlyConfigured(
+                f'{relation.related_model.__name__}.{relation.field.name} cannot be purged in chunks'
+            )
+
+
+def _delete_chunked(model, lookup, chunk_size):
+    """Deletes the `model` rows matching lookup, dependents first, chunk_size rows at a time. Returns the row count."""
+    dependents = list(_cascades(model))
+    rows = model._base_manager.filter(**lookup).values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        # Unordered, so the database reads the ids straight off the foreign key index;
+        # the rows of the previous chunk are gone, so this always finds new ones
+        ids = list(rows[:chunk_size])
+        if not ids:
+            return deleted
+        for dependent, field in dependents:
+            deleted += _delete_chunked(dependent, {f'{field}__in': ids}, chunk_size)
+        chunk = model._base_manager.filter(pk__in=ids)
+        with transaction.atomic():
+            if model in (Sale, SaleArchive):
+                counters.bump(counters.sales_removal_deltas(chunk))
+            deleted += chunk._raw_delete(connection.alias)
+
+
+def purge(model, pk, chunk_size=None):
+    """
+    Deletes a deactivated Branch or Product and every row that depends on it.
+    Returns the number of rows deleted (0 if it is not deactivated).
+    """
+    chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+    obj = model.objects.filter(id=pk, is_active=False).first()
+    if obj is None:
+        return 0
+    deleted = 0
+    for dependent, field in _cascades(model):
+        deleted += _delete_chunked(dependent, {field: obj}, chunk_size)
+    # Nothing depends on it any more, so this no longer loads anything; it also
+    # sends post_delete for the catalog cache
+    deleted += obj.delete()[0]
+    logger.info('Purged %s %s (%d rows)', model.__name__, pk, deleted)
+    return deleted
@@ -0,0 +1,119 @@
+"""
+Response renderers used through REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].
+
+JSON stays the default. Clients that fetch large lists can ask for another
+layout with the Accept header or ?format=:
+
+    ?format=columnar  Accept: application/vnd.inventory.columnar+json
+    ?format=msgpack   Accept: application/msgpack
+
+The columnar layout turns a list of rows into one array per field, with the
+repeated branch and product names replaced by indexes into lookup tables:
+
+    {"count": 2,
+     "columns": {"id": [7, 8], "branch_name": [0, 0], "product_name": [0, 1], ...},
+     "dictionaries": {"branch_name": ["Main"], "product_name": ["Laptop", "Mouse"]}}
+
+A paged response keeps its other keys and has "results" in this layout.
+Anything that is not a list of rows (a single object, an error) is sent
+unchanged. MessagePack responses use the same layout, binary-encoded.
+"""
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+from .instrumentation import measure
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it the stock JSONRenderer is used
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; settings only list MessagePackRenderer when it is installed
+    msgpack = None
+
+# Text columns with few distinct values, sent once in "dictionaries"
+DICTIONARY_FIELDS = ('branch_name', 'product_name')
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed. The output is
+    the same bytes as JSONRenderer's compact UTF-8 output; indented responses
+    (browsable API, ?indent) still go through the standard encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with measure('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Dates and times go through DRF's encoder, which formats them differently from orjson
+            ret = orjson.dumps(
+                data, default=encoders.JSONEncoder().default, option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            # Anything orjson cannot handle (e.g. integers beyond 64 bits)
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping of the JavaScript line terminators as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def to_columns(rows):
+    """Converts a list of row dicts (all with the same keys) into the columnar layout."""
+    fields = list(rows[0]) if rows else []
+    columns = {field: [row[field] for row in rows] for field in fields}
+    dictionaries = {}
+    for field in DICTIONARY_FIELDS:
+        if field not in columns:
+            continue
+        index = {}
+        columns[field] = [index.setdefault(value, len(index)) for value in columns[field]]
+        dictionaries[field] = list(index)
+    return {'count': len(rows), 'columns': columns, 'dictionaries': dictionaries}
+
+
+def _is_rows(data):
+    return isinstance(data, list) and all(isinstance(row, dict) for row in data)
+
+
+def columnar(data):
+    """Applies the columnar layout to a list of rows or a paged response; other data is returned as-is."""
+    if _is_rows(data):
+        return to_columns(data)
+    if isinstance(data, dict) and _is_rows(data.get('results')):
+        return {**data, 'results': to_columns(data['results'])}
+    return data
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """JSON with list responses in the columnar layout (see the module docstring)."""
+    media_type = 'application/vnd.inventory.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with measure('render'):
+            data = columnar(data)
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """The columnar layout encoded as MessagePack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with measure('render'):
+            # Decimals, dates etc. are converted the same way as for JSON
+            return msgpack.packb(columnar(data), default=encoders.JSONEncoder().default)
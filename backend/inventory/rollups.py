@@ -0,0 +1,103 @@
+"""
+Incremental maintenance of the SaleDailyRollup table.
+
+The sale views call apply() inside the transaction that writes or deletes
+the Sale rows, so the rollup always matches the committed sales. Revenue is
+units x the product's price at the time the sale is recorded; rebuild()
+recomputes a date range from the raw sales (with current prices).
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+from . import counters
+from .counters import day_bounds, local_day
+from .models import Product, Sale, SaleArchive, SaleDailyRollup
+
+
+def sale_deltas(sales, sign=1, prices=None):
+    """
+    Returns {(day, branch_id, product_id): (units, revenue)} for recording
+    (sign=1) or deleting (sign=-1) the given sales. prices maps product id to
+    price; any product not in it is looked up with one query.
+    """
+    prices = dict(prices or {})
+    missing = {sale.product_id for sale in sales} - set(prices)
+    if missing:
+        prices.update(Product.objects.filter(id__in=missing).values_list('id', 'price'))
+
+    deltas = {}
+    for sale in sales:
+        key = (local_day(sale.date), sale.branch_id, sale.product_id)
+        units, revenue = deltas.get(key, (0, Decimal('0')))
+        deltas[key] = (
+            units + sign * sale.quantity,
+            revenue + sign * sale.quantity * prices[sale.product_id],
+        )
+    return deltas
+
+
+def apply(deltas):
+    """
+    Adds {(day, branch_id, product_id): (units, revenue)} to the rollup with
+    UPDATE ... SET units = units + n. Keys are applied in sorted order so two
+    transactions touching the same rows lock them in the same order.
+    """
+    today = local_day()
+    if any(day < today for day, _, _ in deltas):
+        # A past day changed (late upload, deleted sale): cached reports are stale once this
+        # commits. Bumped afterwards, on its own, so sale writes do not all queue on its row
+        transaction.on_commit(lambda: counters.bump({counters.ROLLUP_GENERATION: 1}))
+    for (day, branch_id, product_id), (units, revenue) in sorted(deltas.items()):
+        if not units and not revenue:
+            continue
+        rows = SaleDailyRollup.objects.filter(day=day, branch_id=branch_id, product_id=product_id)
+        if rows.update(units=F('units') + units, revenue=F('revenue') + revenue):
+            continue
+        # First sale of this product at this branch today
+        try:
+            with transaction.atomic():
+                SaleDailyRollup.objects.create(
+                    day=day, branch_id=branch_id, product_id=product_id, units=units, revenue=revenue
+                )
+        except IntegrityError:
+            rows.update(units=F('units') + units, revenue=F('revenue') + revenue)
+
+
+@transaction.atomic
+def rebuild(first_day, last_day):
+    """
+    Recomputes the rollup rows for every day from first_day to last_day
+    (inclusive) from the raw sales, archived ones included. Returns the
+    number of rollup rows written.
+    """
+    start, _ = day_bounds(first_day)
+    _, end = day_bounds(last_day)
+    SaleDailyRollup.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+    totals = {}  # (day, branch_id, product_id) -> [units, revenue]
+    for model in (SaleArchive, Sale):
+        for row in (
+            model.objects.filter(date__gte=start, date__lt=end)
+            .annotate(day=TruncDate('date'))
+            .values('day', 'branch_id', 'product_id')
+            .annotate(
+                total_units=Sum('quantity'),
+                total_revenue=Sum(ExpressionWrapper(
+                    F('quantity') * F('product__price'),
+                    output_field=DecimalField(max_digits=14, decimal_places=2),
+                )),
+            )
+            .order_by()
+        ):
+            total = totals.setdefault((row['day'], row['branch_id'], row['product_id']), [0, 0])
+            total[0] += row['total_units']
+            total[1] += row['total_revenue'] or 0
+    rollups = [
+        SaleDailyRollup(day=day, branch_id=branch_id, product_id=product_id, units=units, revenue=revenue)
+        for (day, branch_id, product_id), (units, revenue) in totals.items()
+    ]
+    SaleDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+    counters.bump({counters.ROLLUP_GENERATION: 1})
+    return len(rollups)
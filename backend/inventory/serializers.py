@@ -1,40 +1,93 @@
 from rest_framework import serializers
+from .instrumentation import measure
 from .models import Branch, Product, Stock, Sale
 
+
+# Timed serializers: the time spent building .data shows up as "serialize"
+# in the Server-Timing header (see instrumentation.py)
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+
+# Stock and sales can only be written for branches and products that are not deleted
+ACTIVE_BRANCH_AND_PRODUCT = {
+    'branch': {'queryset': Branch.objects.filter(is_active=True)},
+    'product': {'queryset': Product.objects.filter(is_active=True)},
+}
+
+
 # Branch Serializer: Converts Branch model to/from JSON
 # Used to send branch data to frontend and receive it from frontend
-class BranchSerializer(serializers.ModelSerializer):
+class BranchSerializer(TimedModelSerializer):
     class Meta:
         model = Branch
-        fields = '__all__'  # Include all fields: id, name, location
+        list_serializer_class = TimedListSerializer
+        exclude = ('is_active', 'version', 'updated_at')  # Include all fields: id, name, location (the rest is bookkeeping)
 
 
 # Product Serializer: Converts Product model to/from JSON
 # Used to send product data to frontend and receive it from frontend
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'  # Include all fields: id, name, price
+        list_serializer_class = TimedListSerializer
+        exclude = ('is_active', 'version', 'updated_at')  # Include all fields: id, name, price (the rest is bookkeeping)
 
 
 # Stock Serializer: Converts Stock model to/from JSON
 # Shows branch name and product name instead of just IDs for better readability
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(TimedModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)  # Show branch name
     product_name = serializers.CharField(source='product.name', read_only=True)  # Show product name
     
     class Meta:
         model = Stock
-        fields = '__all__'  # Include all fields: id, branch, product, quantity, branch_name, product_name
+        list_serializer_class = TimedListSerializer
+        exclude = ('version', 'updated_at')  # Include all fields: id, branch, product, quantity, branch_name, product_name
+        extra_kwargs = ACTIVE_BRANCH_AND_PRODUCT
 
 
 # Sale Serializer: Converts Sale model to/from JSON
 # Shows branch name and product name instead of just IDs for better readability
-class SaleSerializer(serializers.ModelSerializer):
+class SaleSerializer(TimedModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)  # Show branch name
     product_name = serializers.CharField(source='product.name', read_only=True)  # Show product name
     
     class Meta:
         model = Sale
+        list_serializer_class = TimedListSerializer
         fields = '__all__'  # Include all fields: id, branch, product, quantity, date, branch_name, product_name
+        extra_kwargs = ACTIVE_BRANCH_AND_PRODUCT
+
+
+
+# Basket Serializers: Validate a multi-line sale posted to /api/add-sale-basket/
+# Only the shape is checked here; stock and product existence are checked in one query by the view
+class BasketItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)  # Product ID
+    quantity = serializers.IntegerField(min_value=1)  # Units sold
+
+
+class BasketSaleSerializer(serializers.Serializer):
+    branch = serializers.IntegerField(min_value=1)  # Branch ID where the sale happens
+    items = BasketItemSerializer(many=True, allow_empty=False)  # The basket lines
+
 
+# Sale Ingest Serializer: Validates one row of a bulk sales upload (/api/sales/bulk/)
+# Same rules as SaleSerializer plus an optional date for sales recorded offline;
+# branch/product existence is checked for a whole chunk of rows at once by the view
+class SaleIngestSerializer(serializers.Serializer):
+    branch = serializers.IntegerField(min_value=1)  # Branch ID
+    product = serializers.IntegerField(min_value=1)  # Product ID
+    quantity = serializers.IntegerField(min_value=1)  # Units sold
+    date = serializers.DateTimeField(required=False)  # When the sale happened (defaults to now)
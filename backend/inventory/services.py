@@ -0,0 +1,229 @@
+"""
+Stock changes shared by the sale views and the admin.
+
+Quantities are changed with a single conditional UPDATE using F() expressions
+(UPDATE ... SET quantity = quantity - n WHERE quantity >= n), so the database
+does the check and the write in one statement and two concurrent sales can
+never both take the last unit. Call these inside the transaction that writes
+the matching Sale rows.
+"""
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from . import changes, counters, ledger, purge, rollups, versions
+from .models import Sale, Stock
+
+# Sales per INSERT where the ids are worked out from LAST_INSERT_ID() (MySQL; see create_sales())
+SALE_INSERT_BATCH = 1000
+
+
+class StockError(Exception):
+    """
+    Raised when a stock change cannot be applied. The message is shown to the
+    user; items optionally maps product IDs to the reason each line failed.
+    """
+
+    def __init__(self, message, items=None):
+        super().__init__(message)
+        self.items = items or {}
+
+
+def decrement_stock(branch_id, product_id, quantity):
+    """Takes quantity units out of stock, or raises StockError if there are not enough."""
+    updated = Stock.objects.filter(
+        branch_id=branch_id,
+        product_id=product_id,
+        quantity__gte=quantity,
+    ).update(quantity=F('quantity') - quantity)
+    if updated:
+        return
+
+    # Nothing matched: work out why so the user gets the right message
+    if Stock.objects.filter(branch_id=branch_id, product_id=product_id).exists():
+        raise StockError('Not enough stock available')
+    raise StockError('Stock not found for this branch and product')
+
+
+def restore_stock(branch_id, product_id, quantity):
+    """
+    Puts quantity units back into stock, creating the stock record if it was
+    deleted in the meantime. Returns True if a new record was created.
+    """
+    updated = Stock.objects.filter(
+        branch_id=branch_id,
+        product_id=product_id,
+    ).update(quantity=F('quantity') + quantity)
+    if updated:
+        return False
+    Stock.objects.create(branch_id=branch_id, product_id=product_id, quantity=quantity)
+    return True
+
+
+def delete_sale(sale_id):
+    """
+    Deletes a sale and puts its units back into stock, keeping the counters,
+    daily rollups, ledger, version stamps and change feed in step. Used by the
+    delete view and the admin. Raises Sale.DoesNotExist if the sale is not
+    there (archived, or of a deleted branch or product and waiting to be purged).
+    """
+    # Lock the sale so two concurrent deletes cannot both restore its stock
+    sale = purge.visible(Sale.objects.select_for_update()).get(id=sale_id)
+
+    # Restore stock when deleting a sale (recreates the stock record if it was removed)
+    deltas = counters.sale_deltas(sale, sign=-1)
+    if restore_stock(sale.branch_id, sale.product_id, sale.quantity):
+        deltas[counters.STOCK_ITEMS] = 1
+    ledger.record_sales([sale], sign=1)  # Before delete(), which clears sale.pk
+
+    sale.delete()
+    counters.bump(deltas)
+    rollups.apply(rollups.sale_deltas([sale], sign=-1))
+    versions.touch(versions.SALE, versions.STOCK)
+    changes.stamp_stock([(sale.branch_id, sale.product_id)])
+
+
+def _decrement_locked(amounts):
+    """
+    Applies {stock_id: units_to_take} with a single CASE UPDATE. Only safe on
+    rows already locked (and checked) by the caller's SELECT ... FOR UPDATE.
+    """
+    if not amounts:
+        return
+    Stock.objects.filter(id__in=list(amounts)).update(
+        quantity=F('quantity') - Case(
+            *[When(id=stock_id, then=Value(quantity)) for stock_id, quantity in amounts.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def create_sales(sales):
+    """
+    Inserts unsaved Sale objects with bulk INSERTs and sets their ids.
+
+    SQLite and PostgreSQL return the new ids from the INSERT itself. MySQL
+    does not, so there the sales go in SALE_INSERT_BATCH rows per INSERT and
+    SELECT LAST_INSERT_ID() gives the id of each INSERT's first row. InnoDB
+    gives the rows of one multi-row INSERT ids that are consecutive, apart
+    from the auto_increment_increment step, in every innodb_autoinc_lock_mode
+    as long as no INSERT ... SELECT or LOAD DATA runs on the table at the same
+    time. The ids are then read back once per batch. If another statement did
+    interleave, DatabaseError is raised and the transaction rolls back.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Sale.objects.bulk_create(sales)
+    for start in range(0, len(sales), SALE_INSERT_BATCH):
+        batch = sales[start:start + SALE_INSERT_BATCH]
+        Sale.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT LAST_INSERT_ID(), @@auto_increment_increment')
+            first_id, step = cursor.fetchone()
+        for offset, sale in enumerate(batch):
+            sale.id = first_id + offset * step
+        expected = sorted((sale.id, sale.branch_id, sale.product_id, sale.quantity) for sale in batch)
+        stored = Sale.objects.filter(id__in=[sale.id for sale in batch]).values_list(
+            'id', 'branch_id', 'product_id', 'quantity'
+        )
+        if sorted(stored) != expected:
+            raise DatabaseError('The new sale ids could not be worked out from LAST_INSERT_ID()')
+    return sales
+
+
+def sell_basket(branch_id, items):
+    """
+    Records a multi-line sale at one branch, all or nothing.
+
+    items is a list of (product_id, quantity) pairs; repeated products are
+    merged. The affected Stock rows are read and locked with one
+    SELECT ... FOR UPDATE in product order (a fixed order, so two baskets
+    sharing products cannot deadlock), decremented with one UPDATE and the
+    Sale rows are written with create_sales(). Must run inside a transaction.
+    Returns the new Sale objects.
+    """
+    wanted = {}
+    for product_id, quantity in items:
+        wanted[product_id] = wanted.get(product_id, 0) + quantity
+
+    stocks = {
+        stock.product_id: stock
+        for stock in Stock.objects.select_for_update()
+        .filter(branch_id=branch_id, product_id__in=wanted)
+        .order_by('product_id')
+        .only('id', 'product_id', 'quantity')
+    }
+
+    problems = {}
+    for product_id, quantity in wanted.items():
+        stock = stocks.get(product_id)
+        if stock is None:
+            problems[product_id] = 'Stock not found for this branch and product'
+        elif stock.quantity < quantity:
+            problems[product_id] = 'Not enough stock available'
+    if problems:
+        raise StockError('Basket could not be completed', items=problems)
+
+    _decrement_locked({stocks[product_id].id: quantity for product_id, quantity in wanted.items()})
+
+    # One Sale row per basket line, in the order they were given
+    return create_sales([
+        Sale(branch_id=branch_id, product_id=product_id, quantity=quantity)
+        for product_id, quantity in items
+    ])
+
+
+def ingest_sales(rows):
+    """
+    Records one chunk of a bulk sales upload. Must run inside a transaction.
+
+    rows is a list of validated dicts (branch, product, quantity and optional
+    date). Stock for every (branch, product) in the chunk is locked with one
+    query, the rows are accepted in order while stock lasts, the accepted
+    quantities are summed per stock record and applied with one UPDATE, and
+    the Sale rows are written with create_sales() (one INSERT for the whole
+    chunk, with real ids on MySQL too).
+
+    Returns (outcomes, sales): outcomes has one entry per row, either a Sale
+    or the reason the row was rejected; sales are the Sale objects created.
+    """
+    products_by_branch = {}
+    for row in rows:
+        products_by_branch.setdefault(row['branch'], set()).add(row['product'])
+    if not products_by_branch:
+        return [], []
+
+    wanted = Q()
+    for branch_id, product_ids in products_by_branch.items():
+        wanted |= Q(branch_id=branch_id, product_id__in=product_ids)
+    stocks = {
+        (stock.branch_id, stock.product_id): stock
+        for stock in Stock.objects.select_for_update()
+        .filter(wanted)
+        .order_by('branch_id', 'product_id')
+        .only('id', 'branch_id', 'product_id', 'quantity')
+    }
+
+    available = {key: stock.quantity for key, stock in stocks.items()}
+    taken = {}
+    outcomes = []
+    new_sales = []
+    for row in rows:
+        key = (row['branch'], row['product'])
+        if key not in stocks:
+            outcomes.append('Stock not found for this branch and product')
+            continue
+        if available[key] < row['quantity']:
+            outcomes.append('Not enough stock available')
+            continue
+        available[key] -= row['quantity']
+        stock_id = stocks[key].id
+        taken[stock_id] = taken.get(stock_id, 0) + row['quantity']
+        sale = Sale(branch_id=row['branch'], product_id=row['product'], quantity=row['quantity'])
+        if row.get('date'):
+            sale.date = row['date']
+        outcomes.append(sale)
+        new_sales.append(sale)
+
+    _decrement_locked(taken)
+    create_sales(new_sales)
+    return outcomes, new_sales
@@ -0,0 +1,131 @@
+"""
+Slow-query recorder (settings: SLOW_QUERY_MS, SLOW_QUERY_BUFFER_SIZE).
+
+SlowQueryMiddleware watches every request's database work through
+instrumentation.observe_queries(). A statement that takes longer than
+SLOW_QUERY_MS is recorded with its SQL, parameters, the view that ran it, a
+short stack summary (the project frames that led to it) and the database's
+plan for it, taken with the backend's own EXPLAIN syntax (EXPLAIN QUERY PLAN
+on SQLite, EXPLAIN on MySQL).
+
+Entries are kept in a fixed-size ring buffer, newest last, and shown at
+/api/debug/slow-queries/ to staff users. The buffer is per worker process.
+"""
+import collections
+import threading
+import traceback
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .instrumentation import observe_queries
+
+MAX_PARAM_LENGTH = 200  # Long parameter values are cut, to keep entries small
+STACK_DEPTH = 8
+
+_entries = collections.deque(maxlen=getattr(settings, 'SLOW_QUERY_BUFFER_SIZE', 100))
+_entries_lock = threading.Lock()
+_explaining = ContextVar('inventory_slow_query_explaining', default=False)
+
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# The middleware plumbing is left out of the stack summaries
+_SKIPPED_FILES = {
+    str(Path(__file__).resolve()),
+    str(Path(__file__).with_name('instrumentation.py').resolve()),
+}
+# Statements EXPLAIN accepts on both SQLite and MySQL
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def entries():
+    """The recorded slow queries, oldest first."""
+    with _entries_lock:
+        return list(_entries)
+
+
+def clear():
+    with _entries_lock:
+        _entries.clear()
+
+
+def _short(value):
+    text = repr(value)
+    return text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + '...'
+
+
+def _stack_summary():
+    """The last project frames (not Django's or this module's) that led to the query."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_PROJECT_DIR)
+        and 'site-packages' not in frame.filename
+        and frame.filename not in _SKIPPED_FILES
+    ]
+    return [
+        f'{Path(frame.filename).relative_to(_PROJECT_DIR)}:{frame.lineno} in {frame.name}'
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+def _explain(sql, params):
+    """Returns the plan as a list of rows (dicts), or raises whatever the database raised."""
+    prefix = connection.ops.explain_query_prefix()
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        _explaining.reset(token)
+
+
+class _Recorder:
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, sql, params, many, seconds, ok):
+        # Only statements that succeeded, and not the EXPLAINs run for them
+        if ok and not _explaining.get() and seconds * 1000 >= self.threshold:
+            self._record(sql, params, many, seconds)
+
+    def _record(self, sql, params, many, duration):
+        match = getattr(self.request, 'resolver_match', None)
+        entry = {
+            'recorded_at': timezone.now().isoformat(),
+            'duration_ms': round(duration * 1000, 2),
+            'view': match.view_name if match else None,
+            'method': self.request.method,
+            'path': self.request.path,
+            'sql': sql,
+            'params': None if many else [_short(value) for value in params or ()],
+            'stack': _stack_summary(),
+            'explain': None,
+        }
+        # Plans only for single statements that EXPLAIN understands; run after the
+        # statement succeeded (SQLite and MySQL keep the transaction usable if it fails)
+        if not many and sql.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                entry['explain'] = _explain(sql, params)
+            except Exception as e:
+                entry['explain_error'] = str(e)
+        with _entries_lock:
+            _entries.append(entry)
+
+
+class SlowQueryMiddleware:
+    """Records slow statements run while handling a request; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SLOW_QUERY_MS', None)
+
+    def __call__(self, request):
+        if self.threshold is None:
+            return self.get_response(request)
+        with observe_queries(_Recorder(request, self.threshold)):
+            return self.get_response(request)
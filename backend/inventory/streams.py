@@ -0,0 +1,137 @@
+"""
+Incremental readers for large request bodies.
+
+The upload endpoints read the raw request stream in fixed-size pieces and
+hand back one record at a time, so memory use depends on the size of a
+single record rather than on the size of the upload.
+"""
+import codecs
+import json
+
+READ_SIZE = 64 * 1024  # Bytes read from the stream at a time
+MAX_RECORD_BYTES = 1024 * 1024  # Longest single record/line we are willing to buffer
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+
+
+class StreamFormatError(ValueError):
+    """Raised when the body as a whole cannot be parsed any further."""
+
+
+def iter_text(stream):
+    """Yields decoded UTF-8 text from a binary stream, piece by piece."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(data)
+
+
+def iter_lines(stream):
+    """Yields the lines of a binary stream as text, without line endings."""
+    buffer = ''
+    for piece in iter_text(stream):
+        buffer += piece
+        lines = buffer.split('\n')
+        buffer = lines.pop()
+        if len(buffer) > MAX_RECORD_BYTES:
+            raise StreamFormatError('Line is too long')
+        for line in lines:
+            yield line.rstrip('\r')
+    if buffer:
+        yield buffer.rstrip('\r')
+
+
+def iter_ndjson(stream):
+    """
+    Yields (record, error) for every non-blank line of an NDJSON body.
+    A line that is not a JSON object gives (None, reason) instead of stopping the upload.
+    """
+    for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield None, 'Each line must be a JSON object'
+            continue
+        yield record, None
+
+
+def iter_json_array(stream):
+    """
+    Yields (record, error) for every element of a top-level JSON array without
+    loading the whole array. Raises StreamFormatError if the array itself is broken.
+    """
+    pieces = iter_text(stream)
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    expect = '['  # '[' -> 'first' -> ('item' -> 'separator')* -> done
+
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if eof:
+                raise StreamFormatError('Unexpected end of JSON array')
+            piece = next(pieces, None)
+            if piece is None:
+                eof = True
+            else:
+                buffer += piece
+            continue
+
+        if expect == '[':
+            if buffer[0] != '[':
+                raise StreamFormatError('Body must be a JSON array')
+            buffer = buffer[1:]
+            expect = 'first'
+            continue
+
+        if expect in ('first', 'separator') and buffer[0] == ']':
+            return
+        if expect == 'separator':
+            if buffer[0] != ',':
+                raise StreamFormatError('Expected "," or "]" in JSON array')
+            buffer = buffer[1:]
+            expect = 'item'
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except ValueError:
+            # Probably cut off in the middle of an element: read more and retry
+            if eof:
+                raise StreamFormatError('Invalid JSON in array')
+            if len(buffer) > MAX_RECORD_BYTES:
+                raise StreamFormatError('Array element is too large')
+            piece = next(pieces, None)
+            if piece is None:
+                eof = True
+            else:
+                buffer += piece
+            continue
+        buffer = buffer[end:]
+        expect = 'separator'
+        if isinstance(record, dict):
+            yield record, None
+        else:
+            yield None, 'Each element must be a JSON object'
+
+
+def iter_records(stream, content_type):
+    """Picks the reader for a request's content type (NDJSON or a JSON array)."""
+    if content_type in NDJSON_CONTENT_TYPES:
+        return iter_ndjson(stream)
+    if content_type == 'application/json':
+        return iter_json_array(stream)
+    raise StreamFormatError(
+        'Unsupported content type; send application/json (an array) or application/x-ndjson'
+    )
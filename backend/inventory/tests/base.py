@@ -0,0 +1,38 @@
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from inventory.models import Stock
+
+
+# Base class for the API tests: creates rows through the write views, so the
+# counters, ledger, version stamps and change feed are kept like in production
+# (without the per-request timing log lines, which would end up in the test output)
+@override_settings(PERF_TIMING=False, PURGE_IN_BACKGROUND=False, CHANGE_FEED_SETTLE_SECONDS=0)
+class InventoryTestCase(APITestCase):
+    def setUp(self):
+        # The catalog cache outlives the rolled back test transaction
+        caches['catalog'].clear()
+
+    def post(self, url, data):
+        return self.client.post(url, data, format='json')
+
+    def add_branch(self, name='Main', location='Town'):
+        response = self.post('/api/add-branch/', {'name': name, 'location': location})
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def add_product(self, name='Widget', price='2.50'):
+        response = self.post('/api/add-product/', {'name': name, 'price': price})
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def add_stock(self, branch_id, product_id, quantity):
+        response = self.post('/api/add-stock/', {'branch': branch_id, 'product': product_id, 'quantity': quantity})
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def sell(self, branch_id, product_id, quantity):
+        return self.post('/api/add-sale/', {'branch': branch_id, 'product': product_id, 'quantity': quantity})
+
+    def quantity(self, branch_id, product_id):
+        return Stock.objects.get(branch_id=branch_id, product_id=product_id).quantity
@@ -0,0 +1,68 @@
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from inventory.counters import local_day
+
+from .base import InventoryTestCase
+
+
+class SalesAnalyticsTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # Closed buckets are cached
+        self.branch = self.add_branch()
+        self.other_branch = self.add_branch('Other')
+        self.product = self.add_product(price='2.50')
+        self.add_stock(self.branch, self.product, 100)
+        self.add_stock(self.other_branch, self.product, 100)
+        self.today = local_day()
+        self.upload([(self.branch, 2, 5), (self.branch, 3, 5), (self.other_branch, 1, 5), (self.branch, 4, 0)])
+
+    def upload(self, sales):
+        """Records (branch, quantity, days ago) sales through the bulk upload."""
+        body = '\n'.join(
+            json.dumps({
+                'branch': branch, 'product': self.product, 'quantity': quantity,
+                'date': f'{self.today - timedelta(days=days_ago)}T12:00:00',
+            })
+            for branch, quantity, days_ago in sales
+        )
+        response = self.client.post('/api/sales/bulk/', body, content_type='application/x-ndjson')
+        b''.join(response.streaming_content)
+
+    def series(self, **params):
+        params.setdefault('date_from', str(self.today - timedelta(days=6)))
+        response = self.client.get('/api/analytics/sales/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_daily_totals(self):
+        days_ago = str(self.today - timedelta(days=5))
+        self.assertEqual(self.series(), [
+            {'period': days_ago, 'units': 6, 'revenue': '15.00'},
+            {'period': str(self.today), 'units': 4, 'revenue': '10.00'},
+        ])
+
+    def test_rollup_and_raw_sales_agree(self):
+        for params in [{}, {'group_by': 'branch'}, {'period': 'week'}, {'period': 'month', 'branch': self.branch}]:
+            self.assertEqual(self.series(**params), self.series(source='sales', **params), params)
+
+    def test_group_by_branch(self):
+        day = str(self.today - timedelta(days=5))
+        results = self.series(group_by='branch', date_from=day, date_to=day)
+        self.assertEqual([(row['branch_name'], row['units']) for row in results], [('Main', 5), ('Other', 1)])
+
+    def test_late_upload_changes_a_cached_bucket(self):
+        before = self.series()
+        with self.captureOnCommitCallbacks(execute=True):  # The generation is bumped once the upload commits
+            self.upload([(self.other_branch, 7, 5)])
+        after = self.series()
+        self.assertEqual(after[0]['units'], before[0]['units'] + 7)
+
+    def test_invalid_query(self):
+        for params in [{'period': 'year'}, {'group_by': 'city'}, {'date_from': 'soon'},
+                       {'date_from': str(self.today), 'date_to': str(self.today - timedelta(days=1))}]:
+            response = self.client.get('/api/analytics/sales/', params)
+            self.assertEqual(response.status_code, 400, params)
@@ -0,0 +1,79 @@
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from inventory import archive
+from inventory.models import Sale, SaleArchive
+
+from .base import InventoryTestCase
+
+
+class ArchiveTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 20)
+        # Two sales on each of 1-3 March, the second of the 2nd at midnight sharp
+        dates = [
+            datetime(2026, 3, 1, 9), datetime(2026, 3, 1, 17), datetime(2026, 3, 2, 9),
+            datetime(2026, 3, 2), datetime(2026, 3, 3, 9), datetime(2026, 3, 3, 17),
+        ]
+        for date in dates:
+            sale_id = self.sell(self.branch, self.product, 1).data['id']
+            Sale.objects.filter(id=sale_id).update(date=date)
+        self.listed = self.client.get('/api/sales/').data
+
+    def test_moves_the_sales_before_the_cutoff_in_batches(self):
+        batches = []
+        run = archive.archive_sales(
+            datetime(2026, 3, 2), batch_size=1, progress=lambda run: batches.append(run.rows)
+        )
+        self.assertEqual(batches, [1, 2])
+        self.assertEqual((run.rows, archive.boundary()), (2, datetime(2026, 3, 2)))
+        self.assertEqual(sorted(SaleArchive.objects.values_list('date', flat=True)), [
+            datetime(2026, 3, 1, 9), datetime(2026, 3, 1, 17),
+        ])
+        # The sale at midnight on the cutoff day is not before it
+        self.assertEqual(Sale.objects.count(), 4)
+
+    def test_lists_read_both_tables_when_they_reach_back(self):
+        call_command('archive_sales', before='2026-03-03', stdout=StringIO())
+        self.assertEqual(SaleArchive.objects.count(), 4)
+        # The plain list has no order; compare by id
+        listed = sorted(self.client.get('/api/sales/').data, key=lambda sale: sale['id'])
+        self.assertEqual(listed, sorted(self.listed, key=lambda sale: sale['id']))
+
+        # Pages run across both tables in (date, id) order
+        ids, params = [], {'limit': 4}
+        while True:
+            data = self.client.get('/api/sales/', params).data
+            ids += [sale['id'] for sale in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        newest_first = sorted(self.listed, key=lambda sale: (sale['date'], sale['id']), reverse=True)
+        self.assertEqual(ids, [sale['id'] for sale in newest_first])
+
+        self.assertEqual(len(self.client.get('/api/sales/', {'date_from': '2026-03-02'}).data), 4)
+        export = b''.join(self.client.get('/api/sales/export/ndjson/').streaming_content)
+        self.assertEqual(len(export.splitlines()), 6)
+
+    def test_recent_ranges_read_only_the_current_table(self):
+        call_command('archive_sales', before='2026-03-02', stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/sales/', {'date_from': '2026-03-02'}).data
+        self.assertEqual(len(data), 4)
+        self.assertFalse(any('"inventory_salearchive"' in query['sql'] for query in queries))
+
+    def test_archiving_changes_the_sales_etag(self):
+        etag = self.client.get('/api/sales/')['ETag']
+        archive.archive_sales(datetime(2026, 3, 2))
+        self.assertEqual(self.client.get('/api/sales/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cutoff_must_not_be_in_the_future(self):
+        with self.assertRaisesMessage(CommandError, 'must not be after today'):
+            call_command('archive_sales', before='2999-01-01', stdout=StringIO())
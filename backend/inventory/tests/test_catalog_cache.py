@@ -0,0 +1,27 @@
+from inventory import catalog_cache, versions
+from inventory.models import Product
+
+from .base import InventoryTestCase
+
+
+class CatalogCacheTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.add_product('Old')
+
+    def test_reads_are_cached(self):
+        catalog_cache.product_list()
+        with self.assertNumQueries(1):  # The version stamp only
+            self.assertEqual(catalog_cache.product_list()[0]['name'], 'Old')
+
+    def test_change_made_by_another_process_is_served(self):
+        self.client.get('/api/products/')
+        self.client.get(f'/api/products/{self.product}/')
+        # As another worker would: the change commits without reaching this process's cache
+        Product.objects.filter(id=self.product).update(name='New')
+        versions.touch(versions.PRODUCT)
+
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data[0]['name'], 'New')
+        self.assertEqual(self.client.get(f'/api/products/{self.product}/').data['name'], 'New')
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
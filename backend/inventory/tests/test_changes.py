@@ -0,0 +1,75 @@
+from django.test import override_settings
+
+from inventory.models import Stock
+
+from .base import InventoryTestCase
+
+
+class ChangeFeedTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+        self.stock = Stock.objects.get().id
+
+    def feed(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get('/api/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def changed(self, data):
+        return [(change['table'], change['op'], change['id']) for change in data['changes']]
+
+    def test_first_sync_returns_everything(self):
+        data = self.feed()
+        self.assertEqual(self.changed(data), [
+            ('branch', 'upsert', self.branch), ('product', 'upsert', self.product), ('stock', 'upsert', self.stock),
+        ])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.feed(data['next_cursor'])['changes'], [])
+
+    def test_cursor_returns_only_later_changes(self):
+        cursor = self.feed()['next_cursor']
+        self.sell(self.branch, self.product, 2)
+        data = self.feed(cursor)
+        self.assertEqual(self.changed(data), [('stock', 'upsert', self.stock)])
+        self.assertEqual(data['changes'][0]['data']['quantity'], 3)
+
+    def test_pages(self):
+        data = self.feed(limit=2)
+        self.assertEqual(len(data['changes']), 2)
+        self.assertTrue(data['has_more'])
+        data = self.feed(data['next_cursor'], limit=2)
+        self.assertEqual(self.changed(data), [('stock', 'upsert', self.stock)])
+        self.assertFalse(data['has_more'])
+
+    def test_deletions_are_sent_as_tombstones(self):
+        cursor = self.feed()['next_cursor']
+        self.client.delete(f'/api/stock/{self.stock}/delete/')
+        data = self.feed(cursor)
+        self.assertEqual(self.changed(data), [('stock', 'delete', self.stock)])
+        # A client that synced before the stock existed gets only the tombstone
+        self.assertNotIn(('stock', 'upsert', self.stock), self.changed(self.feed()))
+        self.assertEqual(self.feed(data['next_cursor'])['changes'], [])
+
+    def test_deleted_branch_sends_tombstones_for_its_stock(self):
+        cursor = self.feed()['next_cursor']
+        self.client.delete(f'/api/branches/{self.branch}/delete/')
+        self.assertEqual(
+            sorted(self.changed(self.feed(cursor))), [('branch', 'delete', self.branch), ('stock', 'delete', self.stock)]
+        )
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=60)
+    def test_recent_changes_wait_for_the_horizon(self):
+        # A transaction that stamped its rows just now may still be committing behind another one
+        data = self.feed()
+        self.assertEqual(data['changes'], [])
+        with override_settings(CHANGE_FEED_SETTLE_SECONDS=0):
+            self.assertEqual(len(self.feed(data['next_cursor'])['changes']), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/changes/', {'since': 'nonsense'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+
+from inventory import counters, purge
+from inventory.models import Branch, DashboardCounter, Product, Stock
+
+from .base import InventoryTestCase
+
+
+class CounterTests(InventoryTestCase):
+    def assertMatchesRebuild(self):
+        kept = counters.summary()
+        counters.rebuild()
+        self.assertEqual(kept, counters.summary())
+
+    def test_write_views_keep_counters_in_step(self):
+        branch = self.add_branch()
+        other_branch = self.add_branch('Other')
+        first = self.add_product('First')
+        second = self.add_product('Second')
+        self.add_stock(branch, first, 10)
+        self.add_stock(branch, second, 4)
+        self.add_stock(other_branch, first, 3)
+        sale_id = self.sell(branch, first, 2).data['id']
+        self.sell(other_branch, first, 1)
+        self.post('/api/add-sale-basket/', {'branch': branch, 'items': [
+            {'product': first, 'quantity': 1}, {'product': second, 'quantity': 4},
+        ]})
+        self.sell(branch, second, 1)  # Rejected: none left
+        self.client.delete(f'/api/sales/{sale_id}/delete/')
+        self.assertMatchesRebuild()
+
+        # Sales of a deleted branch count until the purge removes them
+        self.client.delete(f'/api/branches/{other_branch}/delete/')
+        self.assertMatchesRebuild()
+        with self.assertLogs('inventory.purge'):
+            purge.purge(Branch, other_branch)
+        self.assertEqual(counters.summary()['total_sales'], 2)
+        self.assertMatchesRebuild()
+
+    def test_shards_add_up(self):
+        for shard in range(counters.SHARDS):
+            DashboardCounter.objects.update_or_create(
+                name=counters._shard_name(counters.SALES, shard), defaults={'value': shard}
+            )
+        self.assertEqual(counters.read([counters.SALES]), {counters.SALES: sum(range(counters.SHARDS))})
+
+    def test_new_day_drops_the_past_days_buckets(self):
+        DashboardCounter.objects.filter(name__startswith=counters.SALES_ON_PREFIX).delete()  # No sale yet today
+        yesterday = counters.local_day() - timedelta(days=1)
+        for shard in range(counters.SHARDS):
+            DashboardCounter.objects.create(name=counters._shard_name(counters.sales_on_key(yesterday), shard), value=3)
+        branch = self.add_branch()
+        product = self.add_product()
+        self.add_stock(branch, product, 5)
+        self.sell(branch, product, 1)
+        self.assertFalse(DashboardCounter.objects.filter(name__startswith=counters.sales_on_key(yesterday)).exists())
+        self.assertEqual(counters.summary()['sales_today'], 1)
+
+    def test_admin_edits_keep_counters_in_step(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        self.client.post('/admin/inventory/branch/add/', {'name': 'Main', 'location': 'Town'})
+        self.client.post('/admin/inventory/product/add/', {'name': 'Widget', 'price': '2.50'})
+        branch, product = Branch.objects.get().id, Product.objects.get().id
+        self.client.post('/admin/inventory/stock/add/', {'branch': branch, 'product': product, 'quantity': 7})
+        stock = Stock.objects.get()
+        self.assertEqual(counters.summary()['total_units'], 7)
+        self.assertMatchesRebuild()
+
+        self.client.post(
+            f'/admin/inventory/stock/{stock.id}/change/', {'branch': branch, 'product': product, 'quantity': 4}
+        )
+        self.assertEqual(counters.summary()['total_units'], 4)
+        self.assertMatchesRebuild()
+
+        self.client.post(f'/admin/inventory/stock/{stock.id}/delete/', {'post': 'yes'})
+        self.assertFalse(Stock.objects.exists())
+        self.assertMatchesRebuild()
+
+        self.client.post('/admin/inventory/product/', {
+            'action': 'delete_selected', '_selected_action': [product], 'post': 'yes',
+        })
+        self.assertEqual(counters.summary()['total_products'], 0)
+        self.assertMatchesRebuild()
@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+
+from inventory import exports
+from inventory.models import Sale
+
+from .base import InventoryTestCase
+
+
+class SalesExportTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.other_branch = self.add_branch('Other')
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 10)
+        self.add_stock(self.other_branch, self.product, 10)
+        for branch in (self.branch, self.other_branch, self.branch):
+            self.sell(branch, self.product, 1)
+
+    def download(self, file_format, **params):
+        response = self.client.get(f'/api/sales/export/{file_format}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="sales.{file_format}"')
+        return b''.join(response.streaming_content).decode()
+
+    def listed(self, **params):
+        """The same sales as list_sales returns them, oldest first like the export."""
+        return sorted(self.client.get('/api/sales/', params).data, key=lambda sale: sale['id'])
+
+    def test_ndjson_rows_match_the_list(self):
+        rows = [json.loads(line) for line in self.download('ndjson').splitlines()]
+        self.assertEqual(rows, self.listed())
+
+    def test_csv_rows_match_the_list(self):
+        rows = list(csv.DictReader(io.StringIO(self.download('csv'))))
+        self.assertEqual(tuple(rows[0]), exports.SALE_COLUMNS)
+        self.assertEqual(rows, [{name: str(value) for name, value in sale.items()} for sale in self.listed()])
+
+    def test_filters_apply(self):
+        rows = [json.loads(line) for line in self.download('ndjson', branch=self.other_branch).splitlines()]
+        self.assertEqual(rows, self.listed(branch=self.other_branch))
+        self.assertEqual(len(rows), 1)
+
+    def test_batches_continue_from_the_last_id(self):
+        batches = list(exports.iter_sale_batches(Sale.objects.all(), batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        ids = [row[0] for batch in batches for row in batch]
+        self.assertEqual(ids, sorted(Sale.objects.values_list('id', flat=True)))
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/sales/export/xlsx/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['error'], 'Format must be csv or ndjson')
@@ -0,0 +1,39 @@
+from rest_framework.renderers import JSONRenderer
+
+from inventory.models import Sale, Stock
+from inventory.serializers import SaleSerializer, StockSerializer
+
+from .base import InventoryTestCase
+
+
+class FastPathTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.other_branch = self.add_branch('Öther')
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+        self.add_stock(self.other_branch, self.product, 5)
+        self.sell(self.branch, self.product, 1)
+        self.sell(self.other_branch, self.product, 2)
+
+    def assertSameJSON(self, url, serializer):
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, JSONRenderer().render(serializer.data))
+
+    def test_sales_match_the_serializer(self):
+        sales = Sale.objects.select_related('branch', 'product').order_by('id')
+        self.assertSameJSON('/api/sales/', SaleSerializer(sales, many=True))
+
+    def test_stock_matches_the_serializer(self):
+        stock = Stock.objects.select_related('branch', 'product').order_by('id')
+        self.assertSameJSON('/api/stock/', StockSerializer(stock, many=True))
+
+    def test_queries_do_not_grow_with_the_rows(self):
+        # The version stamps, the archived period, then the sales with their names joined in
+        with self.assertNumQueries(3):
+            self.client.get('/api/sales/')
+        self.sell(self.branch, self.product, 1)
+        with self.assertNumQueries(3):
+            self.client.get('/api/sales/')
@@ -0,0 +1,46 @@
+from inventory.models import Stock
+
+from .base import InventoryTestCase
+
+
+class FieldsetTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+        self.stock = Stock.objects.get().id
+        self.sell(self.branch, self.product, 1)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_fields_pick_columns(self):
+        self.assertEqual(self.get('/api/stock/', fields='quantity,id'), [{'id': self.stock, 'quantity': 4}])
+        self.assertEqual(self.get('/api/products/', fields='name'), [{'name': 'Widget'}])
+        self.assertEqual(list(self.get(f'/api/stock/{self.stock}/', fields='id,quantity')), ['id', 'quantity'])
+
+    def test_expand_adds_the_names(self):
+        sale = self.get('/api/sales/', expand='product')[0]
+        self.assertEqual(list(sale), ['id', 'product_name', 'quantity', 'date', 'branch', 'product'])
+        self.assertEqual(list(self.get('/api/sales/', fields='id', expand='branch')[0]), ['id', 'branch_name'])
+
+    def test_names_are_joined_only_when_expanded(self):
+        self.get('/api/stock/')  # Version stamps
+        with self.assertNumQueries(2) as queries:
+            self.get('/api/stock/', fields='id,quantity')
+        self.assertNotIn('inventory_branch', queries.captured_queries[-1]['sql'])
+
+    def test_without_parameters_every_column_is_sent(self):
+        self.assertEqual(
+            list(self.get('/api/stock/')[0]), ['id', 'branch_name', 'product_name', 'quantity', 'branch', 'product']
+        )
+
+    def test_unknown_names_are_rejected(self):
+        for url, params in [('/api/stock/', {'fields': 'cost'}), ('/api/sales/', {'expand': 'price'}),
+                            ('/api/branches/', {'expand': 'stock'})]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
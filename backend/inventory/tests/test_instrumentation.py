@@ -0,0 +1,61 @@
+import json
+from unittest import mock
+
+from django.test import override_settings
+from prometheus_client import REGISTRY
+
+from inventory import instrumentation, slow_queries
+
+from .base import InventoryTestCase
+
+
+class InstrumentationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+        slow_queries.clear()
+        self.addCleanup(slow_queries.clear)
+
+    def restart(self):
+        # The middleware reads its settings once, when the client's handler first loads it
+        self.client = self.client_class()
+
+    def metric(self, name, view):
+        return REGISTRY.get_sample_value(name, {'view': view}) or 0
+
+    @override_settings(PERF_TIMING=True, PERF_TIMING_SAMPLE_RATE=1.0, SLOW_QUERY_MS=0)
+    def test_one_wrapper_feeds_every_consumer(self):
+        self.restart()
+        metric_queries = self.metric('inventory_db_queries_per_request_sum', 'add_sale')
+        with mock.patch.object(instrumentation, '_observe', wraps=instrumentation._observe) as observe, \
+                self.assertLogs('inventory.perf') as logs:
+            response = self.sell(self.branch, self.product, 1)
+        timed = json.loads(logs.records[0].getMessage())['queries']
+        self.assertIn(f'desc="{timed} queries"', response['Server-Timing'])
+        # Each statement went through the wrapper once, and all three consumers saw it
+        self.assertEqual(observe.call_count, timed)
+        self.assertEqual(self.metric('inventory_db_queries_per_request_sum', 'add_sale') - metric_queries, timed)
+        explained = len([entry for entry in slow_queries.entries() if entry['explain'] is not None])
+        # The EXPLAINs are run through the wrapper too, but not recorded themselves
+        self.assertEqual(len(slow_queries.entries()) + explained, timed)
+
+    @override_settings(PERF_TIMING=True, PERF_TIMING_SAMPLE_RATE=0.0, SLOW_QUERY_MS=None)
+    def test_requests_that_are_not_sampled_are_not_timed(self):
+        self.restart()
+        queries = self.metric('inventory_db_queries_per_request_count', 'list_branches')
+        response = self.client.get('/api/branches/')
+        self.assertNotIn('Server-Timing', response)
+        # The metrics still see every request
+        self.assertEqual(self.metric('inventory_db_queries_per_request_count', 'list_branches'), queries + 1)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_recorded_with_their_plan(self):
+        self.restart()
+        self.client.get('/api/stock/')
+        entries = slow_queries.entries()
+        self.assertTrue(entries)
+        self.assertEqual({entry['view'] for entry in entries}, {'list_stock'})
+        self.assertFalse(any('EXPLAIN' in entry['sql'] for entry in entries))
+        self.assertTrue(all(entry['explain'] for entry in entries if entry['sql'].startswith('SELECT')))
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db.models import Sum
+
+from inventory import ledger
+from inventory.models import Sale, StockMovement
+
+from .base import InventoryTestCase
+
+
+class StockAsOfTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+        self.sell(self.branch, self.product, 2)
+        first_day = datetime(2026, 3, 1, 10)
+        StockMovement.objects.update(created_at=first_day)
+        self.sell(self.branch, self.product, 1)
+        StockMovement.objects.filter(created_at__gt=first_day).update(created_at=datetime(2026, 3, 2, 10))
+
+    def as_of(self, **params):
+        response = self.client.get('/api/stock/as-of/', {'branch': self.branch, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_quantities_at_a_point_in_time(self):
+        self.assertEqual(self.as_of(at='2026-02-28')['results'], [])
+        self.assertEqual(self.as_of(at='2026-03-01')['results'][0]['quantity'], 3)
+        self.assertEqual(self.as_of(at='2026-03-02T09:00:00')['results'][0]['quantity'], 3)
+        data = self.as_of(at='2026-03-02')
+        self.assertEqual(data['results'], [{'product': self.product, 'product_name': 'Widget', 'quantity': 2}])
+        self.assertEqual((data['snapshot'], data['movements_applied']), (None, 3))
+
+    def test_starts_from_the_nearest_snapshot(self):
+        snapshot = ledger.take_snapshot(self.branch)
+        self.sell(self.branch, self.product, 1)
+        data = self.as_of()
+        self.assertEqual(data['snapshot']['id'], snapshot.id)
+        self.assertEqual(data['movements_applied'], 1)
+        self.assertEqual(data['results'][0]['quantity'], 1)
+        # Before the snapshot, the movements are replayed from the start
+        self.assertEqual(self.as_of(at='2026-03-01')['results'][0]['quantity'], 3)
+
+    def test_movements_add_up_to_the_stock(self):
+        sale_id = Sale.objects.latest('id').id
+        self.client.delete(f'/api/sales/{sale_id}/delete/')
+        self.post('/api/add-stock/', {'branch': self.branch, 'product': self.product, 'quantity': 4})
+        total = StockMovement.objects.aggregate(total=Sum('delta'))['total']
+        self.assertEqual(total, self.quantity(self.branch, self.product))
+
+    def test_invalid_query(self):
+        self.assertEqual(self.client.get('/api/stock/as-of/').status_code, 400)
+        self.assertEqual(self.client.get('/api/stock/as-of/', {'branch': self.branch, 'at': 'noon'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/stock/as-of/', {'branch': self.branch + 100}).status_code, 404)
+
+
+class LedgerAdminTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+        self.sale = self.sell(self.branch, self.product, 2).data['id']
+
+    def test_ledger_cannot_be_edited(self):
+        movement = StockMovement.objects.first().id
+        self.assertEqual(self.client.get('/admin/inventory/stockmovement/add/').status_code, 403)
+        self.client.post(f'/admin/inventory/stockmovement/{movement}/delete/', {'post': 'yes'})
+        self.assertTrue(StockMovement.objects.filter(id=movement).exists())
+
+    def test_sales_cannot_be_added_or_edited(self):
+        self.assertEqual(self.client.get('/admin/inventory/sale/add/').status_code, 403)
+        self.client.post(f'/admin/inventory/sale/{self.sale}/change/', {'quantity': 1})
+        self.assertEqual(Sale.objects.get(id=self.sale).quantity, 2)
+
+    def test_deleting_a_sale_restores_its_stock(self):
+        self.client.post('/admin/inventory/sale/', {
+            'action': 'delete_selected', '_selected_action': [self.sale], 'post': 'yes',
+        })
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(self.quantity(self.branch, self.product), 5)
+        self.assertEqual(StockMovement.objects.aggregate(total=Sum('delta'))['total'], 5)
@@ -0,0 +1,102 @@
+import asyncio
+import importlib.util
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from inventory import live
+
+from .base import InventoryTestCase
+
+
+class GunicornConfTests(SimpleTestCase):
+    def start(self, workers, **environ):
+        """Loads gunicorn.conf.py under environ and runs its on_starting hook."""
+        with mock.patch.dict(os.environ, environ):
+            for name in {'SERVER_MODE', 'LIVE_STOCK_REDIS_URL', 'PROMETHEUS_MULTIPROC_DIR'} - set(environ):
+                os.environ.pop(name, None)
+            path = Path(settings.BASE_DIR) / 'gunicorn.conf.py'
+            spec = importlib.util.spec_from_file_location('gunicorn_conf', path)
+            conf = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(conf)
+            conf.on_starting(SimpleNamespace(cfg=SimpleNamespace(workers=workers)))
+            return conf
+
+    def test_several_asgi_workers_need_redis(self):
+        with self.assertRaisesMessage(RuntimeError, 'needs LIVE_STOCK_REDIS_URL'):
+            self.start(4, SERVER_MODE='asgi')
+        conf = self.start(4, SERVER_MODE='asgi', LIVE_STOCK_REDIS_URL='redis://localhost:6379/0')
+        self.assertEqual(conf.wsgi_app, 'inventory_system.asgi:application')
+        self.start(1, SERVER_MODE='asgi')
+
+    def test_wsgi_workers_start_without_redis(self):
+        conf = self.start(4)
+        self.assertEqual(conf.wsgi_app, 'inventory_system.wsgi:application')
+
+
+@override_settings(LIVE_STOCK_REDIS_URL='')
+class LiveStockTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.other_branch = self.add_branch('Other')
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+        self.add_stock(self.other_branch, self.product, 5)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        # The warning about running without Redis is covered by test_warns_without_redis
+        patcher = mock.patch.object(live, '_warned', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open(self, branch_id=None):
+        """Opens a stream on self.loop and reads its "ready" event."""
+        body = live.stream(branch_id)
+        self.addCleanup(self.loop.run_until_complete, body.aclose())
+        self.assertTrue(self.next(body).endswith('event: ready\ndata: {"branch": %s}\n\n' % (branch_id or 'null')))
+        return body
+
+    def next(self, body):
+        return self.loop.run_until_complete(asyncio.wait_for(body.__anext__(), 1))
+
+    def test_committed_changes_reach_the_branch_stream(self):
+        stream = self.open(self.branch)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sell(self.other_branch, self.product, 1)  # Another branch
+            self.sell(self.branch, self.product, 2)
+        self.assertEqual(
+            self.next(stream),
+            'event: stock\ndata: {"branch": %d, "product": %d, "delta": -2, "reason": "sale"}\n\n'
+            % (self.branch, self.product),
+        )
+
+    def test_changes_are_sent_once_committed(self):
+        stream = self.open()
+        with self.captureOnCommitCallbacks() as callbacks:
+            live.publish([(self.branch, self.product, -2, 'sale'), (self.branch, self.product, -1, 'sale')])
+        subscription, = live._subscriptions[None]
+        self.assertTrue(subscription.queue.empty())
+        for callback in callbacks:
+            callback()
+        self.assertIn('"delta": -3', self.next(stream))
+
+    @override_settings(LIVE_STOCK_QUEUE_SIZE=1)
+    def test_stream_that_falls_behind_is_told_to_resync(self):
+        stream = self.open()
+        event = {'branch': self.branch, 'product': self.product, 'delta': -1, 'reason': 'sale'}
+        live.dispatch([event])
+        live.dispatch([event])
+        self.assertEqual(self.next(stream), 'event: resync\ndata: {}\n\n')
+
+    def test_warns_without_redis(self):
+        with mock.patch.object(live, '_warned', False), self.assertLogs('inventory.live', 'WARNING'):
+            self.open()
+
+    def test_wsgi_requests_are_refused(self):
+        response = self.client.get('/api/stock/live/')
+        self.assertEqual(response.status_code, 503)
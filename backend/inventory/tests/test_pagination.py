@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from inventory.models import Sale
+
+from .base import InventoryTestCase
+
+
+class KeysetPaginationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.other_branch = self.add_branch('Other')
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 20)
+        self.add_stock(self.other_branch, self.product, 20)
+        sales = [(1, self.branch), (2, self.branch), (2, self.other_branch), (2, self.branch), (3, self.branch)]
+        for day, branch in sales:
+            sale_id = self.sell(branch, self.product, 1).data['id']
+            Sale.objects.filter(id=sale_id).update(date=datetime(2026, 3, day, 12))
+
+    def pages(self, url, **params):
+        """Follows next_cursor to the end and returns the rows of every page."""
+        pages = []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data['results'])
+            if response.data['next_cursor'] is None:
+                return pages
+            params['cursor'] = response.data['next_cursor']
+
+    def test_sales_pages_are_newest_first_without_gaps_or_repeats(self):
+        pages = self.pages('/api/sales/', limit=2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        # Three sales share a date, so the pages are split on (date, id)
+        expected = list(Sale.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual([sale['id'] for page in pages for sale in page], expected)
+
+    def test_plain_list_is_unchanged(self):
+        response = self.client.get('/api/sales/')
+        self.assertEqual(len(response.data), 5)
+
+    def test_filters(self):
+        def ids(**params):
+            return [sale['id'] for page in self.pages('/api/sales/', limit=10, **params) for sale in page]
+
+        self.assertEqual(len(ids(branch=self.other_branch)), 1)
+        self.assertEqual(len(ids(date_from='2026-03-02')), 4)
+        # A plain date_to takes in the whole day
+        self.assertEqual(len(ids(date_to='2026-03-02')), 4)
+        self.assertEqual(len(ids(date_from='2026-03-02', date_to='2026-03-02T11:00:00')), 0)
+        self.assertEqual(len(ids(branch=self.branch, date_from='2026-03-02', date_to='2026-03-02')), 2)
+
+    def test_stock_pages_by_id(self):
+        pages = self.pages('/api/stock/', limit=1)
+        self.assertEqual([stock['branch'] for page in pages for stock in page], [self.branch, self.other_branch])
+        self.assertEqual(len(self.pages('/api/stock/', limit=5, branch=self.other_branch)[0]), 1)
+
+    def test_invalid_input_is_rejected(self):
+        for params in [{'cursor': 'nonsense'}, {'limit': 0}, {'limit': 'ten'}, {'branch': 'x'}, {'date_from': 'May'}]:
+            response = self.client.get('/api/sales/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from inventory import counters, purge
+from inventory.models import Branch, Sale, SaleDailyRollup, Stock, StockMovement
+
+from .base import InventoryTestCase
+
+
+class PurgeTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.other_branch = self.add_branch('Other')
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 10)
+        self.add_stock(self.other_branch, self.product, 10)
+        for _ in range(5):
+            self.sell(self.branch, self.product, 1)
+        self.sell(self.other_branch, self.product, 1)
+
+    def assertMatchesRebuild(self):
+        kept = counters.summary()
+        counters.rebuild()
+        self.assertEqual(kept, counters.summary())
+
+    def test_deleted_branch_is_hidden_at_once(self):
+        response = self.client.delete(f'/api/branches/{self.branch}/delete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([branch['id'] for branch in self.client.get('/api/branches/').data], [self.other_branch])
+        self.assertEqual([sale['branch'] for sale in self.client.get('/api/sales/').data], [self.other_branch])
+        self.assertFalse(Stock.objects.filter(branch_id=self.branch).exists())
+        removed = StockMovement.objects.get(branch_id=self.branch, reason=StockMovement.REMOVED)
+        self.assertEqual(removed.delta, -5)
+        self.assertEqual(counters.summary()['total_units'], 9)
+        # Its sales stay until the purge deletes them
+        self.assertEqual(Sale.objects.filter(branch_id=self.branch).count(), 5)
+        self.assertMatchesRebuild()
+        self.assertEqual(self.client.delete(f'/api/branches/{self.branch}/delete/').status_code, 404)
+
+    def test_purge_deletes_in_chunks(self):
+        self.client.delete(f'/api/branches/{self.branch}/delete/')
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('inventory.purge'):
+            deleted = purge.purge(Branch, self.branch, chunk_size=2)
+        chunk_delete = 'DELETE FROM "inventory_sale" WHERE "inventory_sale"."id" IN'
+        sale_deletes = [query for query in queries if query['sql'].startswith(chunk_delete)]
+        self.assertEqual(len(sale_deletes), 3)  # 5 sales, 2 at a time
+        self.assertGreater(deleted, 5)
+        self.assertFalse(Branch.objects.filter(id=self.branch).exists())
+        for model in (Sale, SaleDailyRollup, StockMovement):
+            self.assertFalse(model.objects.filter(branch_id=self.branch).exists(), model)
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(counters.summary()['total_sales'], 1)
+        self.assertMatchesRebuild()
+
+    def test_purge_only_touches_deactivated_rows(self):
+        self.assertEqual(purge.purge(Branch, self.branch), 0)
+        self.assertEqual(Sale.objects.count(), 6)
+
+    def test_command_finishes_the_purges(self):
+        self.client.delete(f'/api/products/{self.product}/delete/')
+        with self.assertLogs('inventory.purge') as logs:
+            call_command('purge_deleted', chunk_size=4, stdout=StringIO())
+        self.assertEqual(len(logs.records), 1)
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(counters.summary()['total_sales'], 0)
+        self.assertMatchesRebuild()
@@ -0,0 +1,65 @@
+import json
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+
+from inventory import renderers
+
+from .base import InventoryTestCase
+
+
+def from_columns(table):
+    """Turns the columnar layout back into row dicts."""
+    columns = {
+        field: [table['dictionaries'][field][value] for value in values] if field in table['dictionaries'] else values
+        for field, values in table['columns'].items()
+    }
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+class RendererTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        first = self.add_product('First')
+        second = self.add_product('Second')
+        self.add_stock(self.branch, first, 5)
+        self.add_stock(self.branch, second, 5)
+        self.sell(self.branch, first, 1)
+        self.sell(self.branch, second, 1)
+        self.sell(self.branch, first, 1)
+
+    def test_columnar_holds_the_same_rows(self):
+        rows = json.loads(self.client.get('/api/sales/').content)
+        response = self.client.get('/api/sales/', {'format': 'columnar'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.inventory.columnar+json')
+        table = json.loads(response.content)
+        self.assertEqual(table['count'], 3)
+        self.assertEqual(table['dictionaries'], {'branch_name': ['Main'], 'product_name': ['First', 'Second']})
+        self.assertEqual(from_columns(table), rows)
+
+    def test_columnar_by_accept_header_and_pages(self):
+        response = self.client.get('/api/sales/', {'limit': 2}, HTTP_ACCEPT='application/vnd.inventory.columnar+json')
+        data = json.loads(response.content)
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertEqual(data['results']['count'], 2)
+
+    def test_other_responses_are_unchanged(self):
+        response = self.client.get('/api/sales/', {'format': 'columnar', 'limit': 0})
+        self.assertEqual(json.loads(response.content), {'error': 'limit must be greater than 0'})
+
+    @unittest.skipIf(renderers.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_holds_the_columnar_layout(self):
+        table = json.loads(self.client.get('/api/stock/', {'format': 'columnar'}).content)
+        response = self.client.get('/api/stock/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.msgpack.unpackb(response.content), table)
+
+    def test_fast_json_is_the_same_bytes_as_json(self):
+        data = [{
+            'date': datetime(2026, 1, 31, 14, 5, 0, 123456), 'price': Decimal('2.50'),
+            'name': 'Café \u2028 \u2029 ☃', 'big': 2 ** 70, 'none': None,
+        }]
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
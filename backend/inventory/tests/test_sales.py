@@ -0,0 +1,156 @@
+import contextlib
+import json
+from unittest import mock
+
+from django.db import connection
+
+from inventory import services
+from inventory.models import Sale, StockMovement
+
+from .base import InventoryTestCase
+
+
+@contextlib.contextmanager
+def as_mysql(batch_size=2):
+    """Runs create_sales() down MySQL's path on SQLite: LAST_INSERT_ID() is the first id of the last INSERT."""
+    inserted = {'rows': 0}
+
+    def rewrite(execute, sql, params, many, context):
+        if sql.startswith('INSERT INTO "inventory_sale"'):
+            inserted['rows'] = sql.count('), (') + 1
+        elif sql.startswith('SELECT LAST_INSERT_ID()'):
+            sql = f"SELECT last_insert_rowid() - {inserted['rows'] - 1}, 1"
+        return execute(sql, params, many, context)
+
+    with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+            mock.patch.object(services, 'SALE_INSERT_BATCH', batch_size), connection.execute_wrapper(rewrite):
+        yield
+
+
+class SaleTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+
+    def test_sale_takes_units_out_of_stock(self):
+        response = self.sell(self.branch, self.product, 2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.quantity(self.branch, self.product), 3)
+        movement = StockMovement.objects.get(reason=StockMovement.SALE)
+        self.assertEqual((movement.delta, movement.sale_id), (-2, response.data['id']))
+
+    def test_oversell_is_rejected_and_changes_nothing(self):
+        response = self.sell(self.branch, self.product, 6)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Not enough stock available')
+        self.assertEqual(self.quantity(self.branch, self.product), 5)
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(StockMovement.objects.filter(reason=StockMovement.SALE).exists())
+
+    def test_last_units_are_sold_once(self):
+        self.assertEqual(self.sell(self.branch, self.product, 5).status_code, 201)
+        self.assertEqual(self.sell(self.branch, self.product, 1).status_code, 400)
+        self.assertEqual(self.quantity(self.branch, self.product), 0)
+
+    def test_decrement_is_conditional(self):
+        with self.assertRaisesMessage(services.StockError, 'Not enough stock available'):
+            services.decrement_stock(self.branch, self.product, 6)
+        with self.assertRaisesMessage(services.StockError, 'Stock not found for this branch and product'):
+            services.decrement_stock(self.branch, self.product + 1, 1)
+        services.decrement_stock(self.branch, self.product, 5)
+        self.assertEqual(self.quantity(self.branch, self.product), 0)
+
+    def test_delete_sale_restores_stock(self):
+        sale_id = self.sell(self.branch, self.product, 2).data['id']
+        response = self.client.delete(f'/api/sales/{sale_id}/delete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantity(self.branch, self.product), 5)
+        self.assertEqual(self.client.delete(f'/api/sales/{sale_id}/delete/').status_code, 404)
+
+
+class BasketTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.first = self.add_product('First')
+        self.second = self.add_product('Second')
+        self.add_stock(self.branch, self.first, 5)
+        self.add_stock(self.branch, self.second, 1)
+
+    def basket(self, *items):
+        return self.post('/api/add-sale-basket/', {
+            'branch': self.branch,
+            'items': [{'product': product, 'quantity': quantity} for product, quantity in items],
+        })
+
+    def test_basket_records_every_line(self):
+        response = self.basket((self.first, 2), (self.second, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_quantity'], 3)
+        sale_ids = {sale['id'] for sale in response.data['sales']}
+        self.assertEqual(sale_ids, set(Sale.objects.values_list('id', flat=True)))
+        self.assertEqual(
+            set(StockMovement.objects.filter(reason=StockMovement.SALE).values_list('sale_id', flat=True)), sale_ids
+        )
+        self.assertEqual(self.quantity(self.branch, self.first), 3)
+        self.assertEqual(self.quantity(self.branch, self.second), 0)
+
+    def test_basket_is_all_or_nothing(self):
+        response = self.basket((self.first, 2), (self.second, 2))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['items']), [str(self.second)])
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(self.quantity(self.branch, self.first), 5)
+        self.assertEqual(self.quantity(self.branch, self.second), 1)
+
+    def test_ids_come_from_last_insert_id_where_the_insert_returns_none(self):
+        with as_mysql():
+            response = self.basket((self.first, 1), (self.second, 1), (self.first, 2))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(sale['id'], sale['product'], sale['quantity']) for sale in response.data['sales']],
+            list(Sale.objects.order_by('id').values_list('id', 'product_id', 'quantity')),
+        )
+
+
+class BulkIngestTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+
+    def ingest(self, rows):
+        response = self.client.post(
+            '/api/sales/bulk/', '\n'.join(json.dumps(row) for row in rows), content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_rows_are_accepted_while_stock_lasts(self):
+        lines = self.ingest([
+            {'branch': self.branch, 'product': self.product, 'quantity': 3},
+            {'branch': self.branch, 'product': self.product, 'quantity': 3},  # Only 2 left
+            {'branch': self.branch, 'product': self.product, 'quantity': 2},
+            {'branch': self.branch, 'product': self.product + 1, 'quantity': 1},  # No such stock
+            {'branch': self.branch, 'product': self.product, 'quantity': 0},  # Invalid
+        ])
+        results, summary = lines[:-1], lines[-1]
+        self.assertEqual(
+            [result['status'] for result in results], ['accepted', 'rejected', 'accepted', 'rejected', 'rejected']
+        )
+        self.assertEqual(summary, {'summary': {'rows': 5, 'accepted': 2, 'rejected': 3}})
+        accepted_ids = {result['id'] for result in results if result['status'] == 'accepted'}
+        self.assertEqual(accepted_ids, set(Sale.objects.values_list('id', flat=True)))
+        self.assertEqual(self.quantity(self.branch, self.product), 0)
+
+    def test_ids_come_from_last_insert_id_where_the_insert_returns_none(self):
+        self.add_stock(self.branch, self.product, 10)
+        with as_mysql():
+            lines = self.ingest([{'branch': self.branch, 'product': self.product, 'quantity': n} for n in (1, 2, 3)])
+        self.assertEqual(
+            [(line['id'], quantity) for line, quantity in zip(lines, (1, 2, 3))],
+            list(Sale.objects.order_by('id').values_list('id', 'quantity')),
+        )
@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import override_settings
+from rest_framework.test import APITransactionTestCase
+
+from inventory import counters
+from inventory.models import Branch, Product, Sale, SaleDailyRollup, Stock, StockMovement
+
+
+# Not in a test transaction: the seeder changes SQLite pragmas, which cannot be done inside one
+@override_settings(PERF_TIMING=False, PURGE_IN_BACKGROUND=False, CHANGE_FEED_SETTLE_SECONDS=0)
+class SeedInventoryTests(APITransactionTestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def test_seeds_the_current_schema(self):
+        call_command('seed_inventory', branches=2, products=3, sales=50, days=3, batch_size=20, stdout=StringIO())
+        self.assertEqual(Branch.objects.count(), 2)
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Stock.objects.count(), 6)
+        self.assertEqual(Sale.objects.count(), 50)
+        self.assertEqual(
+            SaleDailyRollup.objects.aggregate(units=Sum('units'))['units'],
+            Sale.objects.aggregate(units=Sum('quantity'))['units'],
+        )
+        # The ledger adds up to the quantities on hand
+        for stock in Stock.objects.all():
+            movements = StockMovement.objects.filter(branch=stock.branch_id, product=stock.product_id)
+            moved = movements.aggregate(total=Sum('delta'))['total']
+            self.assertEqual(moved, stock.quantity)
+        # The seeded rows are in the change feed and the counters
+        data = self.client.get('/api/changes/', {'limit': 100}).data
+        self.assertEqual(len(data['changes']), 2 + 3 + 6)
+        kept = counters.summary()
+        counters.rebuild()
+        self.assertEqual(kept, counters.summary())
@@ -0,0 +1,49 @@
+from .base import InventoryTestCase
+
+
+class StockByProductTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.main = self.add_branch('Main')
+        self.other = self.add_branch('Other')
+        self.apple = self.add_product('Apple')
+        self.pear = self.add_product('Pear')
+        self.plum = self.add_product('Plum')
+        self.add_stock(self.main, self.apple, 5)
+        self.add_stock(self.other, self.apple, 2)
+        self.add_stock(self.main, self.pear, 9)
+        self.add_stock(self.other, self.plum, 1)
+
+    def totals(self, **params):
+        response = self.client.get('/api/stock/by-product/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_one_row_per_product(self):
+        self.assertEqual(self.totals()['results'], [
+            {'product': self.apple, 'product_name': 'Apple', 'total_quantity': 7, 'branch_count': 2},
+            {'product': self.pear, 'product_name': 'Pear', 'total_quantity': 9, 'branch_count': 1},
+            {'product': self.plum, 'product_name': 'Plum', 'total_quantity': 1, 'branch_count': 1},
+        ])
+
+    def test_ordering_and_pages(self):
+        data = self.totals(ordering='-total_quantity', page_size=2)
+        self.assertEqual([row['product_name'] for row in data['results']], ['Pear', 'Apple'])
+        self.assertEqual(data['next_page'], 2)
+        data = self.totals(ordering='-total_quantity', page_size=2, page=2)
+        self.assertEqual([row['product_name'] for row in data['results']], ['Plum'])
+        self.assertIsNone(data['next_page'])
+        # Ties are broken by product id
+        data = self.totals(ordering='branch_count')
+        self.assertEqual([row['product_name'] for row in data['results']], ['Pear', 'Plum', 'Apple'])
+
+    def test_breakdown(self):
+        apple = self.totals(breakdown=1, page_size=1)['results'][0]
+        self.assertEqual(
+            [(branch['branch_name'], branch['quantity']) for branch in apple['branches']], [('Main', 5), ('Other', 2)]
+        )
+
+    def test_invalid_query(self):
+        for params in [{'ordering': 'price'}, {'page': 0}, {'page_size': 'all'}]:
+            response = self.client.get('/api/stock/by-product/', params)
+            self.assertEqual(response.status_code, 400, params)
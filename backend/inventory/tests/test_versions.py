@@ -0,0 +1,64 @@
+from .base import InventoryTestCase
+
+
+class ConditionalGetTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = self.add_branch()
+        self.product = self.add_product()
+        self.add_stock(self.branch, self.product, 5)
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unchanged_table_gives_304(self):
+        etag = self.etag('/api/products/')
+        self.assertNotModified('/api/products/', etag)
+        self.add_stock(self.branch, self.product, 1)  # Products are unchanged
+        self.assertNotModified('/api/products/', etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.etag('/api/products/')
+        self.add_product('Another')
+        self.assertModified('/api/products/', etag)
+
+        etag = self.etag('/api/stock/')
+        self.sell(self.branch, self.product, 1)
+        self.assertModified('/api/stock/', etag)
+
+    def test_sales_etag_changes_on_add_and_delete(self):
+        etag = self.etag('/api/sales/')
+        sale_id = self.sell(self.branch, self.product, 1).data['id']
+        self.assertModified('/api/sales/', etag)
+
+        etag = self.etag('/api/sales/')
+        self.assertNotModified('/api/sales/', etag)
+        self.client.delete(f'/api/sales/{sale_id}/delete/')
+        self.assertModified('/api/sales/', etag)
+
+    def test_etag_depends_on_the_url(self):
+        self.assertNotEqual(self.etag('/api/stock/'), self.etag(f'/api/stock/?branch={self.branch}'))
+
+    def test_if_modified_since(self):
+        response = self.client.get('/api/products/')
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        earlier = 'Thu, 01 Jan 2015 00:00:00 GMT'
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=earlier).status_code, 200)
+
+    def test_view_serves_what_its_etag_stands_for(self):
+        # The catalog cache reads the stamps the ETag was made from, not a second, newer copy
+        with self.assertNumQueries(2):  # The stamps, then the list on a cache miss
+            self.client.get('/api/products/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/products/')
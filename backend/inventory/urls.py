@@ -24,10 +24,30 @@ urlpatterns = [
     # Example: /api/add-sale/
     path('add-sale/', views.add_sale, name='add_sale'),
     
+    # POST: Record a multi-line sale (basket) at one branch, all or nothing
+    # Example: /api/add-sale-basket/
+    path('add-sale-basket/', views.add_sale_basket, name='add_sale_basket'),
+    
+    # POST: Upload many sales at once (JSON array or NDJSON), e.g. end-of-day uploads
+    # Example: /api/sales/bulk/
+    path('sales/bulk/', views.bulk_ingest_sales, name='bulk_ingest_sales'),
+    
     # GET: Get all stock information
     # Example: /api/stock/
     path('stock/', views.list_stock, name='list_stock'),
     
+    # GET: Stock totals per product across branches (sorted and paginated on the server)
+    # Example: /api/stock/by-product/?ordering=-total_quantity&page=1&breakdown=1
+    path('stock/by-product/', views.stock_by_product, name='stock_by_product'),
+    
+    # GET: What was on hand at a branch at a point in time (nearest snapshot + later movements)
+    # Example: /api/stock/as-of/?branch=1&at=2026-01-30T18:00:00
+    path('stock/as-of/', views.stock_as_of, name='stock_as_of'),
+    
+    # GET: Stream of stock quantity changes (Server-Sent Events; needs SERVER_MODE=asgi)
+    # Example: /api/stock/live/?branch=1
+    path('stock/live/', views.live_stock, name='live_stock'),
+    
     # GET: Get all branches
     # Example: /api/branches/
     path('branches/', views.list_branches, name='list_branches'),
@@ -36,6 +56,10 @@ urlpatterns = [
     # Example: /api/sales/
     path('sales/', views.list_sales, name='list_sales'),
     
+    # GET: Download all sales as CSV or NDJSON (streamed; accepts the list_sales filters)
+    # Example: /api/sales/export/csv/?branch=1&date_from=2026-01-01
+    path('sales/export/<str:file_format>/', views.export_sales, name='export_sales'),
+    
     # ========== PRODUCT CRUD ==========
     # GET: Get single product
     path('products/<int:product_id>/', views.get_product, name='get_product'),
@@ -64,8 +88,37 @@ urlpatterns = [
     # DELETE: Delete stock
     path('stock/<int:stock_id>/delete/', views.delete_stock, name='delete_stock'),
     
+    # ========== IMPORT ==========
+    # POST: Import products and opening stock from CSV or NDJSON
+    # Example: /api/import/catalog/
+    path('import/catalog/', views.import_catalog, name='import_catalog'),
+    
     # ========== SALE OPERATIONS ==========
     # DELETE: Delete sale (restores stock)
     path('sales/<int:sale_id>/delete/', views.delete_sale, name='delete_sale'),
+    
+    # ========== DASHBOARD ==========
+    # GET: Totals for the dashboard cards (products, branches, stock, sales)
+    # Example: /api/dashboard/summary/
+    path('dashboard/summary/', views.dashboard_summary, name='dashboard_summary'),
+    
+    # GET: Catalog cache hit/miss counts for this worker
+    # Example: /api/cache/catalog/stats/
+    path('cache/catalog/stats/', views.catalog_cache_stats, name='catalog_cache_stats'),
+    
+    # ========== DIAGNOSTICS ==========
+    # GET: Recent slow database statements with their EXPLAIN plans (staff only); DELETE: clear them
+    # Example: /api/debug/slow-queries/
+    path('debug/slow-queries/', views.slow_query_log, name='slow_query_log'),
+    
+    # ========== ANALYTICS ==========
+    # GET: Units and revenue per day/week/month, optionally per branch or product
+    # Example: /api/analytics/sales/?period=month&group_by=branch&date_from=2026-01-01
+    path('analytics/sales/', views.sales_analytics, name='sales_analytics'),
+    
+    # ========== CHANGE FEED ==========
+    # GET: Branches, products and stock changed (or deleted) since a cursor, in bounded pages
+    # Example: /api/changes/?since=<next_cursor>&limit=500
+    path('changes/', views.change_feed, name='change_feed'),
 ]
 
@@ -0,0 +1,119 @@
+"""
+Per-table version stamps for conditional GET (ETag / Last-Modified).
+
+Every write view calls touch() for the tables it changed, inside its own
+transaction, so a stamp commits or rolls back together with the change
+itself. A stamp is a counter (counters.py) split over shards like the
+dashboard totals, so concurrent writers usually update different rows
+instead of all queueing on one: touch() raises the writer's shard by one,
+and to at least the current time in microseconds. A table's stamp is the
+sum of its shards, which goes up with every committed change, and the
+largest shard is when it last changed.
+
+The @conditional decorator reads the stamps a view depends on with one
+query and answers If-None-Match / If-Modified-Since with 304 Not Modified
+before the view runs any other query or serializes anything. The stamps are
+not cached, so every worker answers from what has committed and never sends
+a 304 for a stale copy. While the view runs, stamp() returns the stamps the
+decorator read, and the catalog cache keys its entries by them, so the body
+served from the cache is the one the ETag stands for.
+"""
+import contextvars
+import functools
+import hashlib
+import time
+
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import counters
+
+# Table names used for the stamps
+PRODUCT = 'product'
+BRANCH = 'branch'
+STOCK = 'stock'
+SALE = 'sale'
+VERSION_PREFIX = 'version:'
+
+# Stamps read by the @conditional view being served
+_served = contextvars.ContextVar('served_stamps', default={})
+
+
+def touch(*tables):
+    """
+    Marks tables as changed. Call inside the transaction that changed them,
+    after its counters.bump().
+    """
+    counters.advance([VERSION_PREFIX + table for table in set(tables)], int(time.time() * 1_000_000))
+
+
+def current(tables):
+    """
+    Returns {table: (changes, last change in microseconds)} for the given
+    tables as committed ((0, 0) if never changed).
+    """
+    names = {VERSION_PREFIX + table: table for table in tables}
+    return {
+        names[name]: (sum(shards), max(shards, default=0))
+        for name, shards in counters.read_shards(names).items()
+    }
+
+
+def stamp(table):
+    """The stamp of one table as read by the @conditional view being served, else from the database."""
+    stamps = _served.get()
+    if table in stamps:
+        return stamps[table]
+    return current([table])[table]
+
+
+def _etag(request, stamps):
+    # The same tables give different bodies for different URLs, filters and formats
+    key = '|'.join([
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        *(f'{table}={stamp}' for table, stamp in sorted(stamps.items())),
+    ])
+    return '"' + hashlib.md5(key.encode()).hexdigest() + '"'
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def conditional(*tables):
+    """
+    Decorator for GET views whose response depends only on the given tables
+    (and the request URL). Adds ETag / Last-Modified and returns 304 when the
+    client's copy is still current. Goes below @api_view.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            stamps = current(tables)
+            etag = _etag(request, stamps)
+            last_modified = max(changed for _, changed in stamps.values()) // 1_000_000
+            if _not_modified(request, etag, last_modified):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                token = _served.set(stamps)
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    _served.reset(token)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Let the browser keep the copy but check back every time
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -1,11 +1,26 @@
+import csv
+import itertools
+import json
+
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from .models import Branch, Product, Stock, Sale
-from .serializers import BranchSerializer, ProductSerializer, SaleSerializer, StockSerializer
+from . import analytics, archive, catalog_cache, changes, counters, exports, fastpath, fieldsets, importer, ledger, live, metrics, pagination, purge, rollups, services, slow_queries, streams, versions
+from .versions import BRANCH, PRODUCT, SALE, STOCK
+from .models import Branch, Product, Stock, Sale, SaleArchive, StockMovement
+from .serializers import (
+    BasketSaleSerializer, BranchSerializer, ProductSerializer, SaleIngestSerializer, SaleSerializer,
+    StockSerializer,
+)
 
 # ========== AUTHENTICATION ==========
 
@@ -80,13 +95,20 @@ def check_auth(request):
 # ========== PRODUCTS ==========
 
 @api_view(['GET'])
+@versions.conditional(PRODUCT)
 def list_products(request):
-    """Fetches a list of all products with optimized field selection."""
-    products = Product.objects.all().only('id', 'name', 'price')
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    """
+    Fetches a list of all products (served from the catalog cache when possible).
+    ?fields=id,name limits the columns returned.
+    """
+    try:
+        wanted = fieldsets.columns(request.query_params, 'product')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(fieldsets.project(catalog_cache.product_list(), wanted))
 
 @api_view(['POST'])
+@transaction.atomic
 def add_product(request):
     """
     Registers a new product. Products are global across all branches.
@@ -97,6 +119,9 @@ def add_product(request):
     if serializer.is_valid():
         # Save product to database (product is global, available to all branches)
         product = serializer.save()
+        counters.bump({counters.PRODUCTS: 1})
+        versions.touch(PRODUCT)
+        changes.stamp(Product.objects.filter(id=product.id))
         
         # Branch and stock_quantity are OPTIONAL - if provided, create initial stock
         branch_id = request.data.get('branch')
@@ -105,11 +130,12 @@ def add_product(request):
         # If branch and stock quantity are provided, create stock for that branch
         if branch_id and stock_quantity is not None:
             try:
-                branch = Branch.objects.get(id=branch_id)
+                # Checked against the database: another worker's catalog cache may not know about a deletion yet
+                branch = Branch.objects.only('id').get(id=branch_id, is_active=True)
                 stock_quantity_int = int(stock_quantity)
                 
-                # Check if stock already exists for this branch and product
-                stock, created = Stock.objects.get_or_create(
+                # Check if stock already exists for this branch and product (locked until commit)
+                stock, created = Stock.objects.select_for_update().get_or_create(
                     branch=branch,
                     product=product,
                     defaults={'quantity': stock_quantity_int}
@@ -120,6 +146,14 @@ def add_product(request):
                     stock.quantity += stock_quantity_int
                     stock.save()
                 
+                counters.bump({
+                    counters.STOCK_ITEMS: 1 if created else 0,
+                    counters.UNITS_ON_HAND: stock_quantity_int,
+                })
+                ledger.record(branch.id, product.id, stock_quantity_int, StockMovement.RESTOCK)
+                versions.touch(STOCK)
+                changes.stamp(Stock.objects.filter(id=stock.id))
+                
             except Branch.DoesNotExist:
                 return Response(
                     {'error': 'Branch not found'},
@@ -139,6 +173,7 @@ def add_product(request):
 # View to record a sale
 # Receives sale data from frontend, saves the sale, and reduces stock quantity
 @api_view(['POST'])
+@transaction.atomic
 def add_sale(request):
     serializer = SaleSerializer(data=request.data)  # Convert JSON to Sale object
     
@@ -148,91 +183,377 @@ def add_sale(request):
         product_id = serializer.validated_data['product'].id
         sale_quantity = serializer.validated_data['quantity']
         
-        # Find the stock record for this branch and product
-        try:
-            stock = Stock.objects.get(branch_id=branch_id, product_id=product_id)
-        except Stock.DoesNotExist:
-            # If stock doesn't exist, return error
+        if sale_quantity <= 0:
             return Response(
-                {'error': 'Stock not found for this branch and product'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Check if there's enough stock
-        if stock.quantity < sale_quantity:
-            return Response(
-                {'error': 'Not enough stock available'},
+                {'error': 'Quantity must be greater than 0'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Reduce the stock quantity
-        stock.quantity -= sale_quantity
-        stock.save()  # Save updated stock to database
+        # Reduce the stock quantity with one conditional UPDATE (quantity >= sale_quantity)
+        # so concurrent sales can never oversell; rolled back if the sale insert fails
+        try:
+            services.decrement_stock(branch_id, product_id, sale_quantity)
+        except services.StockError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Save the sale record
-        serializer.save()  # Save sale to database
+        sale = serializer.save()  # Save sale to database
+        counters.bump(counters.sale_deltas(sale))
+        product = serializer.validated_data['product']
+        rollups.apply(rollups.sale_deltas([sale], prices={product.id: product.price}))
+        ledger.record_sales([sale])
+        versions.touch(SALE, STOCK)
+        changes.stamp_stock([(branch_id, product_id)])
+        metrics.sales_recorded([sale])
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)  # Return success response
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)  # Return error if invalid
 
 
+# View to record a multi-line sale (a checkout basket) at one branch
+# All lines succeed or none do; stock is checked and locked with one query
+# Example body: {"branch": 1, "items": [{"product": 3, "quantity": 2}, {"product": 7, "quantity": 1}]}
+@api_view(['POST'])
+@transaction.atomic
+def add_sale_basket(request):
+    serializer = BasketSaleSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    branch_id = serializer.validated_data['branch']
+    items = [(item['product'], item['quantity']) for item in serializer.validated_data['items']]
+    try:
+        sales = services.sell_basket(branch_id, items)
+    except services.StockError as e:
+        return Response(
+            {'error': str(e), 'items': {str(product_id): reason for product_id, reason in e.items.items()}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    counters.bump(counters.sales_deltas(sales))
+    rollups.apply(rollups.sale_deltas(sales))
+    ledger.record_sales(sales)
+    versions.touch(SALE, STOCK)
+    changes.stamp_stock((branch_id, product_id) for product_id, _ in items)
+    metrics.sales_recorded(sales)
+    
+    return Response({
+        'branch': branch_id,
+        'sales': [
+            {'id': sale.id, 'product': sale.product_id, 'quantity': sale.quantity, 'date': sale.date}
+            for sale in sales
+        ],
+        'total_quantity': sum(sale.quantity for sale in sales),
+    }, status=status.HTTP_201_CREATED)
+
+
+# Rows from a bulk upload validated and written together (one transaction per chunk)
+INGEST_CHUNK_SIZE = 500
+
+
+def _ingest_sale_lines(records):
+    """
+    Generator behind bulk_ingest_sales: consumes (record, error) pairs from the
+    request stream chunk by chunk and yields one NDJSON result line per row,
+    then a summary line. Only one chunk is held in memory at a time.
+    """
+    accepted = rejected = 0
+    row_number = 0
+    finished = False
+    while not finished:
+        chunk = []  # (row number, validated data or None, error)
+        try:
+            for record, error in records:
+                row_number += 1
+                if error is None:
+                    row = SaleIngestSerializer(data=record)
+                    if row.is_valid():
+                        chunk.append((row_number, row.validated_data, None))
+                    else:
+                        chunk.append((row_number, None, row.errors))
+                else:
+                    chunk.append((row_number, None, error))
+                if len(chunk) >= INGEST_CHUNK_SIZE:
+                    break
+            else:
+                finished = True
+        except streams.StreamFormatError as e:
+            # The rest of the body cannot be read; keep what was parsed so far
+            finished = True
+            stream_error = str(e)
+        else:
+            stream_error = None
+        
+        valid = [data for _, data, error in chunk if error is None]
+        with transaction.atomic():
+            outcomes, sales = services.ingest_sales(valid)
+            counters.bump(counters.sales_deltas(sales))
+            rollups.apply(rollups.sale_deltas(sales))
+            ledger.record_sales(sales)
+            if sales:
+                versions.touch(SALE, STOCK)
+                changes.stamp_stock((sale.branch_id, sale.product_id) for sale in sales)
+            metrics.sales_recorded(sales)
+        outcomes = iter(outcomes)
+        
+        for number, data, error in chunk:
+            if error is None:
+                outcome = next(outcomes)
+                if isinstance(outcome, Sale):
+                    accepted += 1
+                    result = {'row': number, 'status': 'accepted', 'id': outcome.id}
+                else:
+                    rejected += 1
+                    result = {'row': number, 'status': 'rejected', 'error': outcome}
+            else:
+                rejected += 1
+                result = {'row': number, 'status': 'rejected', 'error': error}
+            yield json.dumps(result) + '\n'
+        
+        if stream_error:
+            yield json.dumps({'error': stream_error}) + '\n'
+    
+    yield json.dumps({'summary': {'rows': row_number, 'accepted': accepted, 'rejected': rejected}}) + '\n'
+
+
+# View to upload many sales at once (e.g., a branch that was offline all day)
+# Body: a JSON array of sales, or NDJSON (one sale per line, Content-Type: application/x-ndjson)
+# Each sale: {"branch": 1, "product": 2, "quantity": 3, "date": "2026-01-31T14:05:00"} (date optional)
+# The response streams back one NDJSON line per row ({"row": n, "status": "accepted"|"rejected", ...})
+# followed by {"summary": {...}}. Rows are processed in chunks, so memory stays bounded.
+@api_view(['POST'])
+def bulk_ingest_sales(request):
+    if request.stream is None:
+        return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        records = streams.iter_records(request.stream, request.content_type.split(';')[0].strip())
+    except streams.StreamFormatError as e:
+        return Response({'error': str(e)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    return StreamingHttpResponse(_ingest_sale_lines(records), content_type='application/x-ndjson')
+
+
 # View to get all stock information
 # Returns a list of all stock records (which products are at which branches)
+# Optional filters: ?branch=<id>&product=<id>
+# Pass ?limit= and/or ?cursor= to get one page at a time: {"results": [...], "next_cursor": "..."}
+# ?fields=id,quantity picks columns; with ?fields or ?expand the names are only joined in
+# for ?expand=branch,product (see fieldsets.py)
 @api_view(['GET'])
+@versions.conditional(STOCK, BRANCH, PRODUCT)
 def list_stock(request):
-    # Use select_related() to fetch branch and product in a single query (prevents N+1 queries)
-    stock_records = Stock.objects.select_related('branch', 'product').all()
-    serializer = StockSerializer(stock_records, many=True)  # Convert to JSON format
-    return Response(serializer.data)  # Send JSON response to frontend
+    try:
+        wanted = fieldsets.columns(request.query_params, 'stock')
+        # Plain dicts with the branch and product names joined in (same JSON as StockSerializer)
+        stock_records = fastpath.stock_values(Stock.objects.all(), wanted)
+        stock_records = pagination.apply_filters(stock_records, request.query_params)
+        if pagination.wants_page(request.query_params):
+            rows, next_cursor = pagination.paginate(stock_records, request.query_params, ('id',))
+            return Response({'results': fastpath.rows(rows, wanted), 'next_cursor': next_cursor})
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(fastpath.rows(stock_records, wanted))  # Send JSON response to frontend
+
+
+# Sort orders accepted by stock_by_product (?ordering=)
+STOCK_BY_PRODUCT_ORDERINGS = {
+    'product_name': 'product__name',
+    'total_quantity': 'total_quantity',
+    'branch_count': 'branch_count',
+}
+
+
+# View to get stock totals per product across all branches
+# The GROUP BY runs in the database, so the page gets one row per product instead of every stock record
+# Query: ?ordering=product_name|total_quantity|branch_count (prefix "-" for descending)
+#        &page=1&page_size=50 (max 500)  &breakdown=1 to include the per-branch quantities
+# Returns: {"results": [{"product": 1, "product_name": ..., "total_quantity": ..., "branch_count": ...}], "next_page": 2}
+@api_view(['GET'])
+@versions.conditional(STOCK, BRANCH, PRODUCT)
+def stock_by_product(request):
+    ordering = request.query_params.get('ordering', 'product_name')
+    descending = ordering.startswith('-')
+    if ordering.lstrip('-') not in STOCK_BY_PRODUCT_ORDERINGS:
+        return Response(
+            {'error': f"ordering must be one of: {', '.join(STOCK_BY_PRODUCT_ORDERINGS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    order_field = ('-' if descending else '') + STOCK_BY_PRODUCT_ORDERINGS[ordering.lstrip('-')]
+    
+    try:
+        page = int(request.query_params.get('page', 1))
+        page_size = min(int(request.query_params.get('page_size', 50)), 500)
+        if page < 1 or page_size < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': 'page and page_size must be positive numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    offset = (page - 1) * page_size
+    totals = list(
+        Stock.objects.values('product_id', 'product__name')
+        .annotate(total_quantity=Sum('quantity'), branch_count=Count('branch_id'))
+        .order_by(order_field, 'product_id')[offset:offset + page_size + 1]
+    )
+    # One extra row tells us whether there is a next page
+    next_page = page + 1 if len(totals) > page_size else None
+    totals = totals[:page_size]
+    
+    results = [
+        {
+            'product': row['product_id'],
+            'product_name': row['product__name'],
+            'total_quantity': row['total_quantity'],
+            'branch_count': row['branch_count'],
+        }
+        for row in totals
+    ]
+    
+    if request.query_params.get('breakdown') in ('1', 'true', 'yes'):
+        # Per-branch quantities for the products on this page only (one query)
+        by_product = {row['product']: row for row in results}
+        for row in results:
+            row['branches'] = []
+        breakdown = Stock.objects.filter(product_id__in=by_product).values(
+            'id', 'product_id', 'branch_id', 'branch__name', 'quantity'
+        ).order_by('branch__name', 'branch_id')
+        for stock in breakdown:
+            by_product[stock['product_id']]['branches'].append({
+                'stock_id': stock['id'],
+                'branch': stock['branch_id'],
+                'branch_name': stock['branch__name'],
+                'quantity': stock['quantity'],
+            })
+    
+    return Response({'results': results, 'next_page': next_page})
+
+
+# View to get what was on hand at a branch at a point in time ("last Friday at closing")
+# Query: ?branch=<id> (required)  &at=2026-01-30T18:00:00 (a date means the end of that day; default now)
+#        &product=<id> for one product only
+# Starts from the nearest stock snapshot before that time and adds only the movements made after it
+# Returns: {"branch": 1, "at": ..., "snapshot": {"id": ..., "taken_at": ...} or null, "movements_applied": 12,
+#           "results": [{"product": 3, "product_name": "Laptop", "quantity": 5}, ...]}
+@api_view(['GET'])
+def stock_as_of(request):
+    try:
+        query = ledger.parse_query(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if catalog_cache.branch(query['branch']) is None:
+        return Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    snapshot, applied, quantities = ledger.stock_as_of(query['branch'], query['at'], query['product'])
+    names = {product['id']: product['name'] for product in catalog_cache.product_list()}
+    return Response({
+        'branch': query['branch'],
+        'at': query['at'],
+        'snapshot': {'id': snapshot.id, 'taken_at': snapshot.taken_at} if snapshot else None,
+        'movements_applied': applied,
+        'results': [
+            {'product': product_id, 'product_name': names[product_id], 'quantity': quantity}
+            for product_id, quantity in sorted(quantities.items())
+            if product_id in names  # Not deleted products
+        ],
+    })
 
 
 # View to get all branches
 # Returns a list of all branches in the database
 @api_view(['GET'])
+@versions.conditional(BRANCH)
 def list_branches(request):
-    # Use only() to fetch only needed fields for better performance
-    branches = Branch.objects.all().only('id', 'name', 'location')
-    serializer = BranchSerializer(branches, many=True)  # Convert to JSON format
-    return Response(serializer.data)  # Send JSON response to frontend
+    # Served from the catalog cache; loaded with only() the first time
+    try:
+        wanted = fieldsets.columns(request.query_params, 'branch')  # ?fields=id,name
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(fieldsets.project(catalog_cache.branch_list(), wanted))
 
 
 # View to get all sales
 # Returns a list of all sales records for the dashboard
+# Optional filters: ?branch=<id>&product=<id>&date_from=<date>&date_to=<date>
+# Pass ?limit= and/or ?cursor= to get one page at a time (newest first):
+# {"results": [...], "next_cursor": "..."}
+# ?fields= and ?expand=branch,product work as for list_stock
+# Archived sales are included when date_from is missing or older than the archived period
 @api_view(['GET'])
+@versions.conditional(SALE, BRANCH, PRODUCT)
 def list_sales(request):
-    # Use select_related() to fetch branch and product in a single query (prevents N+1 queries)
-    # Use only() to limit fields for better performance
-    sales = Sale.objects.select_related('branch', 'product').only(
-        'id', 'branch', 'product', 'quantity', 'date',
-        'branch__name', 'product__name'
-    )
-    serializer = SaleSerializer(sales, many=True)  # Convert to JSON format
-    return Response(serializer.data)  # Send JSON response to frontend
+    try:
+        wanted = fieldsets.columns(request.query_params, 'sale')
+        # Plain dicts with the branch and product names joined in (same JSON as SaleSerializer),
+        # so no model instances or serializer fields are built for each row
+        sources = [
+            pagination.apply_filters(
+                fastpath.sale_values(purge.visible(sales), wanted), request.query_params, date_field='date'
+            )
+            for sales in archive.sale_sources(request.query_params)
+        ]
+        if pagination.wants_page(request.query_params):
+            # Keyset on (date, id) so deep pages cost the same as the first one
+            rows, next_cursor = pagination.paginate_merged(sources, request.query_params, ('-date', '-id'))
+            return Response({'results': fastpath.rows(rows, wanted), 'next_cursor': next_cursor})
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(fastpath.rows(itertools.chain(*sources), wanted))  # Send JSON response to frontend
+
+
+# View to download the sales history as a file
+# /api/sales/export/csv/ or /api/sales/export/ndjson/, with the same filters as list_sales
+# (?branch=, ?product=, ?date_from=, ?date_to=). Rows are streamed as they are read,
+# so the download starts at once and memory stays flat however many sales there are.
+# Archived sales (when the dates reach back that far) come first.
+@api_view(['GET'])
+def export_sales(request, file_format):
+    try:
+        sources = [
+            pagination.apply_filters(purge.visible(sales), request.query_params, date_field='date')
+            for sales in archive.sale_sources(request.query_params)
+        ]
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if file_format == 'csv':
+        response = StreamingHttpResponse(exports.csv_stream(*sources), content_type='text/csv')
+    elif file_format == 'ndjson':
+        response = StreamingHttpResponse(exports.ndjson_stream(*sources), content_type='application/x-ndjson')
+    else:
+        return Response({'error': 'Format must be csv or ndjson'}, status=status.HTTP_404_NOT_FOUND)
+    response['Content-Disposition'] = f'attachment; filename="sales.{file_format}"'
+    return response
 
 
 # ========== PRODUCT CRUD OPERATIONS ==========
 
 # View to get a single product by ID
 @api_view(['GET'])
+@versions.conditional(PRODUCT)
 def get_product(request, product_id):
     try:
-        product = Product.objects.get(id=product_id)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
-    except Product.DoesNotExist:
+        wanted = fieldsets.columns(request.query_params, 'product')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    product = catalog_cache.product(product_id)
+    if product is None:
         return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(fieldsets.project([product], wanted)[0])
 
 
 # View to update a product
 @api_view(['PUT'])
+@transaction.atomic
 def update_product(request, product_id):
     try:
-        product = Product.objects.get(id=product_id)
+        product = Product.objects.get(id=product_id, is_active=True)
         serializer = ProductSerializer(product, data=request.data)
         
         if serializer.is_valid():
             serializer.save()
+            versions.touch(PRODUCT)
+            changes.stamp(Product.objects.filter(id=product.id))
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Product.DoesNotExist:
@@ -240,25 +561,28 @@ def update_product(request, product_id):
 
 
 # View to delete a product
+# The product is hidden at once and its stock removed; its sales and history are
+# deleted in the background a chunk at a time, so this returns quickly (see purge.py)
 @api_view(['DELETE'])
 def delete_product(request, product_id):
-    try:
-        product = Product.objects.get(id=product_id)
-        product.delete()
-        return Response({'message': 'Product deleted successfully'}, status=status.HTTP_200_OK)
-    except Product.DoesNotExist:
+    if not purge.deactivate(Product, product_id):
         return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Product deleted successfully'}, status=status.HTTP_200_OK)
 
 
 # ========== BRANCH CRUD OPERATIONS ==========
 
 # View to add a new branch
 @api_view(['POST'])
+@transaction.atomic
 def add_branch(request):
     serializer = BranchSerializer(data=request.data)
     
     if serializer.is_valid():
-        serializer.save()
+        branch = serializer.save()
+        counters.bump({counters.BRANCHES: 1})
+        versions.touch(BRANCH)
+        changes.stamp(Branch.objects.filter(id=branch.id))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -266,24 +590,30 @@ def add_branch(request):
 
 # View to get a single branch by ID
 @api_view(['GET'])
+@versions.conditional(BRANCH)
 def get_branch(request, branch_id):
     try:
-        branch = Branch.objects.get(id=branch_id)
-        serializer = BranchSerializer(branch)
-        return Response(serializer.data)
-    except Branch.DoesNotExist:
+        wanted = fieldsets.columns(request.query_params, 'branch')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    branch = catalog_cache.branch(branch_id)
+    if branch is None:
         return Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(fieldsets.project([branch], wanted)[0])
 
 
 # View to update a branch
 @api_view(['PUT'])
+@transaction.atomic
 def update_branch(request, branch_id):
     try:
-        branch = Branch.objects.get(id=branch_id)
+        branch = Branch.objects.get(id=branch_id, is_active=True)
         serializer = BranchSerializer(branch, data=request.data)
         
         if serializer.is_valid():
             serializer.save()
+            versions.touch(BRANCH)
+            changes.stamp(Branch.objects.filter(id=branch.id))
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Branch.DoesNotExist:
@@ -291,35 +621,40 @@ def update_branch(request, branch_id):
 
 
 # View to delete a branch
+# The branch is hidden at once and its stock removed; its sales and history are
+# deleted in the background a chunk at a time, so this returns quickly (see purge.py)
 @api_view(['DELETE'])
 def delete_branch(request, branch_id):
-    try:
-        branch = Branch.objects.get(id=branch_id)
-        branch.delete()
-        return Response({'message': 'Branch deleted successfully'}, status=status.HTTP_200_OK)
-    except Branch.DoesNotExist:
+    if not purge.deactivate(Branch, branch_id):
         return Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Branch deleted successfully'}, status=status.HTTP_200_OK)
 
 
 # ========== STOCK CRUD OPERATIONS ==========
 
 # View to get a single stock record by ID
 @api_view(['GET'])
+@versions.conditional(STOCK, BRANCH, PRODUCT)
 def get_stock(request, stock_id):
     try:
-        # Use select_related to fetch related objects in one query
-        stock = Stock.objects.select_related('branch', 'product').get(id=stock_id)
-        serializer = StockSerializer(stock)
-        return Response(serializer.data)
-    except Stock.DoesNotExist:
+        wanted = fieldsets.columns(request.query_params, 'stock')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    # Joins only for the names that are returned (both by default)
+    stock = fastpath.stock_values(Stock.objects.filter(id=stock_id), wanted).first()
+    if stock is None:
         return Response({'error': 'Stock not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(fastpath.rows([stock], wanted)[0])
 
 
 # View to update stock quantity
 @api_view(['PUT'])
+@transaction.atomic
 def update_stock(request, stock_id):
     try:
-        stock = Stock.objects.get(id=stock_id)
+        # Locked so a concurrent sale cannot change the quantity between here and the save
+        stock = Stock.objects.select_for_update().get(id=stock_id)
+        old_quantity = stock.quantity
         serializer = StockSerializer(stock, data=request.data)
         
         if serializer.is_valid():
@@ -330,7 +665,19 @@ def update_stock(request, stock_id):
                     {'error': 'Quantity cannot be negative'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            serializer.save()
+            old_pair = (stock.branch_id, stock.product_id)
+            stock = serializer.save()
+            counters.bump({counters.UNITS_ON_HAND: quantity - old_quantity})
+            if (stock.branch_id, stock.product_id) == old_pair:
+                ledger.record(*old_pair, quantity - old_quantity, StockMovement.ADJUSTMENT)
+            else:
+                # The record was moved to another branch or product
+                ledger.record_many([
+                    (*old_pair, -old_quantity, StockMovement.ADJUSTMENT),
+                    (stock.branch_id, stock.product_id, quantity, StockMovement.ADJUSTMENT),
+                ])
+            versions.touch(STOCK)
+            changes.stamp(Stock.objects.filter(id=stock.id))
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Stock.DoesNotExist:
@@ -339,10 +686,15 @@ def update_stock(request, stock_id):
 
 # View to delete a stock record
 @api_view(['DELETE'])
+@transaction.atomic
 def delete_stock(request, stock_id):
     try:
-        stock = Stock.objects.get(id=stock_id)
+        stock = Stock.objects.select_for_update().get(id=stock_id)
         stock.delete()
+        counters.bump({counters.STOCK_ITEMS: -1, counters.UNITS_ON_HAND: -stock.quantity})
+        ledger.record(stock.branch_id, stock.product_id, -stock.quantity, StockMovement.REMOVED)
+        versions.touch(STOCK)
+        changes.deleted(Stock, [stock_id])
         return Response({'message': 'Stock deleted successfully'}, status=status.HTTP_200_OK)
     except Stock.DoesNotExist:
         return Response({'error': 'Stock not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -352,6 +704,7 @@ def delete_stock(request, stock_id):
 # If stock already exists for the branch-product combination, adds to existing quantity
 # If stock doesn't exist, creates a new stock record
 @api_view(['POST'])
+@transaction.atomic
 def add_stock(request):
     # First validate the basic data structure
     branch_id = request.data.get('branch')
@@ -379,9 +732,10 @@ def add_stock(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Validate branch and product exist
+    # Validate branch and product exist (in the database, not the catalog cache: another
+    # worker's cache may still hold a branch or product that was just deleted)
     try:
-        branch = Branch.objects.get(id=branch_id)
+        branch = Branch.objects.only('id').get(id=branch_id, is_active=True)
     except Branch.DoesNotExist:
         return Response(
             {'error': f'Branch with ID {branch_id} does not exist'},
@@ -394,7 +748,7 @@ def add_stock(request):
         )
     
     try:
-        product = Product.objects.get(id=product_id)
+        product = Product.objects.only('id').get(id=product_id, is_active=True)
     except Product.DoesNotExist:
         return Response(
             {'error': f'Product with ID {product_id} does not exist'},
@@ -408,8 +762,9 @@ def add_stock(request):
     
     # Use get_or_create to handle the unique constraint atomically
     # This prevents race conditions and handles the unique_together constraint
+    # The existing row is locked, so concurrent additions cannot overwrite each other
     try:
-        stock, created = Stock.objects.get_or_create(
+        stock, created = Stock.objects.select_for_update().get_or_create(
             branch=branch,
             product=product,
             defaults={'quantity': quantity}
@@ -420,6 +775,11 @@ def add_stock(request):
             stock.quantity += quantity
             stock.save()
         
+        counters.bump({counters.STOCK_ITEMS: 1 if created else 0, counters.UNITS_ON_HAND: quantity})
+        ledger.record(branch.id, product.id, quantity, StockMovement.RESTOCK)
+        versions.touch(STOCK)
+        changes.stamp(Stock.objects.filter(id=stock.id))
+        
         # Return the stock data
         serializer = StockSerializer(stock)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -432,32 +792,141 @@ def add_stock(request):
         )
 
 
+# ========== IMPORT ==========
+
+# View to import products and opening stock for one or more branches
+# Body: CSV with a header line (Content-Type: text/csv) or NDJSON, one row per branch + product:
+#   branch,location,product,price,quantity
+# Unknown branches and products are created; existing stock is set to the imported quantity
+# Returns a report: {"rows": ..., "branches_created": ..., "products_created": ..., "stock_upserted": ..., "errors": [...]}
+@api_view(['POST'])
+def import_catalog(request):
+    if request.stream is None:
+        return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+    content_type = request.content_type.split(';')[0].strip()
+    if content_type not in ('text/csv', 'application/csv') + streams.NDJSON_CONTENT_TYPES:
+        return Response(
+            {'error': 'Unsupported content type; send text/csv or application/x-ndjson'},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+    try:
+        report = importer.CatalogImporter().run(importer.read_records(request.stream, content_type))
+    except (streams.StreamFormatError, csv.Error) as e:
+        return Response({'error': f'Could not read upload: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report, status=status.HTTP_200_OK)
+
+
 # ========== SALE OPERATIONS ==========
 
 # View to delete a sale
 @api_view(['DELETE'])
+@transaction.atomic
 def delete_sale(request, sale_id):
     try:
-        sale = Sale.objects.get(id=sale_id)
-        # Restore stock when deleting a sale
-        branch_id = sale.branch.id
-        product_id = sale.product.id
-        sale_quantity = sale.quantity
-        
-        # Find and restore stock
-        try:
-            stock = Stock.objects.get(branch_id=branch_id, product_id=product_id)
-            stock.quantity += sale_quantity
-            stock.save()
-        except Stock.DoesNotExist:
-            # If stock doesn't exist, create it
-            Stock.objects.create(
-                branch=sale.branch,
-                product=sale.product,
-                quantity=sale_quantity
-            )
-        
-        sale.delete()
+        services.delete_sale(sale_id)
         return Response({'message': 'Sale deleted successfully. Stock has been restored.'}, status=status.HTTP_200_OK)
     except Sale.DoesNotExist:
+        if SaleArchive.objects.filter(id=sale_id).exists():
+            return Response({'error': 'Archived sales cannot be deleted'}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'error': 'Sale not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+# ========== DASHBOARD ==========
+
+# View to get the dashboard totals
+# Reads the incrementally maintained counters instead of downloading every table
+@api_view(['GET'])
+def dashboard_summary(request):
+    return Response(counters.summary())
+
+
+# View to check that the catalog cache is working
+# Returns this worker's hit/miss counts: {"hits": ..., "misses": ..., "hit_rate": ..., "backend": ...}
+@api_view(['GET'])
+def catalog_cache_stats(request):
+    return Response(catalog_cache.stats())
+
+
+# ========== DIAGNOSTICS ==========
+
+# View to see the slowest recent database statements (staff only)
+# Returns this worker's ring buffer, oldest first: SQL, parameters, view, stack summary and EXPLAIN plan
+# DELETE empties the buffer
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def slow_query_log(request):
+    if request.method == 'DELETE':
+        slow_queries.clear()
+        return Response({'message': 'Slow query log cleared'}, status=status.HTTP_200_OK)
+    return Response({'threshold_ms': settings.SLOW_QUERY_MS, 'queries': slow_queries.entries()})
+
+
+# ========== ANALYTICS ==========
+
+# View to get sales totals over time
+# Query: ?period=day|week|month  &group_by=none|branch|product  &date_from=&date_to= (YYYY-MM-DD)
+#        &branch=<id>  &product=<id>  &source=rollup|sales (raw sales; slower, uses current prices)
+# Returns: {"period": ..., "group_by": ..., "results": [{"period": "2026-01-01", "units": 10, "revenue": "25.00"}, ...]}
+@api_view(['GET'])
+def sales_analytics(request):
+    try:
+        query = analytics.parse_query(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'period': query['period'],
+        'group_by': query['group_by'],
+        'date_from': query['date_from'],
+        'date_to': query['date_to'],
+        'results': analytics.sales_series(query),
+    })
+
+
+# ========== CHANGE FEED ==========
+
+# View to sync branches, products and stock incrementally
+# Query: ?since=<next_cursor from the previous response> (omit for a full sync)  &limit=
+# Returns: {"changes": [{"table": "stock", "op": "upsert"|"delete", "id": 1, "version": ..., "data": {...}}, ...],
+#           "next_cursor": "...", "has_more": false}
+# Keep calling with next_cursor while has_more is true; store the last one for the next sync
+@api_view(['GET'])
+def change_feed(request):
+    try:
+        positions = changes.parse_cursor(request.query_params.get('since'))
+        limit = pagination.page_size(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    found, positions, has_more = changes.feed(positions, limit)
+    return Response({
+        'changes': found,
+        'next_cursor': changes.encode_cursor(positions),
+        'has_more': has_more,
+    })
+
+
+# ========== LIVE STOCK ==========
+
+# View to receive stock quantity changes as they happen (Server-Sent Events)
+# Query: ?branch=<id> (optional; all branches without it)
+# Sends "event: stock" with {"branch": 1, "product": 2, "delta": -3, "reason": "sale"} after each
+# committed change; on "event: resync" reload the stock and reconnect (see live.py)
+# Async and outside DRF: a stream only stays open under the ASGI app (SERVER_MODE=asgi)
+async def live_stock(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Live updates need the ASGI server (SERVER_MODE=asgi)'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    try:
+        branch_id = pagination.parse_id(request.GET, 'branch')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if branch_id is not None and await sync_to_async(catalog_cache.branch)(branch_id) is None:
+        return JsonResponse({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    response = StreamingHttpResponse(live.stream(branch_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from holding events back
+    return response
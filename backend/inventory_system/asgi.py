@@ -0,0 +1,17 @@
+"""
+ASGI config for inventory_system project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Served by gunicorn's uvicorn workers when SERVER_MODE=asgi (see gunicorn.conf.py).
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_system.settings')
+
+application = get_asgi_application()
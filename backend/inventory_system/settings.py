@@ -4,6 +4,7 @@ Simple configuration for the Smart Inventory Management System.
 """
 
 from pathlib import Path
+import importlib.util
 import os
 from dotenv import load_dotenv
 
@@ -38,6 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.instrumentation.ServerTimingMiddleware',  # First, so it times the whole request
+    'inventory.slow_queries.SlowQueryMiddleware',  # Records statements slower than SLOW_QUERY_MS
+    'inventory.metrics.MetricsMiddleware',  # Request counts and latency per view for /metrics
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -49,6 +53,42 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request timing of /api/ calls (Server-Timing header + one log line per request)
+# PERF_TIMING=0 turns it off; by default one request in a hundred is timed
+# (PERF_TIMING_SAMPLE_RATE=1 times every request, e.g. while profiling)
+PERF_TIMING = os.getenv('PERF_TIMING', '1').lower() in ('1', 'true', 'yes')
+PERF_TIMING_SAMPLE_RATE = float(os.getenv('PERF_TIMING_SAMPLE_RATE', '0.01'))
+
+# Statements slower than SLOW_QUERY_MS milliseconds are recorded with their EXPLAIN plan
+# and shown to staff at /api/debug/slow-queries/ (SLOW_QUERY_MS=off disables the recorder)
+SLOW_QUERY_MS = os.getenv('SLOW_QUERY_MS', '200')
+SLOW_QUERY_MS = None if SLOW_QUERY_MS.lower() in ('', 'off') else float(SLOW_QUERY_MS)
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv('SLOW_QUERY_BUFFER_SIZE', '100'))
+
+# Prometheus metrics at /metrics; when METRICS_TOKEN is set the scraper must send it as a Bearer token
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Deleted branches and products are hidden at once and their rows purged afterwards, PURGE_CHUNK_SIZE
+# rows per statement (see inventory/purge.py). PURGE_IN_BACKGROUND=0 leaves the purge to the
+# purge_deleted command instead of a thread started by the delete request
+PURGE_IN_BACKGROUND = os.getenv('PURGE_IN_BACKGROUND', '1').lower() in ('1', 'true', 'yes')
+PURGE_CHUNK_SIZE = int(os.getenv('PURGE_CHUNK_SIZE', '2000'))
+
+# The change feed (/api/changes/) only returns changes older than this many seconds, so a transaction
+# that stamped its rows earlier but commits later is never skipped (see inventory/changes.py)
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv('CHANGE_FEED_SETTLE_SECONDS', '5'))
+
+# Serving mode, read by gunicorn.conf.py too: wsgi (sync workers) or asgi (uvicorn workers, needed
+# for the live stock stream at /api/stock/live/; see inventory/live.py)
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+
+# Live stock stream: with LIVE_STOCK_REDIS_URL set, stock changes reach the streams of every process
+# through Redis (needs the redis package); without it only the streams of the process that made them
+LIVE_STOCK_REDIS_URL = os.getenv('LIVE_STOCK_REDIS_URL', '')
+LIVE_STOCK_KEEPALIVE = float(os.getenv('LIVE_STOCK_KEEPALIVE', '15'))  # Seconds between keepalive comments
+LIVE_STOCK_MAX_SECONDS = float(os.getenv('LIVE_STOCK_MAX_SECONDS', '300'))  # Streams end after this; clients reconnect
+LIVE_STOCK_QUEUE_SIZE = int(os.getenv('LIVE_STOCK_QUEUE_SIZE', '1000'))  # Events a stream may fall behind before a resync
+
 # Root URL configuration
 ROOT_URLCONF = 'inventory_system.urls'
 
@@ -72,8 +112,9 @@ TEMPLATES = [
     },
 ]
 
-# WSGI application
+# WSGI / ASGI applications
 WSGI_APPLICATION = 'inventory_system.wsgi.application'
+ASGI_APPLICATION = 'inventory_system.asgi.application'
 
 DATABASES = {
     'default': {
@@ -87,10 +128,56 @@ DATABASES = {
             'connect_timeout': 10,
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
         },
-        'CONN_MAX_AGE': 300,
+        # Under ASGI each request runs its sync code on a new thread, so persistent connections would pile up
+        'CONN_MAX_AGE': 0 if SERVER_MODE == 'asgi' else 300,
     }
 }
 
+# Local development and the benchmark commands can run on SQLite instead (USE_SQLITE=1)
+if os.getenv('USE_SQLITE', '').lower() in ('1', 'true', 'yes'):
+    DATABASES['default'] = {
+        # Plain sqlite3 plus BEGIN IMMEDIATE so concurrent writers wait instead of erroring
+        'ENGINE': 'inventory_system.sqlite_immediate',
+        'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        'OPTIONS': {
+            'timeout': 30,  # Wait for the write lock instead of failing under concurrent requests
+        },
+    }
+
+# Caches
+# The catalog cache holds the serialized product and branch lists and entries.
+# CATALOG_CACHE picks the backend: locmem (default, one copy per worker), file
+# (shared by the workers on one machine; CATALOG_CACHE_LOCATION is the directory)
+# or redis / memcached (shared by every server; CATALOG_CACHE_LOCATION is the URL).
+# Each backend evicts entries once it holds CATALOG_CACHE_MAX_ENTRIES of them
+# (Redis and Memcached evict by their own memory limit).
+# A change clears the entries only in the cache of the process that made it: with
+# locmem and several workers the others keep serving their copy for up to the
+# TIMEOUT below. Only reads use this cache; write views check the database.
+CATALOG_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CATALOG_CACHE = os.getenv('CATALOG_CACHE', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKENDS[CATALOG_CACHE],
+        'LOCATION': os.getenv(
+            'CATALOG_CACHE_LOCATION',
+            str(BASE_DIR / '.catalog_cache') if CATALOG_CACHE == 'file' else 'catalog',
+        ),
+        'TIMEOUT': 300,  # How stale another worker's locmem copy can get (shared backends are cleared at once)
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 5000)),
+        } if CATALOG_CACHE in ('locmem', 'file') else {},
+    },
+}
+
 # Static files
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
@@ -103,8 +190,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-    ],
+        'inventory.renderers.FastJSONRenderer',  # JSONRenderer output, encoded with orjson
+        # Opt-in layouts for bulk lists (?format=columnar / ?format=msgpack or the Accept header)
+        'inventory.renderers.ColumnarJSONRenderer',
+    ] + (['inventory.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
@@ -141,3 +230,17 @@ DEFAULT_FROM_EMAIL = "Smart Waste Tracker <mufazminidjando@gmail.com>"
 # Auth Redirects
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login'
+
+# Logging: the per-request timing lines (see PERF_TIMING), background purges and live stream errors go to the console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventory.perf': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'inventory.purge': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'inventory.live': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,15 @@
+"""
+SQLite backend that starts transactions with BEGIN IMMEDIATE.
+
+SQLite's default (deferred) transactions only take the write lock at the first
+write, and a transaction that has already read cannot wait for it, so
+concurrent requests fail with "database is locked" instead of queueing behind
+each other. Taking the lock up front lets the busy timeout do its job.
+Django 5.1+ offers the same thing as the "transaction_mode" option.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
+from inventory.metrics import metrics_view
 from .views import serve_react
 
 # Main URL configuration for the Django project
@@ -7,6 +8,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),  # Django admin panel
     path('api/', include('inventory.urls')),  # Include all inventory API endpoints
     path('api/accounts/', include('accounts.urls')),  # Auth routes
+    path('metrics', metrics_view, name='metrics'),  # Prometheus metrics (all gunicorn workers)
     # Serve React Frontend for any other route
     re_path(r'^.*$', serve_react),
 ]
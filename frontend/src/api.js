@@ -149,9 +149,10 @@ export const deleteBranch = async (branchId) => {
 
 // --- STOCK & SALES OPERATIONS ---
 
-export const fetchStock = async () => {
+// Optional params: branch, product, limit, cursor
+export const fetchStock = async (params = {}) => {
   try {
-    const response = await api.get('/stock/');
+    const response = await api.get('/stock/', { params });
     return response.data;
   } catch (error) {
     console.error('Error fetching stock:', error);
@@ -159,6 +160,18 @@ export const fetchStock = async () => {
   }
 };
 
+// Stock totals per product across all branches (sorted and paginated on the server)
+// Optional params: ordering, page, page_size, breakdown
+export const fetchStockByProduct = async (params = {}) => {
+  try {
+    const response = await api.get('/stock/by-product/', { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching stock by product:', error);
+    throw error;
+  }
+};
+
 export const addStock = async (stockData) => {
   try {
     const response = await api.post('/add-stock/', stockData);
@@ -199,9 +212,10 @@ export const deleteStock = async (stockId) => {
   }
 };
 
-export const fetchSales = async () => {
+// Optional params: branch, product, date_from, date_to, limit, cursor
+export const fetchSales = async (params = {}) => {
   try {
-    const response = await api.get('/sales/');
+    const response = await api.get('/sales/', { params });
     return response.data;
   } catch (error) {
     console.error('Error fetching sales:', error);
@@ -219,6 +233,17 @@ export const recordSale = async (saleData) => {
   }
 };
 
+// basketData: { branch, items: [{ product, quantity }, ...] } - all lines are recorded or none
+export const recordBasketSale = async (basketData) => {
+  try {
+    const response = await api.post('/add-sale-basket/', basketData);
+    return response.data;
+  } catch (error) {
+    console.error('Error recording basket sale:', error);
+    throw error;
+  }
+};
+
 export const deleteSale = async (saleId) => {
   try {
     const response = await api.delete(`/sales/${saleId}/delete/`);
@@ -229,6 +254,18 @@ export const deleteSale = async (saleId) => {
   }
 };
 
+// --- DASHBOARD ---
+
+export const fetchDashboardSummary = async () => {
+  try {
+    const response = await api.get('/dashboard/summary/');
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching dashboard summary:', error);
+    throw error;
+  }
+};
+
 // --- AUTHENTICATION ---
 
 export const loginUser = async (username, password) => {
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { fetchProducts, fetchStock, fetchSales, fetchBranches } from '../api';
+import { fetchDashboardSummary } from '../api';
 
 // Shopify-inspired color palette
 const colors = {
@@ -179,21 +179,12 @@ function Dashboard() {
     try {
       setLoading(true);
       
-      // Fetch products to count them
-      const products = await fetchProducts();
-      setTotalProducts(products.length);
-      
-      // Fetch branches to count them (this is what "Stock Locations" should show)
-      const branches = await fetchBranches();
-      setTotalBranches(branches.length);
-      
-      // Fetch stock to count total stock records
-      const stock = await fetchStock();
-      setTotalStockItems(stock.length);
-      
-      // Fetch sales to count total sales
-      const sales = await fetchSales();
-      setTotalSales(sales.length);
+      // Fetch all totals in one request (counted on the server)
+      const summary = await fetchDashboardSummary();
+      setTotalProducts(summary.total_products);
+      setTotalBranches(summary.total_branches);
+      setTotalStockItems(summary.total_stock_items);
+      setTotalSales(summary.total_sales);
       
     } catch (error) {
       console.error('Error loading statistics:', error);
@@ -1,5 +1,8 @@
 import { useState, useEffect } from 'react';
-import { fetchStock, addStock, updateStock, deleteStock, fetchBranches, fetchProducts } from '../api';
+import { fetchStock, fetchStockByProduct, addStock, updateStock, deleteStock, fetchBranches, fetchProducts } from '../api';
+
+// Number of products fetched per page in the all-branches view
+const TOTALS_PAGE_SIZE = 50;
 
 // Shopify-inspired color palette
 const colors = {
@@ -292,6 +295,8 @@ const styles = {
 function Stock() {
   // State to store the list of stock, branches, and products
   const [stockRecords, setStockRecords] = useState([]);
+  const [productTotals, setProductTotals] = useState([]);
+  const [nextTotalsPage, setNextTotalsPage] = useState(null);
   const [branches, setBranches] = useState([]);
   const [products, setProducts] = useState([]);
   
@@ -319,12 +324,11 @@ function Stock() {
   const loadData = async () => {
     try {
       setLoading(true);
-      const [stockData, branchesData, productsData] = await Promise.all([
-        fetchStock(),
+      const [branchesData, productsData] = await Promise.all([
         fetchBranches(),
         fetchProducts(),
+        loadStock(filteredBranchId),
       ]);
-      setStockRecords(stockData);
       setBranches(branchesData);
       setProducts(productsData);
     } catch (error) {
@@ -334,6 +338,33 @@ function Stock() {
     }
   };
 
+  // Function to load the stock shown in the list
+  // All branches: per-product totals computed on the server, one page at a time
+  // One branch: only that branch's stock records
+  const loadStock = async (branchId) => {
+    if (branchId === null) {
+      const data = await fetchStockByProduct({ page: 1, page_size: TOTALS_PAGE_SIZE, breakdown: 1 });
+      setProductTotals(data.results);
+      setNextTotalsPage(data.next_page);
+    } else {
+      setStockRecords(await fetchStock({ branch: branchId }));
+    }
+  };
+
+  // Function to load the next page of per-product totals
+  const handleLoadMore = async () => {
+    try {
+      setLoading(true);
+      const data = await fetchStockByProduct({ page: nextTotalsPage, page_size: TOTALS_PAGE_SIZE, breakdown: 1 });
+      setProductTotals([...productTotals, ...data.results]);
+      setNextTotalsPage(data.next_page);
+    } catch (error) {
+      setMessage('Error loading stock');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   // Function to handle form submission (Create or Update)
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -467,44 +498,34 @@ function Stock() {
   };
 
   // Function to filter stocks by branch
-  const handleFilterByBranch = (branchId) => {
+  const handleFilterByBranch = async (branchId) => {
     setFilteredBranchId(branchId);
+    try {
+      setLoading(true);
+      await loadStock(branchId);
+    } catch (error) {
+      setMessage('Error loading stock');
+    } finally {
+      setLoading(false);
+    }
   };
 
   // Function to clear filter and show all stocks
-  const handleShowAll = () => {
-    setFilteredBranchId(null);
-  };
+  const handleShowAll = () => handleFilterByBranch(null);
 
   // Get filtered stock records
-  // When showing all branches, aggregate by product and sum quantities
+  // When showing all branches, show the per-product totals from the server
   // When showing a specific branch, show individual records
   const getFilteredStocks = () => {
     if (filteredBranchId === null) {
-      // Aggregate by product - sum quantities across all branches
-      const aggregated = {};
-      stockRecords.forEach(stock => {
-        const productId = stock.product;
-        if (!aggregated[productId]) {
-          aggregated[productId] = {
-            product_id: productId,
-            product_name: stock.product_name,
-            total_quantity: 0,
-            branches: [],
-            stock_records: []
-          };
-        }
-        aggregated[productId].total_quantity += stock.quantity;
-        aggregated[productId].branches.push(stock.branch_name);
-        aggregated[productId].stock_records.push(stock);
-      });
-      // Convert to array and sort by product name
-      return Object.values(aggregated).sort((a, b) => 
-        a.product_name.localeCompare(b.product_name)
-      );
+      return productTotals.map(total => ({
+        product_id: total.product,
+        product_name: total.product_name,
+        total_quantity: total.total_quantity,
+        branches: total.branches.map(branch => branch.branch_name),
+      }));
     }
-    // When filtering by branch, show individual records
-    return stockRecords.filter(stock => stock.branch === filteredBranchId);
+    return stockRecords;
   };
 
   // Get the selected branch name and location for display
@@ -721,7 +742,7 @@ function Stock() {
           <h2 style={{ ...styles.sectionTitle, marginBottom: '16px' }}>
             {filteredBranchId === null ? 'All Stock Records' : `Stock Records - ${getSelectedBranchInfo()}`}
           </h2>
-        {loading && stockRecords.length === 0 ? (
+        {loading && stockRecords.length === 0 && productTotals.length === 0 ? (
             <div style={styles.loadingState}>Loading stock...</div>
         ) : (() => {
           const filteredStocks = getFilteredStocks();
@@ -784,6 +805,17 @@ function Stock() {
                     </div>
                   ))}
                 </div>
+
+                {nextTotalsPage !== null && (
+                  <button
+                    onClick={handleLoadMore}
+                    disabled={loading}
+                    style={{ ...styles.filterButton, marginTop: '16px' }}
+                    className="filter-button"
+                  >
+                    {loading ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
               </>
             ) : (
               <>